@@ -9,7 +9,7 @@
 ### END INIT INFO
 
 from flask import Flask, request, jsonify
-import requests
+import dataclasses
 import json
 import threading
 from sub.scheduler import *
@@ -17,8 +17,13 @@ from sub.ruleEngine import *
 from dotenv import load_dotenv
 import os, sys
 
+from libs import config_events, ha_client, state_versions, wsgi_server
 from libs.device_binding import enforce_mac_binding
-from libs.edit import deleteItem, file_changed_request, putItem, update_env_file  # type: ignore
+from libs.edit import file_changed_request, update_env_file  # type: ignore
+from libs.env import env_float
+from libs.resource_store import get_store
+from libs.response_cache import ResponseCache
+from libs.state_query import apply_query, parse_query
 from wifi_config.api import create_wifi_blueprint
 from wifi_config.bootstrap import ensure_bootstrap_ap, watch_disconnection_and_start_ap
 
@@ -38,6 +43,27 @@ notifications_file_path = os.environ.get('notifications_file_path')
 HA_host = os.environ.get('HA_host')
 hass_token = os.environ.get('hass_token')
 
+# Flask 워커 스레드들이 공유하는 HA keep-alive 세션 (HA_HTTP_POOL_MAXSIZE로 조정)
+# 요청 스레드 수만큼 HA 연결을 재사용할 수 있게 pool 크기를 맞춘다.
+ha = ha_client.configure(
+    base_url=HA_host, token=hass_token, default_pool_maxsize=wsgi_server.server_options()["threads"]
+)
+
+# HA 프록시 응답 캐시 TTL (초, 0 이면 저장 없이 동시 요청 합치기만)
+HA_STATES_CACHE_TTL_SEC = env_float('HA_STATES_CACHE_TTL_SEC', 1.0)
+HA_STATE_CACHE_TTL_SEC = env_float('HA_STATE_CACHE_TTL_SEC', 1.0)
+HA_SERVICES_CACHE_TTL_SEC = env_float('HA_SERVICES_CACHE_TTL_SEC', 300.0)
+proxy_cache = ResponseCache()
+
+
+def publish_change(resource, op, item_id, store, ha_event=None):
+    # 룰 엔진/알림/MQTT 워커에 로컬 소켓으로 변경된 리소스와 id를 바로 알린다.
+    delivered = config_events.publish(resource, op, [item_id], seq=store.change_seq())
+    if delivered == 0 and ha_event:
+        # 구독자가 아직 붙지 않았으면 예전처럼 HA 이벤트로 알린다.
+        return file_changed_request(ha_event)
+    return None
+
 
 def config():
 
@@ -75,8 +101,6 @@ def _start_wifi_bootstrap_thread() -> None:
     threading.Thread(target=_run, daemon=True, name="wifi-bootstrap").start()
 
 
-_start_wifi_bootstrap_thread()
-
 
 def _start_wifi_watchdog_thread() -> None:
     threading.Thread(
@@ -86,8 +110,6 @@ def _start_wifi_watchdog_thread() -> None:
     ).start()
 
 
-_start_wifi_watchdog_thread()
-
 @app.route('/test', methods=['POST'])
 def test():
     return '@@@', 200
@@ -137,48 +159,155 @@ def webhook():
 
 @app.route('/local/api', methods=["POST","DELETE", "PUT", "GET"])
 def home():
-    headers = {"Authorization": f"Bearer {hass_token}"}
-    response = requests.get(f"{HA_host}/api/", headers=headers)
+    response = ha.get("/api/")
     
     return str(response.json())
 
+def _load_ha_services():
+    response = ha.get("/api/services")
+    data = response.json()
+    # 도메인 -> services 인덱스를 미리 만들어 둔다.
+    by_domain = {d['domain']: d['services'] for d in data if isinstance(d, dict) and 'domain' in d} if isinstance(data, list) else {}
+    return {"status_code": response.status_code, "data": data, "by_domain": by_domain}
+
+def _ha_services():
+    return proxy_cache.get_or_fetch(
+        "services", HA_SERVICES_CACHE_TTL_SEC, _load_ha_services,
+        cacheable=lambda v: v["status_code"] == 200,
+    )
+
 @app.route('/local/api/services')
 def services():
-    headers = {"Authorization": f"Bearer {hass_token}"}
-    response = requests.get(f"{HA_host}/api/services", headers=headers)
-    return jsonify(response.json())
+    return jsonify(_ha_services()["data"])
 
-@app.route('/local/api/states')
-def states():
-    """
-    HA /api/states 프록시.
-    - HA 쪽에서 JSON 이 아닌 응답(HTML, 에러페이지 등)을 주면 json()에서 예외가 나므로
-      이를 잡아서 에러 내용을 그대로 반환하고, HTTP 상태코드를 함께 노출한다.
-    """
-    headers = {"Authorization": f"Bearer {hass_token}"}
-    resp = requests.get(f"{HA_host}/api/states", headers=headers)
+def _load_ha_states():
+    resp = ha.get("/api/states")
     try:
         data = resp.json()
     except Exception as e:  # JSONDecodeError, ValueError 등
         # 디버깅을 위해 앞부분 텍스트를 로그/응답에 남긴다.
         text_snippet = resp.text[:200] if resp.text else ""
-        return jsonify({
+        return {"status_code": resp.status_code, "error": {
             "error": "ha_states_invalid_json",
             "message": str(e),
             "status_code": resp.status_code,
             "body_snippet": text_snippet,
-        }), 502
-    return jsonify(data)
+        }}
+    # 원본 바이트는 필터 없는 조회에 그대로 쓰고, 버전 비교는 HA 를 새로 부를 때 한 번만 한다.
+    raw = resp.content if isinstance(resp.content, (bytes, bytearray)) else None
+    version = state_versions.get_tracker().observe(data) if isinstance(data, list) else None
+    return {"status_code": resp.status_code, "data": data, "raw": raw, "version": version}
+
+def _fetch_ha_states():
+    """
+    HA /api/states 조회. (결과, None) 또는 (None, 에러 응답)을 돌려준다.
+    결과는 {"data": 파싱된 목록, "raw": HA 원본 바이트, "version": 상태 버전}.
+    - HA 쪽에서 JSON 이 아닌 응답(HTML, 에러페이지 등)을 주면 json()에서 예외가 나므로
+      이를 잡아서 에러 내용을 그대로 반환하고, HTTP 상태코드를 함께 노출한다.
+    - 짧은 TTL 캐시 + 동시 요청 합치기로 MQTT 워커/대시보드/수집기가 몰려도 HA 는 한 번만 부른다.
+    """
+    result = proxy_cache.get_or_fetch(
+        "states", HA_STATES_CACHE_TTL_SEC, _load_ha_states,
+        cacheable=lambda v: v["status_code"] == 200 and "error" not in v,
+    )
+    if "error" in result:
+        return None, (jsonify(result["error"]), 502)
+    return result, None
+
+def _managed_ids(query):
+    if not query.managed_only:
+        return None
+    return {d.get('entity_id') for d in get_store(devices_file_path, "entity_id").all()}
+
+def _managed_seq(query):
+    if not query.managed_only:
+        return None
+    return get_store(devices_file_path, "entity_id").change_seq()
+
+@app.route('/local/api/states')
+def states():
+    """
+    HA /api/states 프록시.
+    - 쿼리: domain, entity_prefix, managed_only, attributes, fields, limit, cursor
+      (libs.state_query 참고, 쉼표 구분 또는 반복 지정)
+    - ETag 는 상태 버전 + 쿼리(managed_only 면 devices.json 변경 표시까지)로 만들고,
+      If-None-Match 가 같으면 304 를 준다.
+    """
+    try:
+        query = parse_query(request.args)
+    except ValueError as e:
+        return jsonify({"error": "invalid_query", "message": str(e)}), 400
+
+    fetched, error = _fetch_ha_states()
+    if error:
+        return error
+    data = fetched["data"]
+    if not isinstance(data, list):
+        return jsonify(data)
+
+    tracker = state_versions.get_tracker()
+    etag = state_versions.states_etag(tracker.token(fetched["version"]), request.query_string, _managed_seq(query))
+    if state_versions.etag_matches(request.headers.get('If-None-Match'), etag):
+        return "", 304, {"ETag": etag}
+
+    if query.is_empty and fetched["raw"] is not None:
+        # 필터가 없으면 HA 바이트를 다시 인코딩하지 않고 그대로 보낸다.
+        response = app.response_class(fetched["raw"], mimetype="application/json")
+    elif query.is_empty:
+        response = jsonify(data)
+    else:
+        result = apply_query(data, query, _managed_ids(query))
+        # limit/cursor 를 쓰면 {items, total, next_cursor}, 아니면 예전처럼 목록만 준다.
+        response = jsonify(result if query.paginated else result["items"])
+    response.headers["ETag"] = etag
+    return response
+
+@app.route('/local/api/states/changes')
+def states_changes():
+    """
+    since=<version> 이후 바뀐 엔티티만 준다.
+    - 응답: {version, full, changed, removed}. 다음 요청에는 받은 version 을 since 로 넘긴다.
+    - since 가 없거나 재시작 전/너무 오래된 버전이면 full=true 와 함께 전체 목록을 준다.
+    - domain, entity_prefix, managed_only, attributes, fields 필터는 changed 에 적용된다.
+    """
+    try:
+        query = dataclasses.replace(parse_query(request.args), limit=None, cursor=None)
+    except ValueError as e:
+        return jsonify({"error": "invalid_query", "message": str(e)}), 400
+
+    fetched, error = _fetch_ha_states()
+    if error:
+        return error
+    if not isinstance(fetched["data"], list):
+        return jsonify(fetched["data"]), 502
+
+    tracker = state_versions.get_tracker()
+    version, full, changed, removed = tracker.changes_since(tracker.parse_token(request.args.get('since')))
+    if not query.is_empty:
+        changed = apply_query(changed, query, _managed_ids(query))["items"]
+    return jsonify({
+        "version": tracker.token(version),
+        "full": full,
+        "changed": changed,
+        "removed": removed,
+    })
+
+def _load_ha_state(entity_id):
+    response = ha.get(f"/api/states/{entity_id}")
+    return {"status_code": response.status_code, "data": response.json()}
+
+def _ha_state(entity_id):
+    return proxy_cache.get_or_fetch(
+        f"state:{entity_id}", HA_STATE_CACHE_TTL_SEC, lambda: _load_ha_state(entity_id),
+        cacheable=lambda v: v["status_code"] == 200,
+    )["data"]
 
 @app.route('/local/api/states/<entity_id>')
 def statesEntityId(entity_id):
-    headers = {"Authorization": f"Bearer {hass_token}"}
-    response = requests.get(f"{HA_host}/api/states/{entity_id}", headers=headers)
-    return jsonify(response.json())
+    return jsonify(_ha_state(entity_id))
 
 @app.route('/local/api/devices/<entity_id>/command', methods=["POST"])
 def device_command(entity_id):
-    headers = {"Authorization": f"Bearer {hass_token}"}
     body = {
         "entity_id": entity_id
         }
@@ -187,224 +316,213 @@ def device_command(entity_id):
     _r.pop('service')
     merged_dict = {**body, **_r}
     print(merged_dict)
-    response = requests.post(f"{HA_host}/api/services/{request.json['domain']}/{request.json['service']}", data=json.dumps(merged_dict), headers=headers)
+    response = ha.post(f"/api/services/{request.json['domain']}/{request.json['service']}", data=json.dumps(merged_dict))
+    # 명령 직후 조회가 캐시된 이전 상태를 받지 않게 한다.
+    proxy_cache.invalidate("state")
     return jsonify(response.json()) 
 
 @app.route('/local/api/devices/<entity_id>/status', methods=["GET"])
 def device_status(entity_id):
-    headers = {"Authorization": f"Bearer {hass_token}"}
-    response = requests.get(f"{HA_host}/api/states/{entity_id}", headers=headers)
-    return jsonify(response.json()) 
+    return jsonify(_ha_state(entity_id)) 
 
 @app.route('/local/api/devices/<entity_id>/services', methods=["GET"])
 def device_services(entity_id):
-    target_entity = entity_id
-    target_domain = target_entity.split('.')[0]
-
-    url = f"{HA_host}/api/services"
-    headers = {"Authorization": f"Bearer {hass_token}"}
-    response = requests.get(url, headers=headers)
-    all_domain = json.loads(response.content)
+    target_domain = entity_id.split('.')[0]
+    return jsonify(_ha_services()["by_domain"].get(target_domain, {}))
 
-    for d in all_domain:
-        if(d['domain'] == target_domain):
-            switch_services = d['services']
-            return jsonify(switch_services) 
-    return jsonify({}) 
+@app.route('/local/api/proxy/cache', methods=["GET"])
+def proxy_cache_stats():
+    return jsonify(proxy_cache.stats())
 
 
 @app.route('/local/api/devices', methods=["POST","DELETE", "PUT", "GET"])
 def devices():
-    try:
-        with open(devices_file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-    except FileNotFoundError:
-        data = []  # 파일이 없으면 빈 리스트로 초기화
-    
-    if request.method == "POST":
-        new_data = request.json
-        data.append(new_data)
-    if request.method == "DELETE":
-        target_value =  request.json['entity_id']
-        data = deleteItem(data, "entity_id", target_value)
-    if request.method == "PUT":
-        target_value =  request.json['entity_id']
-        data = putItem(data, "entity_id", target_value, request.json)
-    if request.method == "GET":
-        pass
+    store = get_store(devices_file_path, "entity_id")
 
-    # 업데이트된 데이터를 JSON 파일에 다시 저장5
-    with open(devices_file_path, 'w', encoding='utf-8') as file:
-        json.dump(data, file, indent=4, ensure_ascii=False)
-
-    schedule_config(one_time)
+    if request.method == "POST":
+        data = store.append(request.json)
+        op, item_id = "append", request.json.get('entity_id')
+    elif request.method == "DELETE":
+        data = store.delete(request.json['entity_id'])
+        op, item_id = "delete", request.json['entity_id']
+    elif request.method == "PUT":
+        data = store.put(request.json['entity_id'], request.json)
+        op, item_id = "put", request.json['entity_id']
+    else:
+        # GET은 메모리에서 응답하고 파일을 다시 쓰지 않는다.
+        return jsonify(store.all())
+
+    publish_change("devices", op, item_id, store)
+    reschedule()
     return jsonify(data)
 
 
 
 @app.route('/local/api/schedules', methods=["POST","DELETE", "PUT", "GET"])
 def schdules():
-    # 파일에서 기존 데이터 읽기
-    try:
-        with open(schedules_file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-    except FileNotFoundError:
-        data = []  # 파일이 없으면 빈 리스트로 초기화
-    
+    store = get_store(schedules_file_path)
+
     if request.method == "POST":
         new_data = request.json
         new_data.setdefault('activate', True)
-        data.append(new_data)
-    if request.method == "DELETE":
-        target_value =  request.json['id']
-        data = deleteItem(data, "id", target_value)
-    if request.method == "PUT":
-        target_value =  request.json['id']
-        data = putItem(data, "id", target_value, request.json)
-    if request.method == "GET":
-        pass
-
-    # 업데이트된 데이터를 JSON 파일에 다시 저장5
-    with open(schedules_file_path, 'w', encoding='utf-8') as file:
-        json.dump(data, file, indent=4, ensure_ascii=False)
-
-    if(request.method!="GET"):
-        schedule_config(one_time)
+        data = store.append(new_data)
+        op, item_id = "append", new_data.get('id')
+    elif request.method == "DELETE":
+        data = store.delete(request.json['id'])
+        op, item_id = "delete", request.json['id']
+    elif request.method == "PUT":
+        data = store.put(request.json['id'], request.json)
+        op, item_id = "put", request.json['id']
+    else:
+        return jsonify(store.all())
+
+    publish_change("schedules", op, item_id, store)
+    reschedule()
     return jsonify(data)
 
 @app.route('/local/api/schedules/<schedule_id>', methods=["POST","DELETE", "PUT", "GET"])
 def schdules_id(schedule_id):
-    # 파일에서 기존 데이터 읽기
-    try:
-        with open(schedules_file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-    except FileNotFoundError:
-        data = []  # 파일이 없으면 빈 리스트로 초기화
+    store = get_store(schedules_file_path)
 
     if request.method == "POST":
         new_data = request.json
         new_data.setdefault('activate', True)
-        data.append(new_data)
-    if request.method == "DELETE":
-        data = deleteItem(data, "id", schedule_id)
-    if request.method == "PUT":
-        data = putItem(data, "id", schedule_id, request.json)
-    if request.method == "GET":
-        pass
-
-    # 업데이트된 데이터를 JSON 파일에 다시 저장5
-    with open(schedules_file_path, 'w', encoding='utf-8') as file:
-        json.dump(data, file, indent=4, ensure_ascii=False)
-
-    if(request.method!="GET"):
-        schedule_config(one_time)
+        data = store.append(new_data)
+        op, item_id = "append", new_data.get('id')
+    elif request.method == "DELETE":
+        data = store.delete(schedule_id)
+        op, item_id = "delete", schedule_id
+    elif request.method == "PUT":
+        data = store.put(schedule_id, request.json)
+        op, item_id = "put", schedule_id
+    else:
+        return jsonify(store.all())
+
+    publish_change("schedules", op, item_id, store)
+    reschedule()
 
     return jsonify(data)
 
 @app.route('/local/api/rules', methods=["POST","DELETE", "PUT", "GET"])
 def rules():
-    
-    try:
-        with open(rules_file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-    except FileNotFoundError:
-        data = []  # 파일이 없으면 빈 리스트로 초기화
+    store = get_store(rules_file_path)
 
     if request.method == "POST":
         new_data = request.json
         new_data.setdefault('activate', True)
-        data.append(new_data)
-    if request.method == "DELETE":
-        target_value =  request.json['id']
-        data = deleteItem(data, "id", target_value)
-    if request.method == "PUT":
-        target_value =  request.json['id']
-        data = putItem(data, "id", target_value, request.json)
-    if request.method == "GET":
-        pass
-
-    # 업데이트된 데이터를 JSON 파일에 다시 저장5
-    with open(rules_file_path, 'w', encoding='utf-8') as file:
-        json.dump(data, file, indent=4, ensure_ascii=False)
-
-    if(request.method!="GET"):
-        file_changed_request("rules_file_changed")
+        data = store.append(new_data)
+        op, item_id = "append", new_data.get('id')
+    elif request.method == "DELETE":
+        data = store.delete(request.json['id'])
+        op, item_id = "delete", request.json['id']
+    elif request.method == "PUT":
+        data = store.put(request.json['id'], request.json)
+        op, item_id = "put", request.json['id']
+    else:
+        return jsonify(store.all())
+
+    publish_change("rules", op, item_id, store, ha_event="rules_file_changed")
     return jsonify(data)
 
 @app.route('/local/api/rooms', methods=["POST","DELETE", "PUT", "GET"])
 def rooms():
-    try:
-        with open(rooms_file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-    except FileNotFoundError:
-        data = []  # 파일이 없으면 빈 리스트로 초기화
+    store = get_store(rooms_file_path)
 
     if request.method == "POST":
         new_data = request.json
         new_data.setdefault('activate', True)
-        data.append(new_data)
-    if request.method == "DELETE":
-        target_value =  request.json['id']
-        data = deleteItem(data, "id", target_value)
-    if request.method == "PUT":
-        target_value =  request.json['id']
-        data = putItem(data, "id", target_value, request.json)
-    if request.method == "GET":
-        pass
-
-    # 업데이트된 데이터를 JSON 파일에 다시 저장5
-    with open(rooms_file_path, 'w', encoding='utf-8') as file:
-        json.dump(data, file, indent=4, ensure_ascii=False)
-
-    schedule_config(one_time)
+        data = store.append(new_data)
+        op, item_id = "append", new_data.get('id')
+    elif request.method == "DELETE":
+        data = store.delete(request.json['id'])
+        op, item_id = "delete", request.json['id']
+    elif request.method == "PUT":
+        data = store.put(request.json['id'], request.json)
+        op, item_id = "put", request.json['id']
+    else:
+        return jsonify(store.all())
+
+    publish_change("rooms", op, item_id, store)
+    reschedule()
     return jsonify(data)
     
 @app.route('/local/api/notifications', methods=["POST","DELETE", "PUT", "GET"])
 def notifications():
-    try:
-        with open(notifications_file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-    except FileNotFoundError:
-        data = []  # 파일이 없으면 빈 리스트로 초기화
+    store = get_store(notifications_file_path)
 
     if request.method == "POST":
-        new_data = request.json
-        data.append(new_data)
-    if request.method == "DELETE":
-        target_value =  request.json['id']
-        data = deleteItem(data, "id", target_value)
-    if request.method == "PUT":
-        target_value =  request.json['id']
-        data = putItem(data, "id", target_value, request.json)
-    if request.method == "GET":
-        pass
-
-    # 업데이트된 데이터를 JSON 파일에 다시 저장5
-    with open(notifications_file_path, 'w', encoding='utf-8') as file:
-        json.dump(data, file, indent=4, ensure_ascii=False)
-
-    if(request.method!="GET"):
-        res= file_changed_request("notifications_file_changed")
+        data = store.append(request.json)
+        op, item_id = "append", request.json.get('id')
+    elif request.method == "DELETE":
+        data = store.delete(request.json['id'])
+        op, item_id = "delete", request.json['id']
+    elif request.method == "PUT":
+        data = store.put(request.json['id'], request.json)
+        op, item_id = "put", request.json['id']
+    else:
+        return jsonify(store.all())
+
+    res = publish_change("notifications", op, item_id, store, ha_event="notifications_file_changed")
+    if res is not None:
         print(res.content)
     return jsonify(data)
 
+
 @app.route('/local/api/matterhub/id', methods=["GET"])
 def matterhub_id():
     matterhub_id = os.environ.get('matterhub_id', '').strip('"')
     return jsonify({"matterhub_id": matterhub_id})
 
 
-config()
+one_time = None
+
+
+def reschedule():
+    # 백그라운드 작업을 돌리는 프로세스에서만 스케줄을 다시 적용한다.
+    if one_time is not None:
+        schedule_config(one_time)
+
+
+def start_background():
+    """Start the per-process background work (스케줄러, 와이파이, 상태 캐시, 변경 알림).
+
+    import 시에는 아무것도 띄우지 않는다. 서버를 띄우는 프로세스에서 한 번만 호출한다.
+    """
+    global one_time
+    if one_time is not None:
+        return one_time
+    config()
+    config_events.start_server()
+    _start_wifi_bootstrap_thread()
+    _start_wifi_watchdog_thread()
+
+    one_time = one_time_schedule()
+    schedule_config(one_time)
+    start_state_cache()
+    threading.Thread(target=periodic_scheduler, daemon=True, name="periodic-scheduler").start()
+    threading.Thread(target=one_time_scheduler, args=[one_time], daemon=True, name="one-time-scheduler").start()
+    return one_time
+
+
+def stop_background():
+    config_events.stop_server()
 
-one_time = one_time_schedule()
-schedule_config(one_time)
-p = threading.Thread(target=periodic_scheduler)
-p.start()
-o = threading.Thread(target=one_time_scheduler, args=[one_time])
-o.start()
 
 if __name__ == '__main__':
-    # 운영 환경(systemd)에서는 debug/reloader 비활성화가 기본이다.
-    # 필요할 때만 WM_DEBUG=1 로 켜서 사용.
+    start_background()
+    # 운영 환경(systemd)에서는 스레드 풀 WSGI 서버(waitress)로 띄운다.
+    # 필요할 때만 WM_DEBUG=1 로 werkzeug 개발 서버(debug/reloader)를 켠다.
     _debug = os.environ.get("WM_DEBUG", "0").strip().lower() in ("1", "true", "yes", "y")
-    app.run('0.0.0.0', debug=_debug, use_reloader=_debug, port=8100)
+    if _debug:
+        app.run('0.0.0.0', debug=_debug, use_reloader=_debug, port=wsgi_server.server_options()["port"])
+    elif os.environ.get("WM_API_ASYNC", "0").strip().strip('"').lower() in ("1", "true", "yes", "y"):
+        # HA 프록시 조회는 aiohttp 이벤트 루프에서, 나머지는 내부 포트의 Flask 로 전달한다.
+        from libs import async_proxy
+        async_proxy.serve(
+            app,
+            managed_ids=lambda: {d.get('entity_id') for d in get_store(devices_file_path, "entity_id").all()},
+            managed_seq=lambda: get_store(devices_file_path, "entity_id").change_seq(),
+            on_shutdown=stop_background,
+        )
+    else:
+        wsgi_server.serve(app, on_shutdown=stop_background)
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Hashable, Optional, Tuple
+
+from libs.env import env_float, env_int
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_PER_RULE_LIMIT = 4
+DEFAULT_STATS_INTERVAL_SEC = 60.0
+
+Job = Tuple[Hashable, Callable[..., Any], tuple, float]
+
+
+def rule_key(rule: Dict[str, Any]) -> str:
+    """Per-rule budget key: the rule id, or a content hash for rules saved without one.
+
+    id 없는 규칙들이 None 하나를 같이 쓰면 시끄러운 규칙 하나가 나머지 작업까지 밀어낸다.
+    내용 해시는 파일을 다시 읽어도 같은 규칙이면 같은 값이다.
+    """
+    if rule.get("id"):
+        return str(rule["id"])
+    digest = hashlib.sha1(json.dumps(rule, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return f"anon-{digest[:12]}"
+
+
+class ActionExecutor:
+    """Bounded worker pool that runs rule actions off the websocket receive loop.
+
+    - 같은 대상 엔티티(lane)의 작업은 제출 순서대로 하나씩 실행한다.
+    - 다른 엔티티끼리는 ``max_workers`` 까지 병렬로 실행한다.
+    - 규칙 하나가 대기/실행 중인 작업이 ``per_rule_limit`` 에 도달하면 새 작업은 버린다.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        per_rule_limit: Optional[int] = None,
+        stats_interval_sec: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_workers = max(1, max_workers if max_workers is not None else env_int(
+            "RULE_ACTION_WORKERS", DEFAULT_MAX_WORKERS
+        ))
+        self.per_rule_limit = max(1, per_rule_limit if per_rule_limit is not None else env_int(
+            "RULE_ACTION_PER_RULE_LIMIT", DEFAULT_PER_RULE_LIMIT
+        ))
+        self.stats_interval_sec = max(0.0, stats_interval_sec if stats_interval_sec is not None else env_float(
+            "RULE_ACTION_STATS_INTERVAL_SEC", DEFAULT_STATS_INTERVAL_SEC
+        ))
+        self._clock = clock
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="rule-action")
+
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._lanes: Dict[Hashable, Deque[Job]] = {}
+        self._rule_pending: Dict[Hashable, int] = {}
+        self._queued = 0
+        self._running = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._dropped = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._last_stats_log = clock()
+
+    def submit(self, rule_id: Hashable, lane: Hashable, fn: Callable[..., Any], *args: Any) -> bool:
+        """Queue ``fn(*args)`` behind earlier jobs of the same lane; never blocks."""
+        with self._lock:
+            if self._rule_pending.get(rule_id, 0) >= self.per_rule_limit:
+                self._dropped += 1
+                print(f"[RULE][ACTIONS] 규칙 동시 실행 한도 초과로 작업 생략: rule={rule_id} lane={lane}")
+                return False
+            self._rule_pending[rule_id] = self._rule_pending.get(rule_id, 0) + 1
+            self._submitted += 1
+            self._queued += 1
+            queue = self._lanes.get(lane)
+            start_lane = queue is None
+            if start_lane:
+                queue = self._lanes[lane] = deque()
+            queue.append((rule_id, fn, args, self._clock()))
+        if start_lane:
+            self._pool.submit(self._drain, lane)
+        return True
+
+    def _drain(self, lane: Hashable) -> None:
+        while True:
+            with self._lock:
+                queue = self._lanes[lane]
+                if not queue:
+                    del self._lanes[lane]
+                    if not self._lanes:
+                        self._idle.notify_all()
+                    return
+                rule_id, fn, args, submitted_at = queue.popleft()
+                self._queued -= 1
+                self._running += 1
+
+            failed = False
+            try:
+                fn(*args)
+            except Exception as e:
+                failed = True
+                print(f"[RULE][ACTIONS] 작업 실패: rule={rule_id} lane={lane} {type(e).__name__} {e}")
+
+            latency = self._clock() - submitted_at
+            with self._lock:
+                self._running -= 1
+                remaining = self._rule_pending[rule_id] - 1
+                if remaining:
+                    self._rule_pending[rule_id] = remaining
+                else:
+                    del self._rule_pending[rule_id]
+                if failed:
+                    self._failed += 1
+                else:
+                    self._completed += 1
+                self._latency_total += latency
+                self._latency_max = max(self._latency_max, latency)
+            self._maybe_log_stats()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            finished = self._completed + self._failed
+            return {
+                "queue_depth": self._queued,
+                "running": self._running,
+                "lanes": len(self._lanes),
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "dropped": self._dropped,
+                "latency_avg_sec": (self._latency_total / finished) if finished else 0.0,
+                "latency_max_sec": self._latency_max,
+            }
+
+    def _maybe_log_stats(self) -> None:
+        if not self.stats_interval_sec:
+            return
+        now = self._clock()
+        with self._lock:
+            if now - self._last_stats_log < self.stats_interval_sec:
+                return
+            self._last_stats_log = now
+        s = self.stats()
+        print(
+            f"[RULE][ACTIONS] queue={s['queue_depth']} running={s['running']} "
+            f"completed={s['completed']} failed={s['failed']} dropped={s['dropped']} "
+            f"latency_avg={s['latency_avg_sec']:.3f}s latency_max={s['latency_max_sec']:.3f}s"
+        )
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        with self._lock:
+            return self._idle.wait_for(lambda: not self._lanes, timeout)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
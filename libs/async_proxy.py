@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from libs import ha_client, jsonfast, state_versions
+from libs.env import env_float, env_int
+from libs.state_query import apply_query, parse_query
+
+try:
+    from aiohttp import ClientSession, ClientTimeout, TCPConnector, web
+except ImportError:  # aiohttp 는 WM_API_ASYNC=1 일 때만 필요하다.
+    ClientSession = ClientTimeout = TCPConnector = web = None  # type: ignore
+
+STREAM_CHUNK_SIZE = 64 * 1024
+DEFAULT_BACKEND_PORT = 8101
+DEFAULT_HA_POOL_LIMIT = 32
+
+# 프록시가 그대로 넘기면 안 되는 연결 단위 헤더
+HOP_BY_HOP_HEADERS = frozenset({
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade", "host", "content-length",
+})
+
+
+class AsyncSingleFlight:
+    """asyncio 버전 ResponseCache: TTL 캐시 + 같은 key 동시 요청 합치기.
+
+    upstream 조회는 별도 task 로 돌리므로 먼저 온 요청이 끊겨도 기다리는 요청은 결과를 받는다.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic) -> None:
+        self._clock = clock
+        self._entries: Dict[str, Tuple[float, Any]] = {}
+        self._flights: Dict[str, "asyncio.Future[Any]"] = {}
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+
+    async def get_or_fetch(
+        self,
+        key: str,
+        ttl: float,
+        fetch: Callable[[], Awaitable[Any]],
+        cacheable: Callable[[Any], bool] = lambda value: True,
+    ) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > self._clock():
+            self._stats["hits"] += 1
+            return entry[1]
+        flight = self._flights.get(key)
+        if flight is not None:
+            self._stats["coalesced"] += 1
+        else:
+            self._stats["misses"] += 1
+            flight = self._flights[key] = asyncio.ensure_future(self._fetch(key, ttl, fetch, cacheable))
+            # 기다리는 쪽이 모두 끊겼을 때 "exception was never retrieved" 경고를 막는다.
+            flight.add_done_callback(lambda f: f.cancelled() or f.exception())
+        return await asyncio.shield(flight)
+
+    async def _fetch(self, key: str, ttl: float, fetch: Callable[[], Awaitable[Any]], cacheable: Callable[[Any], bool]) -> Any:
+        try:
+            value = await fetch()
+        except BaseException:
+            self._stats["errors"] += 1
+            raise
+        finally:
+            self._flights.pop(key, None)
+        if ttl > 0 and cacheable(value):
+            self._entries[key] = (self._clock() + ttl, value)
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "in_flight": len(self._flights), **self._stats}
+
+
+class _QueryArgs:
+    """aiohttp MultiDict 를 parse_query 가 쓰는 get/getlist 인터페이스로 감싼다."""
+
+    def __init__(self, query: Any) -> None:
+        self._query = query
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return self._query.get(name, default)
+
+    def getlist(self, name: str) -> list:
+        return self._query.getall(name, [])
+
+
+def _raw_query_string(request: Any) -> bytes:
+    """Undecoded query bytes, same as Flask ``request.query_string`` (request.query_string 은 디코딩된 값)."""
+    return request.raw_path.partition("?")[2].encode("utf-8")
+
+
+class HAProxy:
+    """Async front for wm-app (WM_API_ASYNC=1).
+
+    - HA 로 그대로 넘기는 조회(/states, /states/<id>, /devices/<id>/status, /services)는
+      공유 aiohttp 세션으로 비동기 처리하고, 본문은 청크 단위로 흘려보낸다.
+      상태 코드와 Content-Type 은 HA 응답을 따른다.
+    - /local/api/services 는 Flask 라우트와 같이 HA_SERVICES_CACHE_TTL_SEC 동안 캐시한다.
+    - /local/api/states 는 HA 응답 바이트를 다시 인코딩하지 않고 그대로 돌려주며,
+      ETag/필터는 Flask 라우트와 같은 규칙(libs.state_versions, libs.state_query)을 쓴다.
+    - 나머지 경로(CRUD, 설정 등)는 내부 포트의 Flask 앱으로 스트리밍 전달한다.
+    - 요청이 몰려도 스레드를 잡지 않고 이벤트 루프에서 대기한다.
+    """
+
+    def __init__(
+        self,
+        backend_url: str,
+        managed_ids: Callable[[], Set[str]] = lambda: set(),
+        managed_seq: Callable[[], int] = lambda: 0,
+        states_ttl: Optional[float] = None,
+        services_ttl: Optional[float] = None,
+        pool_limit: Optional[int] = None,
+        client: Optional[ha_client.HAClient] = None,
+    ) -> None:
+        self.backend_url = backend_url.rstrip("/")
+        self.managed_ids = managed_ids
+        self.managed_seq = managed_seq
+        self.states_ttl = states_ttl if states_ttl is not None else env_float("HA_STATES_CACHE_TTL_SEC", 1.0)
+        self.services_ttl = services_ttl if services_ttl is not None else env_float("HA_SERVICES_CACHE_TTL_SEC", 300.0)
+        self.pool_limit = pool_limit or env_int("HA_ASYNC_POOL_LIMIT", DEFAULT_HA_POOL_LIMIT)
+        self.client = client or ha_client.get_client()
+        self.cache = AsyncSingleFlight()
+        self.ha: Any = None
+        self.backend: Any = None
+
+    async def start(self, app: Any = None) -> None:
+        timeout = ClientTimeout(total=self.client.timeout)
+        self.ha = ClientSession(
+            connector=TCPConnector(limit=self.pool_limit), timeout=timeout, headers=self.client.auth_headers()
+        )
+        # Flask 응답은 압축/길이 그대로 넘긴다.
+        self.backend = ClientSession(connector=TCPConnector(limit=self.pool_limit), auto_decompress=False)
+
+    async def close(self, app: Any = None) -> None:
+        for session in (self.ha, self.backend):
+            if session is not None:
+                await session.close()
+
+    # ---- HA 직접 처리 ----
+
+    async def _load_states(self) -> Tuple[int, bytes, Any, Optional[int]]:
+        async with self.ha.get(self.client.url("/api/states")) as upstream:
+            body = await upstream.read()
+        try:
+            data = jsonfast.loads(body)
+        except ValueError:
+            data = None
+        # 버전 비교는 HA 를 새로 조회했을 때 한 번만 한다 (캐시 hit 는 그대로 재사용).
+        version = state_versions.get_tracker().observe(data) if isinstance(data, list) else None
+        return upstream.status, body, data, version
+
+    async def states(self, request: Any) -> Any:
+        try:
+            query = parse_query(_QueryArgs(request.query))
+        except ValueError as e:
+            return web.json_response({"error": "invalid_query", "message": str(e)}, status=400)
+
+        status, body, data, version = await self.cache.get_or_fetch(
+            "states", self.states_ttl, self._load_states,
+            cacheable=lambda v: v[0] == 200 and v[2] is not None,
+        )
+        if data is None:
+            return web.json_response({
+                "error": "ha_states_invalid_json",
+                "message": "upstream body is not JSON",
+                "status_code": status,
+                "body_snippet": body[:200].decode("utf-8", "replace"),
+            }, status=502)
+        if not isinstance(data, list):
+            return web.Response(body=body, content_type="application/json")
+
+        # 관리 목록 조회는 리소스 스토어(파일/SQLite)를 읽으므로 이벤트 루프 밖에서 돌린다.
+        loop = asyncio.get_running_loop()
+        managed_seq = await loop.run_in_executor(None, self.managed_seq) if query.managed_only else None
+        tracker = state_versions.get_tracker()
+        etag = state_versions.states_etag(tracker.token(version), _raw_query_string(request), managed_seq)
+        if state_versions.etag_matches(request.headers.get("If-None-Match"), etag):
+            return web.Response(status=304, headers={"ETag": etag})
+
+        if query.is_empty:
+            # 필터가 없으면 HA 바이트를 그대로 보낸다 (재인코딩 없음).
+            return web.Response(body=body, content_type="application/json", headers={"ETag": etag})
+        managed = await loop.run_in_executor(None, self.managed_ids) if query.managed_only else None
+        result = apply_query(data, query, managed)
+        payload = result if query.paginated else result["items"]
+        return web.Response(
+            body=jsonfast.dumpb(payload),
+            content_type="application/json",
+            headers={"ETag": etag},
+        )
+
+    async def stream_from_ha(self, request: Any, path: str) -> Any:
+        async with self.ha.get(self.client.url(path)) as upstream:
+            # HA 오류(404/401 등)도 상태 코드와 Content-Type 그대로 돌려준다.
+            response = web.StreamResponse(status=upstream.status, reason=upstream.reason)
+            response.headers["Content-Type"] = upstream.headers.get("Content-Type", "application/json")
+            await response.prepare(request)
+            async for chunk in upstream.content.iter_chunked(STREAM_CHUNK_SIZE):
+                await response.write(chunk)
+            await response.write_eof()
+            return response
+
+    async def entity_state(self, request: Any) -> Any:
+        return await self.stream_from_ha(request, f"/api/states/{request.match_info['entity_id']}")
+
+    async def _load_services(self) -> Tuple[int, str, bytes]:
+        async with self.ha.get(self.client.url("/api/services")) as upstream:
+            body = await upstream.read()
+            return upstream.status, upstream.headers.get("Content-Type", "application/json"), body
+
+    async def services(self, request: Any) -> Any:
+        status, content_type, body = await self.cache.get_or_fetch(
+            "services", self.services_ttl, self._load_services,
+            cacheable=lambda v: v[0] == 200,
+        )
+        return web.Response(status=status, body=body, headers={"Content-Type": content_type})
+
+    # ---- Flask 로 전달 ----
+
+    async def forward(self, request: Any) -> Any:
+        headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS}
+        body = await request.read() if request.body_exists else None
+        async with self.backend.request(
+            request.method, f"{self.backend_url}{request.rel_url}",
+            headers=headers, data=body, allow_redirects=False,
+        ) as upstream:
+            response = web.StreamResponse(status=upstream.status, reason=upstream.reason)
+            for key, value in upstream.headers.items():
+                if key.lower() not in HOP_BY_HOP_HEADERS:
+                    response.headers.add(key, value)
+            await response.prepare(request)
+            async for chunk in upstream.content.iter_chunked(STREAM_CHUNK_SIZE):
+                await response.write(chunk)
+            await response.write_eof()
+            return response
+
+
+def create_app(proxy: HAProxy) -> Any:
+    if web is None:
+        raise RuntimeError("WM_API_ASYNC=1 requires aiohttp (pip install aiohttp)")
+    app = web.Application()
+    app.on_startup.append(proxy.start)
+    app.on_cleanup.append(proxy.close)
+    app.router.add_get("/local/api/states", proxy.states)
+    # changes 는 Flask 라우트가 처리한다 ({entity_id} 보다 먼저 등록).
+    app.router.add_get("/local/api/states/changes", proxy.forward)
+    app.router.add_get("/local/api/states/{entity_id}", proxy.entity_state)
+    app.router.add_get("/local/api/devices/{entity_id}/status", proxy.entity_state)
+    app.router.add_get("/local/api/services", proxy.services)
+    app.router.add_route("*", "/{tail:.*}", proxy.forward)
+    return app
+
+
+def serve(
+    flask_app: Any,
+    managed_ids: Callable[[], Set[str]] = lambda: set(),
+    on_shutdown: Optional[Callable[[], None]] = None,
+    managed_seq: Callable[[], int] = lambda: 0,
+) -> None:
+    """Run the async front on WM_API_PORT and Flask on 127.0.0.1:WM_API_BACKEND_PORT."""
+    from libs.wsgi_server import APIServer, server_options
+
+    if web is None:
+        raise RuntimeError("WM_API_ASYNC=1 requires aiohttp (pip install aiohttp)")
+    options = server_options()
+    backend = APIServer(flask_app, {
+        "host": "127.0.0.1",
+        "port": env_int("WM_API_BACKEND_PORT", DEFAULT_BACKEND_PORT),
+    })
+    threading.Thread(target=backend.run, daemon=True, name="api-backend").start()
+    proxy = HAProxy(f"http://127.0.0.1:{backend.port}", managed_ids=managed_ids, managed_seq=managed_seq)
+    proxy_app = create_app(proxy)
+    print(
+        f"[API] async 프런트 시작 {options['host']}:{options['port']} "
+        f"-> {backend.backend} 127.0.0.1:{backend.port} threads={backend.options['threads']}"
+    )
+    try:
+        # SIGTERM/SIGINT 시 새 연결을 막고 처리 중인 요청을 shutdown_timeout 까지 기다린다.
+        web.run_app(
+            proxy_app,
+            host=options["host"],
+            port=options["port"],
+            shutdown_timeout=options["shutdown_timeout"],
+            print=None,
+        )
+    finally:
+        backend.tracker.wait_idle(options["shutdown_timeout"])
+        if on_shutdown is not None:
+            on_shutdown()
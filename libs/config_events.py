@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import queue
+import socket
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from libs import jsonfast
+
+DEFAULT_SOCKET_PATH = "resources/.config_events.sock"
+RECONNECT_DELAY_SEC = 3
+SEND_TIMEOUT_SEC = 0.5
+# 구독자가 접속 직후 보내는 {"subscribe": [resource...]} 줄을 기다리는 시간
+HELLO_TIMEOUT_SEC = 0.5
+# 보내기 대기 이벤트 수 상한 (넘치면 publish 가 0 을 돌려 호출자가 HA 이벤트로 대신 알린다)
+SEND_QUEUE_MAX = 1000
+
+Event = Dict[str, Any]
+
+
+def socket_path() -> str:
+    return os.path.abspath(os.environ.get("CONFIG_EVENTS_SOCKET") or DEFAULT_SOCKET_PATH)
+
+
+def make_event(resource: str, op: str, ids: Iterable[Any] = (), seq: Optional[int] = None) -> Event:
+    event: Event = {"resource": resource, "op": op, "ids": [i for i in ids if i is not None]}
+    if seq is not None:
+        event["seq"] = seq
+    return event
+
+
+class ConfigEventServer:
+    """Unix-domain socket pub/sub owned by the API process (wm-app).
+
+    구독자(룰 엔진, 알림, MQTT 워커)는 접속 직후 관심 리소스를 {"subscribe": [...]}
+    한 줄로 알리고, 설정이 바뀌면 해당 리소스의 한 줄짜리 JSON 이벤트
+    {"resource", "op", "ids", "seq"} 를 받는다.
+    HA websocket 이벤트 왕복 없이 로컬에서 바로 전달된다.
+    - 구독자별 hello 는 접속마다 별도 스레드에서 읽어, 조용한 구독자가 다른 구독자 등록을 막지 않는다.
+    - 실제 전송은 백그라운드 스레드가 하므로 publish 를 부르는 요청 스레드는 큐에 넣기만 한다.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path or socket_path()
+        self._sock: Optional[socket.socket] = None
+        # (소켓, 관심 리소스; None 이면 전체)
+        self._clients: List[Tuple[socket.socket, Optional[Set[str]]]] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._outbox: "queue.Queue[Optional[Tuple[bytes, list]]]" = queue.Queue(maxsize=SEND_QUEUE_MAX)
+        self._sender: Optional[threading.Thread] = None
+
+    def start(self) -> bool:
+        if self._sock is not None:
+            return True
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.bind(self.path)
+            sock.listen(16)
+        except OSError as e:
+            print(f"[CONFIG] 변경 알림 소켓 생성 실패 ({self.path}): {type(e).__name__} {e}")
+            return False
+        self._sock = sock
+        self._thread = threading.Thread(target=self._accept_loop, daemon=True, name="config-events")
+        self._thread.start()
+        self._sender = threading.Thread(target=self._send_loop, daemon=True, name="config-events-send")
+        self._sender.start()
+        return True
+
+    def _accept_loop(self) -> None:
+        while self._sock is not None:
+            try:
+                client, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._register, args=(client,), daemon=True, name="config-events-hello").start()
+
+    def _register(self, client: socket.socket) -> None:
+        resources = self._read_hello(client)
+        client.settimeout(SEND_TIMEOUT_SEC)
+        with self._lock:
+            if self._sock is None:
+                client.close()
+                return
+            self._clients.append((client, resources))
+
+    @staticmethod
+    def _read_hello(client: socket.socket) -> Optional[Set[str]]:
+        """Resource filter announced by the subscriber; None (= all) if it sends none."""
+        client.settimeout(HELLO_TIMEOUT_SEC)
+        data = b""
+        try:
+            while b"\n" not in data and len(data) < 4096:
+                chunk = client.recv(1024)
+                if not chunk:
+                    break
+                data += chunk
+            hello = jsonfast.loads(data.split(b"\n", 1)[0])
+        except (OSError, ValueError):
+            return None
+        resources = hello.get("subscribe") if isinstance(hello, dict) else None
+        return set(resources) if isinstance(resources, list) else None
+
+    def publish(self, event: Event) -> int:
+        """Queue ``event`` for subscribers of its resource; returns how many it was queued for.
+
+        전송은 백그라운드 스레드가 하므로 느린 구독자가 호출자를 막지 않는다.
+        """
+        line = jsonfast.dumpb(event) + b"\n"
+        resource = event.get("resource")
+        with self._lock:
+            clients = [entry for entry in self._clients if entry[1] is None or resource in entry[1]]
+        if not clients:
+            return 0
+        try:
+            self._outbox.put_nowait((line, clients))
+        except queue.Full:
+            print(f"[CONFIG] 변경 알림 전송 대기열이 가득 차서 버림: {resource}")
+            return 0
+        return len(clients)
+
+    def _send_loop(self) -> None:
+        while True:
+            item = self._outbox.get()
+            if item is None:
+                return
+            line, clients = item
+            self._send(line, clients)
+
+    def _send(self, line: bytes, clients: list) -> None:
+        # 느리거나 끊긴 구독자는 목록에서 뺀다.
+        for entry in clients:
+            client = entry[0]
+            try:
+                client.sendall(line)
+            except OSError:
+                # 구독자는 재접속하면서 전체를 다시 읽으므로 놓친 이벤트는 복구된다.
+                with self._lock:
+                    if entry in self._clients:
+                        self._clients.remove(entry)
+                client.close()
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._clients)
+
+    def close(self) -> None:
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            sock.close()
+        sender, self._sender = self._sender, None
+        if sender is not None:
+            self._outbox.put(None)
+            sender.join(timeout=SEND_TIMEOUT_SEC * 2)
+        with self._lock:
+            for client, _ in self._clients:
+                client.close()
+            self._clients = []
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+async def listen(
+    on_event: Callable[[Event], None],
+    on_resync: Optional[Callable[[], None]] = None,
+    path: Optional[str] = None,
+    resources: Optional[Iterable[str]] = None,
+) -> None:
+    """Subscribe forever; ``on_resync`` runs after every (re)connect.
+
+    접속이 끊긴 동안의 변경은 알 수 없으므로 재접속 직후 on_resync로 전체를 다시 읽는다.
+    """
+    path = path or socket_path()
+    wanted = set(resources) if resources is not None else None
+    while True:
+        try:
+            reader, writer = await asyncio.open_unix_connection(path)
+        except OSError:
+            await asyncio.sleep(RECONNECT_DELAY_SEC)
+            continue
+        try:
+            # 서버가 관심 리소스의 이벤트만 보내고 그 수만 배달 수로 센다.
+            hello = {"subscribe": sorted(wanted) if wanted is not None else None}
+            writer.write(jsonfast.dumpb(hello) + b"\n")
+            await writer.drain()
+            if on_resync is not None:
+                on_resync()
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    event = jsonfast.loads(line)
+                except ValueError:
+                    continue
+                if wanted is not None and event.get("resource") not in wanted:
+                    continue
+                try:
+                    on_event(event)
+                except Exception as e:
+                    print(f"[CONFIG] 변경 이벤트 처리 실패: {type(e).__name__} {e}")
+        except Exception as e:
+            print(f"[CONFIG] 변경 알림 연결 끊김: {type(e).__name__} {e}")
+        finally:
+            writer.close()
+        await asyncio.sleep(RECONNECT_DELAY_SEC)
+
+
+def start_listener(
+    on_event: Callable[[Event], None],
+    on_resync: Optional[Callable[[], None]] = None,
+    path: Optional[str] = None,
+    resources: Optional[Iterable[str]] = None,
+) -> threading.Thread:
+    """Run :func:`listen` on a daemon thread (asyncio 루프가 없는 프로세스용)."""
+    thread = threading.Thread(
+        target=lambda: asyncio.run(listen(on_event, on_resync, path, resources)),
+        daemon=True,
+        name="config-events-listener",
+    )
+    thread.start()
+    return thread
+
+
+_server: Optional[ConfigEventServer] = None
+
+
+def start_server(path: Optional[str] = None) -> ConfigEventServer:
+    global _server
+    if _server is None:
+        _server = ConfigEventServer(path)
+    _server.start()
+    return _server
+
+
+def stop_server() -> None:
+    global _server
+    if _server is not None:
+        _server.close()
+        _server = None
+
+
+def publish(resource: str, op: str, ids: Iterable[Any] = (), seq: Optional[int] = None) -> int:
+    if _server is None:
+        return 0
+    return _server.publish(make_event(resource, op, ids, seq))
@@ -0,0 +1,42 @@
+"""Environment variable parsing shared by wm-app, the workers and the libs.
+
+.env 값은 따옴표로 감싸 두는 경우가 많아서 앞뒤 공백/따옴표를 벗겨 읽는다.
+값이 없거나 숫자로 읽을 수 없으면 기본값을 쓴다.
+"""
+from __future__ import annotations
+
+import os
+from typing import Mapping, Optional
+
+
+def strip_quotes(value: str | None) -> str | None:
+    if value is None:
+        return None
+    normalized = value.strip().strip('"').strip("'")
+    return normalized or None
+
+
+def env_str(name: str, default: Optional[str] = None, env: Mapping[str, str] | None = None) -> Optional[str]:
+    source = env if env is not None else os.environ
+    value = strip_quotes(source.get(name))
+    return default if value is None else value
+
+
+def env_int(name: str, default: int, env: Mapping[str, str] | None = None) -> int:
+    raw = env_str(name, env=env)
+    if raw is None:
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        return default
+
+
+def env_float(name: str, default: float, env: Mapping[str, str] | None = None) -> float:
+    raw = env_str(name, env=env)
+    if raw is None:
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        return default
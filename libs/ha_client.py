@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import os
+import threading
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from libs.env import env_float, env_int
+
+
+DEFAULT_TIMEOUT_SEC = 10.0
+DEFAULT_POOL_MAXSIZE = 4
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF_FACTOR = 0.3
+# HA 재기동/과부하 시 잠깐 돌려주는 상태코드만 재시도한다.
+RETRY_STATUS_FORCELIST = (502, 503, 504)
+# 서비스 호출(POST)은 멱등이 아니므로 재시도 대상에서 제외한다.
+RETRY_ALLOWED_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class HAClient:
+    """Home Assistant REST client backed by one pooled keep-alive session."""
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        token: Optional[str] = None,
+        *,
+        pool_maxsize: Optional[int] = None,
+        timeout: Optional[float] = None,
+        retries: Optional[int] = None,
+        backoff_factor: Optional[float] = None,
+        default_pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+    ) -> None:
+        self.base_url = (base_url if base_url is not None else os.environ.get("HA_host") or "").rstrip("/")
+        self.token = token if token is not None else os.environ.get("hass_token")
+        self.pool_maxsize = max(1, pool_maxsize if pool_maxsize is not None else env_int(
+            "HA_HTTP_POOL_MAXSIZE", default_pool_maxsize
+        ))
+        self.timeout = timeout if timeout is not None else env_float(
+            "HA_HTTP_TIMEOUT_SEC", DEFAULT_TIMEOUT_SEC
+        )
+        self.retries = max(0, retries if retries is not None else env_int(
+            "HA_HTTP_RETRIES", DEFAULT_RETRIES
+        ))
+        self.backoff_factor = backoff_factor if backoff_factor is not None else env_float(
+            "HA_HTTP_BACKOFF_FACTOR", DEFAULT_BACKOFF_FACTOR
+        )
+
+        self._adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=Retry(
+                total=self.retries,
+                connect=self.retries,
+                read=self.retries,
+                status=self.retries,
+                backoff_factor=self.backoff_factor,
+                status_forcelist=RETRY_STATUS_FORCELIST,
+                allowed_methods=RETRY_ALLOWED_METHODS,
+                raise_on_status=False,
+            ),
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", self._adapter)
+        self.session.mount("https://", self._adapter)
+
+        self._lock = threading.Lock()
+        self._request_count = 0
+        self._error_count = 0
+
+    def url(self, path: str) -> str:
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        if not path.startswith("/"):
+            path = f"/{path}"
+        return f"{self.base_url}{path}"
+
+    def websocket_url(self) -> str:
+        if self.base_url.startswith("https://"):
+            return f"wss://{self.base_url[len('https://'):]}/api/websocket"
+        return f"ws://{self.base_url.replace('http://', '', 1)}/api/websocket"
+
+    def auth_headers(self) -> Dict[str, str]:
+        headers: Dict[str, str] = {}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        return headers
+
+    def request(self, method: str, path: str, **kwargs: Any) -> requests.Response:
+        headers = self.auth_headers()
+        headers.update(kwargs.pop("headers", None) or {})
+        kwargs.setdefault("timeout", self.timeout)
+        with self._lock:
+            self._request_count += 1
+        try:
+            return self.session.request(method, self.url(path), headers=headers, **kwargs)
+        except requests.RequestException:
+            with self._lock:
+                self._error_count += 1
+            raise
+
+    def get(self, path: str, **kwargs: Any) -> requests.Response:
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs: Any) -> requests.Response:
+        return self.request("POST", path, **kwargs)
+
+    def stats(self) -> Dict[str, int]:
+        """Return request and keep-alive connection reuse counters."""
+        connections_opened = 0
+        pool_requests = 0
+        pools = self._adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            try:
+                pool = pools[key]
+            except KeyError:
+                continue
+            connections_opened += pool.num_connections
+            pool_requests += pool.num_requests
+        with self._lock:
+            request_count = self._request_count
+            error_count = self._error_count
+        return {
+            "requests": request_count,
+            "errors": error_count,
+            "connections_opened": connections_opened,
+            "connections_reused": max(0, pool_requests - connections_opened),
+            "pool_maxsize": self.pool_maxsize,
+        }
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_client: Optional[HAClient] = None
+_client_lock = threading.Lock()
+
+
+def configure(**kwargs: Any) -> HAClient:
+    """Replace the process-wide client (프로세스별 pool 크기 지정용)."""
+    global _client
+    with _client_lock:
+        previous = _client
+        _client = HAClient(**kwargs)
+    if previous is not None:
+        previous.close()
+    return _client
+
+
+def get_client() -> HAClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = HAClient()
+    return _client
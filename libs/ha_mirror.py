@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from libs import ha_client, jsonfast
+
+RECONNECT_DELAY_SEC = 5
+SUBSCRIBE_ID = 1
+
+
+class HAMirror:
+    """entity_id -> latest HA state, seeded from /api/states and fed by state_changed events.
+
+    MQTT 워커(mqtt_pkg.state_mirror)와 룰 엔진/알림/스케줄러(libs.state_cache)가 같이 쓴다.
+    - 구독 이후에 seed 해야 그 사이 변경분을 놓치지 않는다.
+    - REST seed 는 blocking 호출이라 이벤트 루프가 아닌 executor 에서 돌린다.
+    - 연결이 끊기거나 seed 가 실패하면 ``is_synced`` 가 False 가 되어 호출부가 REST 로 돌아간다.
+    - ``resync_sec`` > 0 이면 그 주기로 전체를 다시 받아 놓친 이벤트를 바로잡는다.
+    """
+
+    def __init__(
+        self,
+        fetch_states: Callable[[], Optional[List[Dict[str, Any]]]],
+        ws_url: Optional[str] = None,
+        token: Optional[str] = None,
+        resync_sec: float = 0.0,
+        clock: Callable[[], float] = time.monotonic,
+        name: str = "ha-mirror",
+        log_prefix: str = "[HA][MIRROR]",
+    ) -> None:
+        self._fetch_states = fetch_states
+        self.ws_url = ws_url
+        self.token = token
+        self.resync_sec = max(0.0, resync_sec)
+        self._clock = clock
+        self._name = name
+        self._log_prefix = log_prefix
+
+        self._states: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Event()
+        self._version = 0
+        self._synced = False
+        self._synced_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def is_synced(self) -> bool:
+        return self._synced
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def seed(self, states: List[Dict[str, Any]]) -> None:
+        fresh: Dict[str, Dict[str, Any]] = {}
+        for item in states:
+            if isinstance(item, dict) and item.get("entity_id"):
+                fresh[str(item["entity_id"])] = item
+        with self._lock:
+            self._states = fresh
+            self._version += 1
+            self._synced = True
+            self._synced_at = self._clock()
+        self._changed.set()
+
+    def seed_from_rest(self) -> bool:
+        """Blocking /api/states seed; from a coroutine use :meth:`aseed_from_rest`."""
+        try:
+            states = self._fetch_states()
+        except Exception as exc:
+            print(f"{self._log_prefix} seed 실패: {type(exc).__name__} {exc}")
+            states = None
+        if states is None:
+            self.mark_disconnected()
+            return False
+        self.seed(states)
+        return True
+
+    async def aseed_from_rest(self) -> bool:
+        """:meth:`seed_from_rest` in the default executor so the event loop keeps receiving."""
+        return await asyncio.get_running_loop().run_in_executor(None, self.seed_from_rest)
+
+    def mark_disconnected(self) -> None:
+        self._synced = False
+
+    def needs_resync(self) -> bool:
+        """True when the last full sync is older than ``resync_sec``."""
+        return self._synced_at is None or self._clock() - self._synced_at >= self.resync_sec
+
+    def apply_event(self, event: Dict[str, Any]) -> bool:
+        """Apply one state_changed websocket message; returns True when the mirror changed."""
+        data = (event.get("event") or {}).get("data") or {}
+        entity_id = data.get("entity_id")
+        new_state = data.get("new_state")
+        if not entity_id and isinstance(new_state, dict):
+            entity_id = new_state.get("entity_id")
+        if not entity_id:
+            return False
+        entity_id = str(entity_id)
+
+        with self._lock:
+            if new_state is None:
+                if self._states.pop(entity_id, None) is None:
+                    return False
+            else:
+                current = self._states.get(entity_id)
+                # seed 직후 버퍼에 남아 있던 과거 이벤트가 최신 상태를 덮어쓰지 않게 한다.
+                if current is not None and str(new_state.get("last_updated") or "") < str(
+                    current.get("last_updated") or ""
+                ):
+                    return False
+                self._states[entity_id] = new_state
+            self._version += 1
+        self._changed.set()
+        return True
+
+    def get(self, entity_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._states.get(entity_id)
+
+    def put(self, entity_id: str, state: Dict[str, Any]) -> None:
+        """Remember a state fetched over REST for an entity the seed did not include."""
+        with self._lock:
+            self._states.setdefault(entity_id, state)
+
+    def wait_for_change(self, timeout: float) -> bool:
+        changed = self._changed.wait(timeout)
+        self._changed.clear()
+        return changed
+
+    def start(self) -> threading.Thread:
+        if self._thread is not None and self._thread.is_alive():
+            return self._thread
+        self._thread = threading.Thread(target=self._run_forever, daemon=True, name=self._name)
+        self._thread.start()
+        return self._thread
+
+    def _run_forever(self) -> None:
+        asyncio.run(self.run())
+
+    async def run(self) -> None:
+        """Keep the mirror synced from its own websocket connection (reconnects forever)."""
+        import websockets
+
+        while True:
+            try:
+                ws_url = self.ws_url or ha_client.get_client().websocket_url()
+                async with websockets.connect(ws_url, max_size=None) as websocket:
+                    await self._authenticate(websocket)
+                    await self._subscribe(websocket)
+                    if not await self.aseed_from_rest():
+                        raise RuntimeError("initial /api/states seed failed")
+                    print(f"{self._log_prefix} 동기화 완료: {len(self._states)}개 엔티티")
+                    await self._receive(websocket)
+            except Exception as exc:
+                self.mark_disconnected()
+                print(f"{self._log_prefix} 연결 끊김, {RECONNECT_DELAY_SEC}s 후 재시도: {type(exc).__name__} {exc}")
+                await asyncio.sleep(RECONNECT_DELAY_SEC)
+
+    async def _receive(self, websocket: Any) -> None:
+        timeout = self.resync_sec or None
+        while True:
+            try:
+                raw = await asyncio.wait_for(websocket.recv(), timeout=timeout)
+            except asyncio.TimeoutError:
+                raw = None
+            if self.resync_sec and self.needs_resync() and not await self.aseed_from_rest():
+                raise RuntimeError("periodic /api/states resync failed")
+            if raw is None:
+                continue
+            message = jsonfast.loads(raw)
+            if message.get("type") == "event":
+                self.apply_event(message)
+
+    async def _authenticate(self, websocket: Any) -> None:
+        token = self.token if self.token is not None else ha_client.get_client().token
+        await websocket.recv()  # auth_required
+        await websocket.send(json.dumps({"type": "auth", "access_token": token}))
+        reply = json.loads(await websocket.recv())
+        if reply.get("type") != "auth_ok":
+            raise RuntimeError(f"HA websocket auth failed: {reply.get('type')}")
+
+    async def _subscribe(self, websocket: Any) -> None:
+        await websocket.send(json.dumps({
+            "id": SUBSCRIBE_ID,
+            "type": "subscribe_events",
+            "event_type": "state_changed",
+        }))
+        # 구독이 실패했는데 seed 만 하고 synced 로 두면 오래된 상태를 계속 내보내게 된다.
+        while True:
+            reply = jsonfast.loads(await websocket.recv())
+            if reply.get("type") == "result" and reply.get("id") == SUBSCRIBE_ID:
+                break
+        if not reply.get("success"):
+            raise RuntimeError(f"subscribe_events failed: {reply.get('error')}")
@@ -0,0 +1,85 @@
+"""Fast JSON codec for hot paths, with a stdlib fallback.
+
+- orjson > msgspec > json 순서로 설치된 것을 쓴다. WM_JSON_BACKEND=json 으로 강제할 수 있다.
+- 출력은 백엔드와 상관없이 UTF-8, 공백 없는 compact 형식 (ensure_ascii=False 와 같음).
+- 디코드 실패는 json.JSONDecodeError (ValueError) 로 통일한다.
+- 빠른 백엔드가 못 다루는 값(64bit 초과 정수 등)은 stdlib 로 다시 인코딩한다.
+"""
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # orjson 은 선택 사항
+    orjson = None  # type: ignore
+
+try:
+    import msgspec
+except ImportError:  # msgspec 도 선택 사항
+    msgspec = None  # type: ignore
+
+
+def _pick_backend() -> str:
+    wanted = (os.getenv("WM_JSON_BACKEND") or "").strip().strip('"').lower()
+    available = [name for name, module in (("orjson", orjson), ("msgspec", msgspec)) if module is not None]
+    if wanted == "json":
+        return "json"
+    if wanted in available:
+        return wanted
+    return available[0] if available else "json"
+
+
+BACKEND = _pick_backend()
+
+if orjson is not None:
+    _ORJSON_OPTS = orjson.OPT_NON_STR_KEYS
+    _ORJSON_SORTED = orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS
+if msgspec is not None:
+    _MSGSPEC_ENCODER = msgspec.json.Encoder()
+    _MSGSPEC_DECODER = msgspec.json.Decoder()
+
+
+def _stdlib_dumpb(obj: Any, sort_keys: bool) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, sort_keys=sort_keys, separators=(",", ":")).encode("utf-8")
+
+
+def dumpb(obj: Any, sort_keys: bool = False) -> bytes:
+    """Encode ``obj`` to compact UTF-8 JSON bytes."""
+    try:
+        if BACKEND == "orjson":
+            return orjson.dumps(obj, option=_ORJSON_SORTED if sort_keys else _ORJSON_OPTS)
+        if BACKEND == "msgspec":
+            if sort_keys:
+                return msgspec.json.encode(obj, order="sorted")
+            return _MSGSPEC_ENCODER.encode(obj)
+    except (TypeError, ValueError, OverflowError):
+        pass
+    return _stdlib_dumpb(obj, sort_keys)
+
+
+def dumps(obj: Any, sort_keys: bool = False) -> str:
+    """Encode ``obj`` to a compact JSON str."""
+    return dumpb(obj, sort_keys).decode("utf-8")
+
+
+def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    """Decode JSON from str or bytes; raises json.JSONDecodeError on bad input."""
+    if BACKEND == "orjson":
+        return orjson.loads(data)  # orjson.JSONDecodeError 는 json.JSONDecodeError 의 하위 클래스
+    if BACKEND == "msgspec":
+        try:
+            return _MSGSPEC_DECODER.decode(data)
+        except msgspec.DecodeError as e:
+            doc = data if isinstance(data, str) else bytes(data).decode("utf-8", "replace")
+            raise json.JSONDecodeError(str(e), doc, 0) from None
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+def clone(obj: Any) -> Any:
+    """Deep copy of a JSON value (인코드/디코드 왕복이 copy.deepcopy 보다 빠르다)."""
+    return loads(dumpb(obj))
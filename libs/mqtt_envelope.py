@@ -0,0 +1,129 @@
+"""Compressed MQTT payload envelope (허브 인코딩 + 클라우드 디코딩 공용).
+
+표준 라이브러리만으로 동작하며(zstd 는 zstandard 가 있을 때만), 클라우드 Lambda 에
+이 파일 하나만 복사해서 ``unwrap(message_bytes)`` 로 원래 JSON 을 얻을 수 있다.
+
+- base64 형식: 작은 JSON 봉투. IoT Rule SQL 이 ``type``/``hub_id`` 로 라우팅할 수 있다.
+    {"type": ..., "hub_id": ..., "correlation_id": ...,
+     "content_encoding": "gzip", "content_type": "application/json",
+     "raw_size": 123456, "payload": "<base64(압축된 JSON)>"}
+- binary 형식: 압축 바이트 그대로 (base64 오버헤드 없음, 라우팅 필드도 없음).
+  gzip(1f 8b) / zstd(28 b5 2f fd) 매직 바이트로 구분한다.
+- 압축되지 않은 평범한 JSON 메시지도 unwrap 으로 그대로 읽힌다.
+"""
+from __future__ import annotations
+
+import base64
+import gzip
+import json
+from typing import Any, Dict, Iterable, Optional, Union
+
+try:
+    import zstandard
+except ImportError:  # zstd 는 선택 사항
+    zstandard = None  # type: ignore
+
+GZIP = "gzip"
+ZSTD = "zstd"
+FORMAT_BASE64 = "base64"
+FORMAT_BINARY = "binary"
+DEFAULT_LEVELS = {GZIP: 6, ZSTD: 3}
+# 인코딩별 허용 레벨 (MQTT_COMPRESS_LEVEL 하나를 두 인코딩에 같이 쓰므로 범위로 자른다)
+LEVEL_RANGES = {GZIP: (0, 9), ZSTD: (1, 22)}
+# 봉투에 복사하는 라우팅 필드
+META_KEYS = ("type", "hub_id", "correlation_id", "request_id")
+
+_MAGIC = {GZIP: b"\x1f\x8b", ZSTD: b"\x28\xb5\x2f\xfd"}
+
+
+def available_encodings() -> tuple:
+    return (ZSTD, GZIP) if zstandard is not None else (GZIP,)
+
+
+def negotiate(accept: Union[str, Iterable[str], None]) -> Optional[str]:
+    """First encoding in ``accept`` (list or "zstd, gzip") this side supports."""
+    if not accept:
+        return None
+    if isinstance(accept, str):
+        accept = accept.split(",")
+    supported = available_encodings()
+    for candidate in accept:
+        name = str(candidate).strip().lower()
+        if name in supported:
+            return name
+    return None
+
+
+def compress(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    level = DEFAULT_LEVELS.get(encoding) if level is None else clamp_level(encoding, level)
+    if encoding == GZIP:
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    if encoding == ZSTD:
+        if zstandard is None:
+            raise ValueError("zstd requires the zstandard package")
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    raise ValueError(f"unsupported content encoding: {encoding}")
+
+
+def clamp_level(encoding: str, level: int) -> int:
+    """``level`` limited to what ``encoding`` accepts (e.g. gzip 19 -> 9)."""
+    low, high = LEVEL_RANGES.get(encoding, (level, level))
+    return min(max(level, low), high)
+
+
+def decompress(data: bytes, encoding: str) -> bytes:
+    if encoding == GZIP:
+        return gzip.decompress(data)
+    if encoding == ZSTD:
+        if zstandard is None:
+            raise ValueError("zstd requires the zstandard package")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    raise ValueError(f"unsupported content encoding: {encoding}")
+
+
+def wrap(
+    payload_bytes: bytes,
+    encoding: str,
+    fmt: str = FORMAT_BASE64,
+    meta: Optional[Dict[str, Any]] = None,
+    level: Optional[int] = None,
+) -> bytes:
+    """Compress encoded JSON ``payload_bytes`` into the wire format."""
+    compressed = compress(payload_bytes, encoding, level)
+    if fmt == FORMAT_BINARY:
+        return compressed
+    envelope: Dict[str, Any] = {key: meta[key] for key in META_KEYS if meta and meta.get(key) is not None}
+    envelope.update({
+        "content_encoding": encoding,
+        "content_type": "application/json",
+        "raw_size": len(payload_bytes),
+        "payload": base64.b64encode(compressed).decode("ascii"),
+    })
+    return json.dumps(envelope, separators=(",", ":")).encode("utf-8")
+
+
+def unwrap(message: Union[bytes, bytearray, str]) -> Any:
+    """Decode any hub message (binary, base64 envelope or plain JSON) to its JSON value."""
+    if isinstance(message, str):
+        message = message.encode("utf-8")
+    data = bytes(message)
+    for encoding, magic in _MAGIC.items():
+        if data.startswith(magic):
+            return json.loads(decompress(data, encoding))
+    value = json.loads(data)
+    if isinstance(value, dict) and "content_encoding" in value and "payload" in value:
+        raw = decompress(base64.b64decode(value["payload"]), value["content_encoding"])
+        return json.loads(raw)
+    return value
+
+
+def topic_matches(pattern: str, topic: str) -> bool:
+    """MQTT topic filter match (``+`` one level, ``#`` the rest)."""
+    parts = pattern.split("/")
+    levels = topic.split("/")
+    for index, part in enumerate(parts):
+        if part == "#":
+            return True
+        if index >= len(levels) or (part != "+" and part != levels[index]):
+            return False
+    return len(parts) == len(levels)
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from libs import jsonfast
+
+
+class ResourceStore:
+    """In-memory view of one /local/api JSON list file (devices, rules, ...).
+
+    - 파일은 처음 한 번만 읽고, 이후 GET은 메모리에서 바로 응답한다.
+    - 다른 프로세스/사람이 파일을 바꾸면 (mtime, inode, size) 변화를 보고 다시 읽는다.
+    - 쓰기는 같은 디렉토리 임시 파일 + fsync + rename 으로 원자적으로 교체한다.
+    - 읽기/쓰기 결과는 캐시의 복사본이다. 호출부가 고쳐도 캐시와 파일이 어긋나지 않는다.
+    """
+
+    def __init__(self, path: str, key: str = "id") -> None:
+        self.path = path
+        self.key = key
+        self._lock = threading.RLock()
+        self._items: List[Dict[str, Any]] = []
+        self._index: Dict[Any, Dict[str, Any]] = {}
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._loaded = False
+
+    def _stat_signature(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_ino, st.st_size
+
+    def _set_items(self, items: List[Dict[str, Any]]) -> None:
+        self._items = items
+        self._index = {item.get(self.key): item for item in items if isinstance(item, dict)}
+
+    def _refresh(self) -> None:
+        signature = self._stat_signature()
+        if self._loaded and signature == self._signature:
+            return
+        items: List[Dict[str, Any]] = []
+        if signature is not None:
+            with open(self.path, "r", encoding="utf-8") as file:
+                content = file.read().strip()
+            # 막 생성된 빈 파일은 빈 목록으로 본다.
+            items = json.loads(content) if content else []
+        self._set_items(items)
+        self._signature = signature
+        self._loaded = True
+
+    def _write(self, items: List[Dict[str, Any]]) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                json.dump(items, file, indent=4, ensure_ascii=False)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        # 넘겨받은 항목을 그대로 캐시하면 호출부가 나중에 고친 내용이 캐시에만 남는다.
+        self._set_items(jsonfast.clone(items))
+        self._signature = self._stat_signature()
+
+    def change_seq(self) -> int:
+        """Cheap change marker for polling consumers (JSON 백엔드는 mtime_ns)."""
+        signature = self._stat_signature()
+        return signature[0] if signature else 0
+
+    # ---- 읽기 ----
+
+    def all(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._refresh()
+            return jsonfast.clone(self._items)
+
+    def get(self, value: Any) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._refresh()
+            return jsonfast.clone(self._index.get(value))
+
+    # ---- 쓰기 ----
+
+    def append(self, item: Dict[str, Any]) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._refresh()
+            self._write(self._items + [item])
+            return jsonfast.clone(self._items)
+
+    def delete(self, value: Any) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._refresh()
+            if value not in self._index:
+                return jsonfast.clone(self._items)
+            self._write([item for item in self._items if item.get(self.key) != value])
+            return jsonfast.clone(self._items)
+
+    def put(self, value: Any, item: Dict[str, Any]) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._refresh()
+            items = [i for i in self._items if i.get(self.key) != value] if value in self._index else list(self._items)
+            items.append(item)
+            self._write(items)
+            return jsonfast.clone(self._items)
+
+
+_stores: Dict[Tuple[str, str], Any] = {}
+_stores_lock = threading.Lock()
+
+
+def backend() -> str:
+    """RESOURCE_BACKEND=json (기본) | sqlite"""
+    return (os.environ.get("RESOURCE_BACKEND") or "json").strip().strip('"').lower()
+
+
+def get_store(path: str, key: str = "id") -> Any:
+    """Return the process-wide store for ``path`` (경로별로 하나만 만든다).
+
+    RESOURCE_BACKEND=sqlite 이면 같은 API의 SQLiteResourceStore를 돌려준다.
+    """
+    with _stores_lock:
+        store = _stores.get((path, key))
+        if store is None:
+            if backend() == "sqlite":
+                from libs.sqlite_store import SQLiteResourceStore
+
+                store = SQLiteResourceStore(path, key)
+            else:
+                store = ResourceStore(path, key)
+            _stores[(path, key)] = store
+        return store
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class _Flight:
+    """One in-progress upstream fetch that concurrent callers wait on."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class ResponseCache:
+    """Short-TTL cache for parsed HA proxy responses with single-flight fetches.
+
+    - 같은 key 로 동시에 들어온 요청은 upstream 을 한 번만 호출하고 결과를 나눠 갖는다.
+    - ttl 이 0 이면 저장하지 않지만 동시 요청 합치기는 그대로 한다.
+    - fetch 가 예외를 던지거나 cacheable(value) 가 False 이면 저장하지 않는다.
+    - 캐시된 값은 요청 사이에 공유되므로 호출자가 수정하면 안 된다.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic) -> None:
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> (만료 시각, 값)
+        self._entries: Dict[str, Tuple[float, Any]] = {}
+        self._flights: Dict[str, _Flight] = {}
+        # key 앞부분(":" 이전) 별 hit/miss/coalesced/errors
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, key: str, name: str) -> None:
+        group = key.split(":", 1)[0]
+        counters = self._stats.setdefault(group, {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0})
+        counters[name] += 1
+
+    def get_or_fetch(
+        self,
+        key: str,
+        ttl: float,
+        fetch: Callable[[], Any],
+        cacheable: Callable[[Any], bool] = lambda value: True,
+    ) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > self._clock():
+                self._count(key, "hits")
+                return entry[1]
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._count(key, "coalesced")
+                leader = False
+            else:
+                self._count(key, "misses")
+                flight = self._flights[key] = _Flight()
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = fetch()
+        except BaseException as e:
+            flight.error = e
+            with self._lock:
+                self._count(key, "errors")
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+                if flight.error is None and ttl > 0 and cacheable(flight.value):
+                    self._entries[key] = (self._clock() + ttl, flight.value)
+            flight.done.set()
+        return flight.value
+
+    def invalidate(self, prefix: str = "") -> int:
+        """Drop entries whose key starts with ``prefix``; returns the count."""
+        with self._lock:
+            keys = [key for key in self._entries if key.startswith(prefix)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = self._clock()
+            return {
+                "entries": sum(1 for expires, _ in self._entries.values() if expires > now),
+                "in_flight": len(self._flights),
+                "endpoints": {group: dict(counters) for group, counters in self._stats.items()},
+            }
@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from libs import jsonfast
+
+DEFAULT_DB_NAME = "matterhub.db"
+BUSY_TIMEOUT_MS = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    seq_no INTEGER PRIMARY KEY AUTOINCREMENT,
+    resource TEXT NOT NULL,
+    item_key TEXT,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_items_resource_key ON items (resource, item_key);
+CREATE TABLE IF NOT EXISTS resources (
+    resource TEXT PRIMARY KEY,
+    change_seq INTEGER NOT NULL DEFAULT 0,
+    migrated INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS changes (
+    change_seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    resource TEXT NOT NULL,
+    item_key TEXT,
+    op TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_changes_resource ON changes (resource, change_seq);
+"""
+
+
+def default_db_path(json_path: str) -> str:
+    return os.environ.get("RESOURCE_DB_PATH") or os.path.join(
+        os.path.dirname(os.path.abspath(json_path)), DEFAULT_DB_NAME
+    )
+
+
+def resource_name(json_path: str) -> str:
+    return os.path.splitext(os.path.basename(json_path))[0]
+
+
+def _key_text(value: Any) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+class _Database:
+    """One SQLite file in WAL mode, one connection per thread."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.connect().executescript(SCHEMA)
+
+    def connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None: 트랜잭션은 BEGIN IMMEDIATE로 직접 연다.
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+            self._local.conn = conn
+        return conn
+
+
+_databases: Dict[str, _Database] = {}
+_databases_lock = threading.Lock()
+
+
+def _database(path: str) -> _Database:
+    with _databases_lock:
+        db = _databases.get(path)
+        if db is None:
+            db = _databases[path] = _Database(path)
+        return db
+
+
+class SQLiteResourceStore:
+    """ResourceStore with the same list-of-dicts API, backed by SQLite (WAL).
+
+    - id/entity_id 조회는 (resource, item_key) 인덱스를 탄다.
+    - 쓰기는 BEGIN IMMEDIATE 트랜잭션이라 여러 프로세스가 동시에 써도 안전하다.
+    - 쓰기마다 change_seq 가 증가하며, change_seq() 로 싸게 변경 여부를 폴링할 수 있다.
+    - 처음 접근할 때 기존 JSON 파일 내용을 한 번 가져온다 (migrate).
+    """
+
+    def __init__(self, path: str, key: str = "id", db_path: Optional[str] = None) -> None:
+        self.path = path
+        self.key = key
+        self.resource = resource_name(path)
+        self.db = _database(db_path or default_db_path(path))
+        self._lock = threading.Lock()
+        self._cache: Optional[List[Dict[str, Any]]] = None
+        self._cache_seq = -1
+        self.migrate()
+
+    # ---- 변경 번호 ----
+
+    def change_seq(self) -> int:
+        row = self.db.connect().execute(
+            "SELECT change_seq FROM resources WHERE resource = ?", (self.resource,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def changes_since(self, seq: int) -> List[Tuple[int, Optional[str], str]]:
+        """Return (change_seq, item_key, op) written after ``seq``."""
+        return self.db.connect().execute(
+            "SELECT change_seq, item_key, op FROM changes WHERE resource = ? AND change_seq > ? "
+            "ORDER BY change_seq",
+            (self.resource, seq),
+        ).fetchall()
+
+    # ---- 마이그레이션 ----
+
+    def migrate(self, force: bool = False) -> int:
+        """Import the JSON file once; returns the number of imported items."""
+        conn = self.db.connect()
+        row = conn.execute("SELECT migrated FROM resources WHERE resource = ?", (self.resource,)).fetchone()
+        if row and row[0] and not force:
+            return 0
+        items: List[Dict[str, Any]] = []
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as file:
+                content = file.read().strip()
+            items = json.loads(content) if content else []
+        with self._transaction() as tx:
+            row = tx.execute("SELECT migrated FROM resources WHERE resource = ?", (self.resource,)).fetchone()
+            if row and row[0] and not force:
+                return 0
+            tx.execute("DELETE FROM items WHERE resource = ?", (self.resource,))
+            self._insert(tx, items)
+            tx.execute(
+                "INSERT INTO resources (resource, change_seq, migrated) VALUES (?, 0, 1) "
+                "ON CONFLICT(resource) DO UPDATE SET migrated = 1",
+                (self.resource,),
+            )
+            self._bump(tx, None, "migrate")
+        return len(items)
+
+    # ---- 읽기 ----
+
+    def all(self) -> List[Dict[str, Any]]:
+        seq = self.change_seq()
+        with self._lock:
+            if self._cache is not None and self._cache_seq == seq:
+                return jsonfast.clone(self._cache)
+        rows = self.db.connect().execute(
+            "SELECT body FROM items WHERE resource = ? ORDER BY seq_no", (self.resource,)
+        ).fetchall()
+        items = [json.loads(body) for (body,) in rows]
+        with self._lock:
+            self._cache = items
+            self._cache_seq = seq
+        return jsonfast.clone(items)
+
+    def get(self, value: Any) -> Optional[Dict[str, Any]]:
+        row = self.db.connect().execute(
+            "SELECT body FROM items WHERE resource = ? AND item_key = ? ORDER BY seq_no DESC LIMIT 1",
+            (self.resource, _key_text(value)),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    # ---- 쓰기 ----
+
+    def append(self, item: Dict[str, Any]) -> List[Dict[str, Any]]:
+        with self._transaction() as tx:
+            self._insert(tx, [item])
+            self._bump(tx, item.get(self.key), "append")
+        return self.all()
+
+    def delete(self, value: Any) -> List[Dict[str, Any]]:
+        with self._transaction() as tx:
+            cursor = tx.execute(
+                "DELETE FROM items WHERE resource = ? AND item_key = ?", (self.resource, _key_text(value))
+            )
+            if cursor.rowcount:
+                self._bump(tx, value, "delete")
+        return self.all()
+
+    def put(self, value: Any, item: Dict[str, Any]) -> List[Dict[str, Any]]:
+        with self._transaction() as tx:
+            tx.execute("DELETE FROM items WHERE resource = ? AND item_key = ?", (self.resource, _key_text(value)))
+            self._insert(tx, [item])
+            self._bump(tx, value, "put")
+        return self.all()
+
+    def _insert(self, tx: sqlite3.Connection, items: Iterable[Dict[str, Any]]) -> None:
+        tx.executemany(
+            "INSERT INTO items (resource, item_key, body) VALUES (?, ?, ?)",
+            [
+                (self.resource, _key_text(item.get(self.key)) if isinstance(item, dict) else None,
+                 json.dumps(item, ensure_ascii=False))
+                for item in items
+            ],
+        )
+
+    def _bump(self, tx: sqlite3.Connection, value: Any, op: str) -> None:
+        cursor = tx.execute(
+            "INSERT INTO changes (resource, item_key, op) VALUES (?, ?, ?)",
+            (self.resource, _key_text(value), op),
+        )
+        tx.execute(
+            "INSERT INTO resources (resource, change_seq) VALUES (?, ?) "
+            "ON CONFLICT(resource) DO UPDATE SET change_seq = excluded.change_seq",
+            (self.resource, cursor.lastrowid),
+        )
+
+    def _transaction(self) -> "_Transaction":
+        return _Transaction(self.db.connect())
+
+
+class _Transaction:
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.conn.execute("COMMIT")
+        else:
+            self.conn.execute("ROLLBACK")
+
+
+# /local/api 리소스 파일 환경변수 -> 조회 키
+RESOURCE_FILES = (
+    ("devices_file_path", "entity_id"),
+    ("rules_file_path", "id"),
+    ("schedules_file_path", "id"),
+    ("rooms_file_path", "id"),
+    ("notifications_file_path", "id"),
+)
+
+
+def main() -> None:
+    """One-shot migration: python -m libs.sqlite_store [--force]"""
+    import sys
+
+    from dotenv import load_dotenv
+
+    load_dotenv(dotenv_path=".env")
+    force = "--force" in sys.argv[1:]
+    for env_name, key in RESOURCE_FILES:
+        path = os.environ.get(env_name)
+        if not path:
+            continue
+        store = SQLiteResourceStore(path, key)
+        imported = store.migrate(force=force)
+        print(f"{store.resource}: {imported}개 항목 가져옴 -> {store.db.path}")
+
+
+if __name__ == "__main__":
+    main()
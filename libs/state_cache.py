@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from libs import ha_client, jsonfast
+from libs.env import env_float
+from libs.ha_mirror import HAMirror
+
+DEFAULT_MAX_AGE_SEC = 300.0
+
+
+def _fetch_state_via_rest(entity_id: str) -> Dict[str, Any]:
+    response = ha_client.get_client().get(f"/api/states/{entity_id}")
+    return jsonfast.loads(response.content)
+
+
+def _fetch_states_via_rest() -> Optional[List[Dict[str, Any]]]:
+    response = ha_client.get_client().get("/api/states")
+    if response.status_code != 200:
+        return None
+    states = jsonfast.loads(response.content)
+    return states if isinstance(states, list) else None
+
+
+class EntityStateCache(HAMirror):
+    """entity_id -> latest HA state dict, fed by state_changed websocket events.
+
+    조건 평가 시 REST 왕복 없이 캐시를 읽는다. 구독이 연결되어 있고 seed 이후
+    이벤트를 빠짐없이 받았다면 오래 조용한 엔티티(닫힌 문, 켜진 조명)도 최신이므로
+    항목 나이와 관계없이 캐시를 쓴다. 끊겼거나 seed 전이면 REST로 조회한다.
+    룰 엔진/알림은 자기 websocket 루프에서 :meth:`aseed_from_rest`/:meth:`apply_event` 를 부르고,
+    스케줄러는 :meth:`start` 로 자체 구독을 돌린다.
+    ``max_age_sec``: 자체 구독 루프의 전체 재동기화 주기. 0이면 캐시를 쓰지 않고 항상 REST로 조회한다.
+    """
+
+    def __init__(
+        self,
+        max_age_sec: Optional[float] = None,
+        fetch_state: Callable[[str], Dict[str, Any]] = _fetch_state_via_rest,
+        fetch_states: Callable[[], Optional[List[Dict[str, Any]]]] = _fetch_states_via_rest,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if max_age_sec is None:
+            max_age_sec = env_float("HA_STATE_CACHE_MAX_AGE_SEC", DEFAULT_MAX_AGE_SEC)
+        super().__init__(fetch_states, resync_sec=max_age_sec, clock=clock, name="ha-state-cache", log_prefix="상태 캐시")
+        self._fetch_state = fetch_state
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def max_age_sec(self) -> float:
+        return self.resync_sec
+
+    @property
+    def enabled(self) -> bool:
+        return self.resync_sec > 0
+
+    def seed_from_rest(self) -> bool:
+        """Seed from /api/states; call right after subscribing to state_changed."""
+        if not self.enabled:
+            return False
+        return super().seed_from_rest()
+
+    def lookup(self, entity_id: str) -> Optional[Dict[str, Any]]:
+        """Return the cached state while the subscription is synced, else None."""
+        if not self.enabled or not self._synced:
+            return None
+        return self.get(entity_id)
+
+    def get_state(self, entity_id: str) -> Dict[str, Any]:
+        """Cached state for condition evaluation, falling back to REST."""
+        state = self.lookup(entity_id)
+        if state is not None:
+            with self._lock:
+                self._hits += 1
+            return state
+
+        with self._lock:
+            self._misses += 1
+        state = self._fetch_state(entity_id)
+        if self.enabled and self._synced and isinstance(state, dict) and state.get("entity_id"):
+            self.put(entity_id, state)
+        return state
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entities": len(self._states),
+                "hits": self._hits,
+                "misses": self._misses,
+                "synced": int(self._synced),
+            }
+
+    def start(self) -> Optional[threading.Thread]:
+        """Keep the cache synced from its own websocket (이벤트 루프가 없는 프로세스용)."""
+        if not self.enabled:
+            return None
+        return super().start()
+
+
+_cache: Optional[EntityStateCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> EntityStateCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EntityStateCache()
+    return _cache
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set
+
+MAX_LIMIT = 1000
+
+# HTTP 쿼리 파라미터 / MQTT api 요청 필드 이름 (둘 다 같은 이름을 쓴다)
+QUERY_KEYS = ("domain", "entity_prefix", "managed_only", "attributes", "fields", "limit", "cursor")
+
+_TRUE = {"1", "true", "yes", "on"}
+
+
+@dataclass(frozen=True)
+class StateQuery:
+    """Filters / projection / paging for the HA state list.
+
+    - domain: 도메인 목록 (light, sensor ...)
+    - entity_prefix: entity_id 접두사 목록
+    - managed_only: devices.json 에 등록된 엔티티만
+    - attributes: attributes 화이트리스트 (None 이면 전체)
+    - fields: 최상위 필드 projection (entity_id 는 항상 포함)
+    - limit / cursor: entity_id 순 키셋 페이지네이션, cursor 는 이전 페이지의 next_cursor
+    """
+
+    domains: Optional[Set[str]] = None
+    prefixes: Optional[tuple] = None
+    managed_only: bool = False
+    attributes: Optional[Set[str]] = None
+    fields: Optional[Set[str]] = None
+    limit: Optional[int] = None
+    cursor: Optional[str] = None
+
+    @property
+    def paginated(self) -> bool:
+        return self.limit is not None or self.cursor is not None
+
+    @property
+    def is_empty(self) -> bool:
+        return self == StateQuery()
+
+
+def _values(source: Mapping[str, Any], name: str) -> List[str]:
+    """Collect ``a,b`` / repeated / list values for ``name``."""
+    if hasattr(source, "getlist"):
+        raw: Iterable[Any] = source.getlist(name)
+    else:
+        value = source.get(name)
+        if value is None:
+            raw = []
+        elif isinstance(value, (list, tuple, set)):
+            raw = value
+        else:
+            raw = [value]
+    values: List[str] = []
+    for item in raw:
+        for part in str(item).split(","):
+            part = part.strip()
+            if part:
+                values.append(part)
+    return values
+
+
+def _flag(source: Mapping[str, Any], name: str) -> bool:
+    value = source.get(name)
+    if isinstance(value, bool):
+        return value
+    return value is not None and str(value).strip().lower() in _TRUE
+
+
+def parse_query(source: Mapping[str, Any]) -> StateQuery:
+    """Build a :class:`StateQuery`; raises ``ValueError`` on bad limit."""
+    domains = _values(source, "domain")
+    prefixes = _values(source, "entity_prefix")
+    attributes = _values(source, "attributes")
+    fields = _values(source, "fields")
+
+    limit: Optional[int] = None
+    raw_limit = source.get("limit")
+    if raw_limit not in (None, ""):
+        try:
+            limit = int(raw_limit)
+        except (TypeError, ValueError):
+            raise ValueError(f"limit must be an integer: {raw_limit!r}") from None
+        if limit <= 0:
+            raise ValueError("limit must be positive")
+        limit = min(limit, MAX_LIMIT)
+
+    cursor = source.get("cursor")
+    return StateQuery(
+        domains=set(domains) or None,
+        prefixes=tuple(prefixes) or None,
+        managed_only=_flag(source, "managed_only"),
+        attributes=set(attributes) or None,
+        fields=(set(fields) | {"entity_id"}) if fields else None,
+        limit=limit,
+        cursor=str(cursor) if cursor not in (None, "") else None,
+    )
+
+
+def _project(state: Dict[str, Any], query: StateQuery) -> Dict[str, Any]:
+    if query.fields is not None:
+        item = {key: state[key] for key in query.fields if key in state}
+    else:
+        item = dict(state)
+    attrs = item.get("attributes")
+    if query.attributes is not None and isinstance(attrs, dict):
+        item["attributes"] = {key: attrs[key] for key in query.attributes if key in attrs}
+    return item
+
+
+def apply_query(
+    states: Iterable[Dict[str, Any]],
+    query: StateQuery,
+    managed_ids: Optional[Set[str]] = None,
+) -> Dict[str, Any]:
+    """Filter, page and project ``states``.
+
+    Returns ``{"items", "total", "next_cursor"}``. total 은 필터 후 전체 개수,
+    next_cursor 는 다음 페이지가 없으면 None.
+    """
+    selected: List[Dict[str, Any]] = []
+    for state in states:
+        if not isinstance(state, dict):
+            continue
+        entity_id = state.get("entity_id")
+        if not isinstance(entity_id, str):
+            continue
+        if query.domains is not None and entity_id.split(".", 1)[0] not in query.domains:
+            continue
+        if query.prefixes is not None and not entity_id.startswith(query.prefixes):
+            continue
+        if query.managed_only and (managed_ids is None or entity_id not in managed_ids):
+            continue
+        selected.append(state)
+
+    total = len(selected)
+    next_cursor: Optional[str] = None
+    if query.paginated:
+        # entity_id 는 유일하므로 정렬 후 cursor 뒤부터 자르면 중간에 상태가 바뀌어도 중복/누락이 없다.
+        selected.sort(key=lambda s: s["entity_id"])
+        if query.cursor is not None:
+            selected = [s for s in selected if s["entity_id"] > query.cursor]
+        if query.limit is not None and len(selected) > query.limit:
+            selected = selected[: query.limit]
+            next_cursor = selected[-1]["entity_id"]
+
+    return {
+        "items": [_project(state, query) for state in selected],
+        "total": total,
+        "next_cursor": next_cursor,
+    }
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import threading
+import uuid
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+MAX_TOMBSTONES = 2000
+
+
+def _fingerprint(state: Dict[str, Any]) -> Tuple[Any, Any]:
+    # HA 는 state 나 attributes 가 바뀌면 last_updated 를 갱신한다.
+    return state.get("state"), state.get("last_updated")
+
+
+class StateVersionTracker:
+    """Monotonic version of the HA state list, for ETag and ``changes?since=``.
+
+    - observe(): /api/states 응답을 받을 때마다 호출하면 엔티티별 지문을 비교해
+      바뀐 게 있을 때만 버전을 1 올린다.
+    - 버전 토큰은 "<epoch>-<n>" 형식이고 epoch 는 프로세스마다 새로 만든다.
+      재시작 전 토큰으로 요청하면 전체를 다시 받게 된다.
+    """
+
+    def __init__(self, epoch: Optional[str] = None, max_tombstones: int = MAX_TOMBSTONES) -> None:
+        self.epoch = epoch or uuid.uuid4().hex[:8]
+        self.max_tombstones = max_tombstones
+        self._lock = threading.Lock()
+        self._version = 0
+        # entity_id -> (지문, 마지막으로 바뀐 버전, 최신 state)
+        self._entities: Dict[str, Tuple[Tuple[Any, Any], int, Dict[str, Any]]] = {}
+        # 삭제된 entity_id -> 삭제된 버전
+        self._removed: Dict[str, int] = {}
+        # 이 버전 이전부터의 delta 는 삭제 기록이 잘려 정확하지 않다.
+        self._horizon = 0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def token(self, version: Optional[int] = None) -> str:
+        return f"{self.epoch}-{self._version if version is None else version}"
+
+    def parse_token(self, token: Optional[str]) -> Optional[int]:
+        """Version number for a token of this epoch, else None."""
+        if not token:
+            return None
+        epoch, _, number = str(token).strip().strip('"').rpartition("-")
+        if epoch != self.epoch:
+            return None
+        try:
+            version = int(number)
+        except ValueError:
+            return None
+        return version if 0 <= version <= self._version else None
+
+    def observe(self, states: Iterable[Dict[str, Any]]) -> int:
+        """Diff a full state list against the last one; returns the version."""
+        with self._lock:
+            next_version = self._version + 1
+            changed = False
+            seen = set()
+            for state in states:
+                if not isinstance(state, dict) or not isinstance(state.get("entity_id"), str):
+                    continue
+                entity_id = state["entity_id"]
+                seen.add(entity_id)
+                fingerprint = _fingerprint(state)
+                current = self._entities.get(entity_id)
+                if current is not None and current[0] == fingerprint:
+                    self._entities[entity_id] = (fingerprint, current[1], state)
+                    continue
+                self._entities[entity_id] = (fingerprint, next_version, state)
+                self._removed.pop(entity_id, None)
+                changed = True
+            for entity_id in [e for e in self._entities if e not in seen]:
+                del self._entities[entity_id]
+                self._removed[entity_id] = next_version
+                changed = True
+            if changed:
+                self._version = next_version
+                self._prune_tombstones()
+            return self._version
+
+    def _prune_tombstones(self) -> None:
+        overflow = len(self._removed) - self.max_tombstones
+        if overflow <= 0:
+            return
+        oldest = sorted(self._removed.items(), key=lambda item: item[1])[:overflow]
+        for entity_id, version in oldest:
+            del self._removed[entity_id]
+            self._horizon = max(self._horizon, version)
+
+    def changes_since(
+        self, since: Optional[int]
+    ) -> Tuple[int, bool, List[Dict[str, Any]], List[str]]:
+        """Return (version, full, changed states, removed entity_ids) after ``since``.
+
+        since 가 없거나 너무 오래됐으면 full=True 와 함께 전체 목록을 준다.
+        """
+        with self._lock:
+            if since is None or since < self._horizon:
+                return self._version, True, [entry[2] for entry in self._entities.values()], []
+            changed = [entry[2] for entry in self._entities.values() if entry[1] > since]
+            removed = [entity_id for entity_id, version in self._removed.items() if version > since]
+            return self._version, False, changed, removed
+
+
+def states_etag(token: str, query_string: bytes, managed_seq: Optional[int] = None) -> str:
+    """ETag for /local/api/states: state version + query (+ devices.json marker for managed_only)."""
+    tag = f"{token}-{zlib.crc32(query_string):08x}"
+    if managed_seq is not None:
+        # managed_only 응답은 devices.json 에도 의존하므로 그 변경 표시를 넣는다.
+        tag = f"{tag}-{managed_seq:x}"
+    return f'"{tag}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """RFC 7232 weak comparison of an If-None-Match header against ``etag``."""
+    if not if_none_match:
+        return False
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == wanted:
+            return True
+    return False
+
+
+_tracker: Optional[StateVersionTracker] = None
+_tracker_lock = threading.Lock()
+
+
+def get_tracker() -> StateVersionTracker:
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = StateVersionTracker()
+    return _tracker
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import operator
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+Matcher = Callable[[Any], bool]
+
+NUMERIC_OPERATORS: Dict[str, Callable[[float, float], bool]] = {
+    "greaterThan": operator.gt,
+    "greaterThanOrEquals": operator.ge,
+    "lessThan": operator.lt,
+    "lessThanOrEquals": operator.le,
+}
+
+
+def compile_comparison(option: Optional[str], target: Any) -> Matcher:
+    """Turn a rules.json trigger/condition comparison into a callable.
+
+    target 값의 float 변환은 여기서 한 번만 수행한다 (이벤트마다 반복하지 않음).
+    """
+    if option in (None, "", "equal"):
+        target_state = target
+
+        def _equals(state: Any) -> bool:
+            return state == target_state
+
+        return _equals
+
+    compare = NUMERIC_OPERATORS.get(str(option))
+    if compare is None:
+        raise ValueError(f"unsupported option: {option}")
+    target_value = float(target)
+
+    def _numeric(state: Any) -> bool:
+        try:
+            return compare(float(state), target_value)
+        except (TypeError, ValueError):
+            # unavailable/unknown 등 숫자가 아닌 상태는 불일치로 본다.
+            return False
+
+    return _numeric
+
+
+class TriggerIndex:
+    """entity_id -> [(matcher, entry)] dispatch table for rules/notifications."""
+
+    def __init__(self, entries: Iterable[Dict[str, Any]] = ()) -> None:
+        self._index: Dict[str, List[Tuple[Matcher, Dict[str, Any]]]] = {}
+        self.rebuild(entries)
+
+    def rebuild(self, entries: Iterable[Dict[str, Any]]) -> None:
+        # 새 테이블을 다 만든 뒤 한 번에 교체한다 (match 중인 스레드는 이전 테이블을 본다).
+        index: Dict[str, List[Tuple[Matcher, Dict[str, Any]]]] = {}
+        for entry in entries:
+            self._add_to(index, entry)
+        self._index = index
+
+    def add(self, entry: Dict[str, Any]) -> bool:
+        index = dict(self._index)
+        if not self._add_to(index, entry):
+            return False
+        self._index = index
+        return True
+
+    def remove(self, entry_id: Any) -> int:
+        """Drop every entry whose ``id`` equals ``entry_id``; returns the count."""
+        index: Dict[str, List[Tuple[Matcher, Dict[str, Any]]]] = {}
+        removed = 0
+        for entity_id, candidates in self._index.items():
+            kept = [c for c in candidates if c[1].get("id") != entry_id]
+            removed += len(candidates) - len(kept)
+            if kept:
+                index[entity_id] = kept
+        if removed:
+            self._index = index
+        return removed
+
+    @staticmethod
+    def _add_to(index: Dict[str, List[Tuple[Matcher, Dict[str, Any]]]], entry: Dict[str, Any]) -> bool:
+        if not entry.get("activate", True):
+            return False
+        try:
+            trigger = entry["trigger"]
+            matcher = compile_comparison(trigger.get("option", "equal"), trigger["state"])
+            entity_id = trigger["entity_id"]
+        except (KeyError, TypeError, ValueError, AttributeError) as exc:
+            print(f"트리거 컴파일 실패 (id={entry.get('id')}): {type(exc).__name__} {exc}")
+            return False
+        index[entity_id] = index.get(entity_id, []) + [(matcher, entry)]
+        return True
+
+    def match(self, entity_id: str, state: Any) -> List[Dict[str, Any]]:
+        candidates = self._index.get(entity_id)
+        if not candidates:
+            return []
+        return [entry for matcher, entry in candidates if matcher(state)]
+
+    def __contains__(self, entity_id: object) -> bool:
+        return entity_id in self._index
+
+    def __len__(self) -> int:
+        return sum(len(candidates) for candidates in self._index.values())
@@ -0,0 +1,499 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from libs.env import env_float, env_int
+
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_QUEUE = 1000
+DEFAULT_TIMEOUT_SEC = 5.0
+DEFAULT_MAX_ATTEMPTS = 6
+DEFAULT_BACKOFF_BASE_SEC = 1.0
+DEFAULT_BACKOFF_MAX_SEC = 300.0
+DEFAULT_POOL_MAXSIZE = 2
+DEFAULT_QUEUE_DIR = "resources/notify_queue"
+DEFAULT_STATS_INTERVAL_SEC = 60.0
+DEFAULT_BATCH_WINDOW_SEC = 2.0
+DEFAULT_BATCH_MAX_EVENTS = 50
+# 디스크 재시도 큐에 쓰는 필드 (headers 는 토큰이 들어 있어 쓰지 않는다)
+PERSISTED_KEYS = ("id", "url", "body", "attempt", "created_at", "next_attempt_at")
+# 수신 측 일시 장애로 보고 재시도하는 상태코드 (그 외 4xx는 재시도해도 같은 결과)
+RETRY_STATUS = frozenset({408, 425, 429})
+
+
+def backoff_delay(attempt: int, base: float, cap: float, rand: Callable[[], float] = random.random) -> float:
+    """Exponential backoff with jitter: [0.5, 1.0) x min(cap, base * 2**(attempt-1))."""
+    delay = min(cap, base * (2 ** max(0, attempt - 1)))
+    return delay * (0.5 + rand() / 2)
+
+
+class WebhookDispatcher:
+    """Bounded webhook delivery pool with a persistent retry queue.
+
+    - enqueue()는 디스크에 작업 파일을 쓰고 바로 반환한다 (websocket 루프를 막지 않음).
+    - worker ``workers`` 개가 due 시각 순으로 전송하고, 목적지(scheme://host)별로
+      keep-alive 세션을 따로 둔다.
+    - 실패하면 지터 백오프로 ``max_attempts`` 까지 재시도하고, 성공/포기 시 파일을 지운다.
+    - 재시작하면 ``queue_dir`` 에 남은 작업을 다시 읽어 이어서 보낸다.
+    - 인증 헤더는 디스크에 남기지 않는다. ``headers`` 가 전송할 때마다 환경에서 다시 만든다.
+    """
+
+    def __init__(
+        self,
+        queue_dir: Optional[str] = None,
+        workers: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        timeout: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        backoff_base_sec: Optional[float] = None,
+        backoff_max_sec: Optional[float] = None,
+        pool_maxsize: Optional[int] = None,
+        stats_interval_sec: Optional[float] = None,
+        headers: Optional[Callable[[], Dict[str, str]]] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.queue_dir = queue_dir or os.environ.get("NOTIFY_QUEUE_DIR") or DEFAULT_QUEUE_DIR
+        self.workers = max(1, workers if workers is not None else env_int("NOTIFY_WORKERS", DEFAULT_WORKERS))
+        self.max_queue = max(1, max_queue if max_queue is not None else env_int(
+            "NOTIFY_MAX_QUEUE", DEFAULT_MAX_QUEUE
+        ))
+        self.timeout = timeout if timeout is not None else env_float("NOTIFY_TIMEOUT_SEC", DEFAULT_TIMEOUT_SEC)
+        self.max_attempts = max(1, max_attempts if max_attempts is not None else env_int(
+            "NOTIFY_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS
+        ))
+        self.backoff_base_sec = backoff_base_sec if backoff_base_sec is not None else env_float(
+            "NOTIFY_BACKOFF_BASE_SEC", DEFAULT_BACKOFF_BASE_SEC
+        )
+        self.backoff_max_sec = backoff_max_sec if backoff_max_sec is not None else env_float(
+            "NOTIFY_BACKOFF_MAX_SEC", DEFAULT_BACKOFF_MAX_SEC
+        )
+        self.pool_maxsize = max(1, pool_maxsize if pool_maxsize is not None else env_int(
+            "NOTIFY_POOL_MAXSIZE", DEFAULT_POOL_MAXSIZE
+        ))
+        self.stats_interval_sec = max(0.0, stats_interval_sec if stats_interval_sec is not None else env_float(
+            "NOTIFY_STATS_INTERVAL_SEC", DEFAULT_STATS_INTERVAL_SEC
+        ))
+        self._headers = headers
+        self._clock = clock
+        self._last_stats_log = clock()
+
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[float, int, Dict[str, Any]]] = []
+        self._seq = itertools.count()
+        self._sessions: Dict[str, requests.Session] = {}
+        self._sessions_lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+
+        self._in_flight = 0
+        # enqueue 가 자리를 잡아 두고 lock 밖에서 디스크에 쓰는 중인 작업 수
+        self._reserved = 0
+        self._delivered = 0
+        self._retried = 0
+        self._failed = 0
+        self._rejected = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+        os.makedirs(self.queue_dir, exist_ok=True)
+
+    # ---- 큐 ----
+
+    def enqueue(self, url: str, payload: Any, headers: Optional[Dict[str, str]] = None) -> bool:
+        job = {
+            "id": uuid.uuid4().hex,
+            "url": url,
+            "body": json.dumps(payload),
+            "headers": dict(headers or {}),
+            "attempt": 0,
+            "created_at": self._clock(),
+        }
+        with self._cond:
+            # 검사와 자리 예약을 한 번의 lock 안에서 해야 동시 호출이 max_queue 를 넘지 않는다.
+            if self._pending_locked() >= self.max_queue:
+                self._rejected += 1
+                print(f"[NOTIFY] 전송 큐가 가득 차 알림을 버립니다: {url}")
+                return False
+            self._reserved += 1
+        # 디스크 IO 는 lock 밖에서 한다 (다른 enqueue/worker 가 기다리지 않게).
+        self._persist(job)
+        with self._cond:
+            self._reserved -= 1
+            heapq.heappush(self._heap, (self._clock(), next(self._seq), job))
+            self._cond.notify()
+        return True
+
+    def _pending_locked(self) -> int:
+        return len(self._heap) + self._in_flight + self._reserved
+
+    def load_pending(self) -> int:
+        """Re-queue jobs left on disk by a previous run, oldest first, up to ``max_queue``."""
+        jobs = []
+        for name in sorted(os.listdir(self.queue_dir)):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.queue_dir, name)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    job = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"[NOTIFY] 재시도 큐 파일을 읽지 못해 삭제합니다: {name} {type(e).__name__}")
+                self._remove_file(path)
+                continue
+            jobs.append(job)
+
+        jobs.sort(key=lambda job: float(job.get("created_at") or 0))
+        with self._cond:
+            room = max(0, self.max_queue - self._pending_locked())
+        for job in jobs[room:]:
+            self._remove_file(self._job_path(job))
+        if len(jobs) > room:
+            with self._cond:
+                self._rejected += len(jobs) - room
+            print(f"[NOTIFY] 재시도 큐가 max_queue({self.max_queue})를 넘어 {len(jobs) - room}건을 버립니다")
+        for job in jobs[:room]:
+            self._push(job, float(job.get("next_attempt_at") or 0))
+        return min(len(jobs), room)
+
+    def _push(self, job: Dict[str, Any], due: float) -> None:
+        with self._cond:
+            heapq.heappush(self._heap, (due, next(self._seq), job))
+            self._cond.notify()
+
+    def _job_path(self, job: Dict[str, Any]) -> str:
+        return os.path.join(self.queue_dir, f"{job['id']}.json")
+
+    def _persist(self, job: Dict[str, Any]) -> None:
+        path = self._job_path(job)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({key: job[key] for key in PERSISTED_KEYS if key in job}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # 디스크에 못 써도 메모리 큐로는 계속 전송한다.
+            print(f"[NOTIFY] 재시도 큐 저장 실패: {type(e).__name__} {e}")
+
+    def _remove_file(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    # ---- 전송 ----
+
+    def _session_for(self, url: str) -> requests.Session:
+        parts = urlsplit(url)
+        key = f"{parts.scheme}://{parts.netloc}"
+        with self._sessions_lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[key] = session
+            return session
+
+    def _headers_for(self, job: Dict[str, Any]) -> Dict[str, str]:
+        headers = dict(self._headers()) if self._headers is not None else {}
+        headers.update(job.get("headers") or {})
+        return headers
+
+    def deliver(self, job: Dict[str, Any]) -> bool:
+        """Send one job once; returns True on 2xx/3xx, raises nothing."""
+        try:
+            response = self._session_for(job["url"]).post(
+                job["url"], data=job["body"], headers=self._headers_for(job), timeout=self.timeout
+            )
+        except (requests.exceptions.MissingSchema, requests.exceptions.InvalidSchema,
+                requests.exceptions.InvalidURL) as e:
+            # 잘못된 URL은 재시도해도 같은 결과
+            job["last_error"] = f"{type(e).__name__}: {e}"
+            job["retryable"] = False
+            return False
+        except requests.RequestException as e:
+            job["last_error"] = f"{type(e).__name__}: {e}"
+            job["retryable"] = True
+            return False
+        if response.status_code < 400:
+            return True
+        job["last_error"] = f"HTTP {response.status_code}"
+        job["retryable"] = response.status_code >= 500 or response.status_code in RETRY_STATUS
+        return False
+
+    def process(self, job: Dict[str, Any]) -> None:
+        started = self._clock()
+        ok = self.deliver(job)
+        latency = self._clock() - started
+        job["attempt"] = int(job.get("attempt", 0)) + 1
+
+        with self._cond:
+            self._latency_total += latency
+            self._latency_max = max(self._latency_max, latency)
+            if ok:
+                self._delivered += 1
+
+        if ok:
+            self._remove_file(self._job_path(job))
+            return
+
+        if job.pop("retryable", False) and job["attempt"] < self.max_attempts:
+            due = self._clock() + backoff_delay(job["attempt"], self.backoff_base_sec, self.backoff_max_sec)
+            job["next_attempt_at"] = due
+            self._persist(job)
+            with self._cond:
+                self._retried += 1
+            self._push(job, due)
+            return
+
+        with self._cond:
+            self._failed += 1
+        print(f"[NOTIFY] 전송 포기 ({job['attempt']}회): {job['url']} {job.get('last_error')}")
+        self._remove_file(self._job_path(job))
+
+    def _next_due_job(self) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            while not self._stopping:
+                if self._heap:
+                    due = self._heap[0][0]
+                    wait = due - self._clock()
+                    if wait <= 0:
+                        _, _, job = heapq.heappop(self._heap)
+                        self._in_flight += 1
+                        return job
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait()
+            return None
+
+    def _worker(self) -> None:
+        while True:
+            job = self._next_due_job()
+            if job is None:
+                return
+            try:
+                self.process(job)
+            except Exception as e:
+                print(f"[NOTIFY] 전송 worker 오류: {type(e).__name__} {e}")
+            finally:
+                with self._cond:
+                    self._in_flight -= 1
+                    self._cond.notify_all()
+                self._maybe_log_stats()
+
+    def _maybe_log_stats(self) -> None:
+        if not self.stats_interval_sec:
+            return
+        now = self._clock()
+        with self._cond:
+            if now - self._last_stats_log < self.stats_interval_sec:
+                return
+            self._last_stats_log = now
+        s = self.stats()
+        print(
+            f"[NOTIFY] queue={s['queue_depth']} in_flight={s['in_flight']} delivered={s['delivered']} "
+            f"retried={s['retried']} failed={s['failed']} rejected={s['rejected']} "
+            f"latency_avg={s['latency_avg_sec']:.3f}s latency_max={s['latency_max_sec']:.3f}s"
+        )
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        loaded = self.load_pending()
+        if loaded:
+            print(f"[NOTIFY] 재시도 큐에서 {loaded}건 복구")
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, daemon=True, name=f"notify-{i}")
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        with self._sessions_lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            attempts = self._delivered + self._failed + self._retried
+            return {
+                "queue_depth": len(self._heap),
+                "in_flight": self._in_flight,
+                "delivered": self._delivered,
+                "retried": self._retried,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "destinations": len(self._sessions),
+                "latency_avg_sec": (self._latency_total / attempts) if attempts else 0.0,
+                "latency_max_sec": self._latency_max,
+            }
+
+
+def batch_options(raw: Any) -> Optional[Tuple[float, int, bool]]:
+    """Parse a notification's ``action.batch`` into (window_sec, max_events, dedup).
+
+    ``true`` 면 기본값, dict면 {"window_sec", "max_events", "dedup"} 를 읽는다.
+    없거나 false면 None (기존처럼 이벤트마다 즉시 전송).
+    """
+    if raw is True:
+        raw = {}
+    if not isinstance(raw, dict):
+        return None
+    try:
+        window_sec = max(0.0, float(raw.get("window_sec", DEFAULT_BATCH_WINDOW_SEC)))
+        max_events = max(1, int(raw.get("max_events", DEFAULT_BATCH_MAX_EVENTS)))
+    except (TypeError, ValueError):
+        return None
+    return window_sec, max_events, bool(raw.get("dedup", False))
+
+
+def transition_key(event: Dict[str, Any]) -> Tuple[Any, Any, Any]:
+    data = (event.get("event") or {}).get("data") or {}
+    old_state = data.get("old_state") or {}
+    new_state = data.get("new_state") or {}
+    return data.get("entity_id") or new_state.get("entity_id"), old_state.get("state"), new_state.get("state")
+
+
+class WebhookBatcher:
+    """Coalesce notification events per URL into one JSON-array POST.
+
+    버퍼는 (URL, window_sec, max_events, dedup) 별로 따로 두어 알림마다 고른
+    배치 옵션이 같은 URL의 다른 알림에 섞이지 않는다. 각 버퍼는 첫 이벤트가 들어온 뒤
+    ``window_sec`` 가 지나거나 ``max_events`` 에 도달하면 ``send(url, [events...], headers)``
+    로 한 번에 보낸다.
+    ``dedup`` 이면 한 배치 안에서 같은 (entity_id, old, new) 전이는 한 번만 담는다.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str, Any, Dict[str, str]], Any],
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._send = send
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._buffers: Dict[Tuple[str, float, int, bool], Dict[str, Any]] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+        self._events_in = 0
+        self._deduped = 0
+        self._batches_sent = 0
+
+    def add(
+        self,
+        url: str,
+        event: Dict[str, Any],
+        headers: Dict[str, str],
+        window_sec: float,
+        max_events: int,
+        dedup: bool = False,
+    ) -> None:
+        ready = None
+        with self._cond:
+            self._events_in += 1
+            key = (url, window_sec, max_events, dedup)
+            buffer = self._buffers.get(key)
+            if buffer is None:
+                buffer = self._buffers[key] = {
+                    "url": url,
+                    "events": [],
+                    "seen": set(),
+                    "headers": headers,
+                    "deadline": self._clock() + window_sec,
+                }
+                self._cond.notify()
+            if dedup:
+                transition = transition_key(event)
+                if transition in buffer["seen"]:
+                    self._deduped += 1
+                    return
+                buffer["seen"].add(transition)
+            buffer["events"].append(event)
+            if len(buffer["events"]) >= max_events:
+                ready = self._buffers.pop(key)
+        if ready is not None:
+            self._emit(ready)
+
+    def flush_due(self, now: Optional[float] = None) -> int:
+        now = self._clock() if now is None else now
+        with self._cond:
+            due = [key for key, buffer in self._buffers.items() if buffer["deadline"] <= now]
+            ready = [self._buffers.pop(key) for key in due]
+        for buffer in ready:
+            self._emit(buffer)
+        return len(ready)
+
+    def flush_all(self) -> int:
+        with self._cond:
+            ready = list(self._buffers.values())
+            self._buffers = {}
+        for buffer in ready:
+            self._emit(buffer)
+        return len(ready)
+
+    def _emit(self, buffer: Dict[str, Any]) -> None:
+        with self._cond:
+            self._batches_sent += 1
+        try:
+            self._send(buffer["url"], buffer["events"], buffer["headers"])
+        except Exception as e:
+            print(f"[NOTIFY] 배치 전송 실패: {buffer['url']} {type(e).__name__} {e}")
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if self._stopping:
+                    return
+                if self._buffers:
+                    deadline = min(buffer["deadline"] for buffer in self._buffers.values())
+                    wait = deadline - self._clock()
+                    if wait > 0:
+                        self._cond.wait(wait)
+                else:
+                    self._cond.wait()
+            self.flush_due()
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True, name="notify-batcher")
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush_all()
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                "buffered_urls": len(self._buffers),
+                "buffered_events": sum(len(buffer["events"]) for buffer in self._buffers.values()),
+                "events_in": self._events_in,
+                "deduped": self._deduped,
+                "batches_sent": self._batches_sent,
+            }
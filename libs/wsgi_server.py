@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import signal
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional
+
+from libs.env import env_float, env_int, env_str
+
+DEFAULT_HOST = "0.0.0.0"
+DEFAULT_PORT = 8100
+DEFAULT_THREADS = 8
+DEFAULT_CONNECTION_LIMIT = 100
+DEFAULT_SHUTDOWN_TIMEOUT_SEC = 10.0
+
+
+def server_options(env: Mapping[str, str] | None = None) -> Dict[str, Any]:
+    """WM_API_* 환경변수에서 서버 설정을 읽는다."""
+    return {
+        "host": env_str("WM_API_HOST", DEFAULT_HOST, env),
+        "port": env_int("WM_API_PORT", DEFAULT_PORT, env),
+        "threads": max(1, env_int("WM_API_THREADS", DEFAULT_THREADS, env)),
+        "connection_limit": max(1, env_int("WM_API_CONNECTION_LIMIT", DEFAULT_CONNECTION_LIMIT, env)),
+        "shutdown_timeout": max(0.0, env_float("WM_API_SHUTDOWN_TIMEOUT_SEC", DEFAULT_SHUTDOWN_TIMEOUT_SEC, env)),
+        "backend": env_str("WM_API_SERVER", "waitress", env).lower(),
+    }
+
+
+class InflightTracker:
+    """WSGI middleware counting requests that have not finished yet."""
+
+    def __init__(self, app: Callable) -> None:
+        self.app = app
+        self._active = 0
+        self._cond = threading.Condition()
+
+    @property
+    def active(self) -> int:
+        with self._cond:
+            return self._active
+
+    def __call__(self, environ: Dict[str, Any], start_response: Callable) -> Iterable[bytes]:
+        with self._cond:
+            self._active += 1
+        try:
+            body = self.app(environ, start_response)
+        except BaseException:
+            self._done()
+            raise
+        return _ClosingIterator(body, self._done)
+
+    def _done(self) -> None:
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def wait_idle(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._active > 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+
+class _ClosingIterator:
+    """Streams the body and reports completion once the server closes it."""
+
+    def __init__(self, body: Iterable[bytes], on_close: Callable[[], None]) -> None:
+        self._body = body
+        self._iter = iter(body)
+        self._on_close = on_close
+        self._closed = False
+
+    def __iter__(self) -> "_ClosingIterator":
+        return self
+
+    def __next__(self) -> bytes:
+        return next(self._iter)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            close = getattr(self._body, "close", None)
+            if close is not None:
+                close()
+        finally:
+            self._on_close()
+
+
+class APIServer:
+    """Threaded production WSGI server for the Flask API (wm-app).
+
+    - 기본 백엔드는 waitress (순수 파이썬, 스레드 풀). 없으면 werkzeug 스레드 서버로 대체한다.
+    - 백그라운드 작업(스케줄러 등)은 이 프로세스에서 한 번만 띄우고, 요청은 스레드가 처리한다.
+    - 종료 시 새 연결을 받지 않고, 처리 중인 요청은 shutdown_timeout 까지 기다린다.
+      waitress 는 응답 바이트를 이벤트 루프가 소켓으로 내보내므로, 리스닝 소켓만 닫고
+      루프를 계속 돌려 처리 중인 요청의 응답이 모두 전송된 뒤에 멈춘다.
+      이 부분은 waitress 내부 구조(_map, channel outbuf)에 기대므로 requirements.txt 에서
+      waitress 버전을 고정해 둔다.
+    """
+
+    def __init__(self, app: Callable, options: Optional[Dict[str, Any]] = None) -> None:
+        self.options = dict(server_options())
+        self.options.update(options or {})
+        self.tracker = InflightTracker(app)
+        self.backend = self.options["backend"]
+        self._server: Any = None
+        self._stopping = threading.Event()
+        if self.backend == "waitress":
+            try:
+                from waitress.server import create_server
+            except ImportError:
+                print("[API] waitress 미설치, werkzeug 스레드 서버로 실행합니다 (pip install waitress 권장)")
+                self.backend = "werkzeug"
+            else:
+                self._server = create_server(
+                    self.tracker,
+                    host=self.options["host"],
+                    port=self.options["port"],
+                    threads=self.options["threads"],
+                    connection_limit=self.options["connection_limit"],
+                    ident="matterhub-api",
+                )
+        if self.backend != "waitress":
+            from werkzeug.serving import make_server
+
+            self.backend = "werkzeug"
+            self._server = make_server(self.options["host"], self.options["port"], self.tracker, threaded=True)
+
+    @property
+    def port(self) -> int:
+        if self.backend == "waitress":
+            return self._server.effective_port
+        return self._server.server_port
+
+    def run(self) -> None:
+        """Serve until :meth:`stop` (:func:`serve` 는 SIGTERM/SIGINT 에서 stop 을 부른다)."""
+        if self.backend == "waitress":
+            while not self._stopping.is_set():
+                self._poll_waitress(self._server.adj.asyncore_loop_timeout)
+        else:
+            self._server.serve_forever()
+
+    def stop(self) -> None:
+        """Ask :meth:`run` to return; safe to call from a signal handler."""
+        self._stopping.set()
+        if self.backend != "waitress":
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+
+    def _poll_waitress(self, timeout: float) -> None:
+        server = self._server
+        server.asyncore.loop(timeout=timeout, map=server._map, use_poll=server.adj.asyncore_use_poll, count=1)
+
+    def _waitress_idle(self) -> bool:
+        # 앱 처리가 끝났고 각 연결의 출력 버퍼도 소켓으로 다 나갔는지 본다.
+        if self.tracker.active:
+            return False
+        return all(
+            not channel.requests and not channel.total_outbufs_len
+            for channel in list(self._server.active_channels.values())
+        )
+
+    def _close_waitress(self, timeout: float) -> bool:
+        server = self._server
+        # 리스닝 소켓만 닫는다 (trigger 는 응답 전송을 깨우는 데 계속 필요하다).
+        server.asyncore.dispatcher.close(server)
+        deadline = time.monotonic() + timeout
+        while not self._waitress_idle():
+            if time.monotonic() >= deadline:
+                break
+            self._poll_waitress(0.05)
+        drained = self._waitress_idle()
+        server.task_dispatcher.shutdown(cancel_pending=False, timeout=max(0.0, deadline - time.monotonic()))
+        server.asyncore.close_all(server._map)
+        return drained
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """Stop listening and wait for in-flight requests; True if all finished."""
+        if timeout is None:
+            timeout = self.options["shutdown_timeout"]
+        if self.backend == "waitress":
+            # run() 과 같은 스레드에서 불러야 한다 (asyncore 맵은 스레드 안전하지 않음).
+            return self._close_waitress(timeout)
+        self._server.server_close()
+        return self.tracker.wait_idle(timeout)
+
+
+def serve(app: Callable, options: Optional[Dict[str, Any]] = None, on_shutdown: Optional[Callable[[], None]] = None) -> None:
+    """Run :class:`APIServer` in the main thread with graceful SIGTERM handling."""
+    server = APIServer(app, options)
+
+    def _terminate(signum, frame):
+        # 플래그만 세운다: run() 루프가 빠져나온 뒤 close() 가 남은 응답을 마저 보낸다.
+        server.stop()
+
+    signal.signal(signal.SIGTERM, _terminate)
+    # Ctrl+C 도 같은 경로로: KeyboardInterrupt 가 asyncore poll 도중에 터지지 않게 한다.
+    signal.signal(signal.SIGINT, _terminate)
+    print(
+        f"[API] {server.backend} 서버 시작 {server.options['host']}:{server.port} "
+        f"threads={server.options['threads']}"
+    )
+    try:
+        server.run()
+    except (SystemExit, KeyboardInterrupt):
+        pass
+    finally:
+        print(f"[API] 종료 중: 처리 중인 요청 {server.tracker.active}건 대기 (최대 {server.options['shutdown_timeout']}s)")
+        drained = server.close()
+        if not drained:
+            print(f"[API] 종료 대기 시간 초과, 남은 요청 {server.tracker.active}건")
+        if on_shutdown is not None:
+            on_shutdown()
@@ -3,11 +3,16 @@ from __future__ import annotations
 import time
 from typing import Callable, Dict, Iterable, List, Optional
 
+from libs import config_events, ha_client
 from libs.device_binding import enforce_mac_binding
-from mqtt_pkg import callbacks, runtime, settings, state, test_subscriber, update
+from mqtt_pkg import callbacks, publisher, runtime, settings, state, test_subscriber, update
 from mqtt_pkg.runtime import AWSIoTClient
 
 
+STATE_TICK_SEC = 5
+CONNECTION_CHECK_INTERVAL_SEC = 60
+
+
 def log_matterhub_status() -> None:
     if settings.MATTERHUB_ID:
         print(f"matterhub_id 로드됨: {settings.MATTERHUB_ID}")
@@ -120,6 +125,18 @@ def log_startup_report(aws_client: AWSIoTClient, topics: Iterable[str]) -> None:
         print(line)
 
 
+def log_publish_stats() -> None:
+    stats = publisher.pipeline_stats()
+    if stats is None:
+        return
+    print(
+        "[MQTT][QUEUE] "
+        f"depth={stats['queue_depth']} in_flight={stats['in_flight']} "
+        f"qos1={stats['qos1']} qos0_fallback={stats['qos0_fallback']} timeouts={stats['timeouts']} "
+        f"dropped={stats['dropped']} puback_avg_ms={stats['puback_avg_ms']} puback_ms={stats['puback_ms']}"
+    )
+
+
 def _ensure_cert_symlinks() -> None:
     """certificates/ 디렉토리의 심링크 자동 생성."""
     import os
@@ -145,6 +162,11 @@ def main() -> None:
 
     log_matterhub_status()
     _ensure_cert_symlinks()
+    ha_client.configure(
+        base_url=settings.HA_HOST,
+        token=settings.HASS_TOKEN,
+        default_pool_maxsize=2,
+    )
     update.start_queue_worker()
 
     aws_client = AWSIoTClient()
@@ -165,27 +187,31 @@ def main() -> None:
     )
 
     state.publish_bootstrap_all_states()
-    state.publish_device_states_bulk()
-    state.check_and_publish_alerts()
+    state.start_state_mirror()
+    startup_snapshot = state.get_state_snapshot()
+    if startup_snapshot is not None:
+        state.publish_device_states_bulk(startup_snapshot)
+        state.check_and_publish_alerts(startup_snapshot)
     test_subscriber.start_test_subscriber_if_enabled()
+    config_events.start_listener(state.on_config_event, resources=["devices"])
 
     try:
-        connection_check_counter = 0
+        last_connection_check = time.monotonic()
         while True:
-            state.publish_device_state()
-            state.publish_device_states_bulk()
-            state.check_and_publish_alerts()
-            connection_check_counter += 1
-            if connection_check_counter >= 12:
+            state.run_state_tick()
+            if time.monotonic() - last_connection_check >= CONNECTION_CHECK_INTERVAL_SEC:
                 runtime.check_mqtt_connection(
                     build_subscribe_topics(),
                     callbacks.mqtt_callback,
                     lambda: aws_client,
                 )
-                connection_check_counter = 0
-            time.sleep(5)
+                log_publish_stats()
+                last_connection_check = time.monotonic()
+            # websocket 모드에서는 HA 상태 변경 시 즉시 깨어난다.
+            state.wait_for_state_change(STATE_TICK_SEC)
     except KeyboardInterrupt:
         print("프로그램 종료")
+        publisher.flush(timeout=settings.MQTT_PUBLISH_TIMEOUT_SEC)
         current_connection = runtime.get_connection()
         if current_connection:
             current_connection.disconnect()
@@ -5,7 +5,14 @@ from typing import Any, Dict, Optional
 
 import requests
 
-from . import publisher, settings, update
+from libs import jsonfast
+from libs.state_query import QUERY_KEYS, parse_query
+
+from . import chunking, publisher, settings, state, update
+
+
+# publish_raw 로 보낼 때 봉투(type/correlation_id/etag 등)에 남겨 두는 여유
+RAW_ENVELOPE_MARGIN_BYTES = 1024
 
 
 def handle_states_request(
@@ -15,9 +22,13 @@ def handle_states_request(
     try:
         correlation_id: Optional[str] = None
         entity_id: Optional[str] = None
+        query_params: Dict[str, Any] = {}
+        since: Optional[str] = None
+        if_none_match: Optional[str] = None
+        accept_encoding: Any = None
         if payload_bytes:
             try:
-                message = json.loads(payload_bytes.decode("utf-8"))
+                message = jsonfast.loads(payload_bytes.decode("utf-8"))
             except (json.JSONDecodeError, UnicodeDecodeError, AttributeError):
                 publisher.publish_error(
                     None,
@@ -50,6 +61,16 @@ def handle_states_request(
             if payload_response_topic and str(payload_response_topic).strip():
                 response_topic = str(payload_response_topic).strip()
 
+            # 전체 조회 필터/페이지 옵션 (/local/api/states 쿼리와 같은 이름)
+            query_params = {key: message[key] for key in QUERY_KEYS if message.get(key) is not None}
+            # since: 변경분만 조회, if_none_match: 이전 응답의 etag 와 같으면 본문 없이 응답
+            if message.get("since") is not None:
+                since = str(message["since"])
+            if message.get("if_none_match"):
+                if_none_match = str(message["if_none_match"])
+            # accept_encoding: ["zstd", "gzip"] 이면 응답을 압축 봉투로 보낸다 (libs/mqtt_envelope)
+            accept_encoding = message.get("accept_encoding")
+
             entity = message.get("entity_id")
             if entity is not None and str(entity).strip():
                 entity_id = str(entity).strip()
@@ -84,7 +105,7 @@ def handle_states_request(
                     }
                     if settings.MATTERHUB_ID:
                         payload["hub_id"] = settings.MATTERHUB_ID
-                    publisher.publish(payload, response_topic=response_topic)
+                    publisher.publish(payload, response_topic=response_topic, accept_encoding=accept_encoding)
                     print(f"[MQTT][RESPONSE] 단일 조회: {entity_id}")
                     return
 
@@ -112,11 +133,42 @@ def handle_states_request(
             return
 
         try:
+            query = parse_query(query_params)
+        except ValueError as exc:
+            publisher.publish_error(correlation_id, "INVALID_QUERY", str(exc), response_topic=response_topic)
+            return
+
+        try:
+            if since is not None:
+                _publish_state_changes(
+                    correlation_id, since, query_params, headers, timestamp, response_topic, accept_encoding
+                )
+                return
+
+            if if_none_match:
+                headers["If-None-Match"] = if_none_match
             response = requests.get(
                 f"{settings.LOCAL_API_BASE}/local/api/states",
                 headers=headers,
+                params=query_params or None,
                 timeout=10,
             )
+            if response.status_code == 304:
+                payload = {
+                    "type": "query_response_all",
+                    "correlation_id": correlation_id,
+                    "request_id": correlation_id,
+                    "endpoint": "/states",
+                    "status": 304,
+                    "ts": timestamp,
+                    "etag": response.headers.get("ETag") or if_none_match,
+                    "data": None,
+                }
+                if settings.MATTERHUB_ID:
+                    payload["hub_id"] = settings.MATTERHUB_ID
+                publisher.publish(payload, response_topic=response_topic)
+                print("[MQTT][RESPONSE] 전체 조회: 변경 없음 (304)")
+                return
             if response.status_code != 200:
                 publisher.publish_error(
                     correlation_id,
@@ -133,12 +185,38 @@ def handle_states_request(
                 "endpoint": "/states",
                 "status": response.status_code,
                 "ts": timestamp,
-                "data": response.json(),
             }
+            if response.headers.get("ETag"):
+                payload["etag"] = response.headers["ETag"]
             if settings.MATTERHUB_ID:
                 payload["hub_id"] = settings.MATTERHUB_ID
-            publisher.publish(payload, response_topic=response_topic)
-            print("[MQTT][RESPONSE] 전체 조회 발행")
+            raw = response.content
+            max_bytes = settings.MQTT_RESPONSE_CHUNK_SIZE_KB * 1024
+            if (
+                not query.paginated
+                and isinstance(raw, (bytes, bytearray))
+                and len(raw) + RAW_ENVELOPE_MARGIN_BYTES <= max_bytes
+            ):
+                # 페이지 분할이 없으면 API 응답 본문을 파싱하지 않고 그대로 data 에 넣는다.
+                publisher.publish_raw(
+                    payload, "data", bytes(raw), response_topic=response_topic, accept_encoding=accept_encoding
+                )
+                print("[MQTT][RESPONSE] 전체 조회 발행")
+                return
+            data = response.json()
+            if query.paginated and isinstance(data, dict):
+                payload["total"] = data.get("total")
+                payload["next_cursor"] = data.get("next_cursor")
+                data = data.get("items", [])
+            if not isinstance(data, list):
+                publisher.publish({**payload, "data": data}, response_topic=response_topic, accept_encoding=accept_encoding)
+                print("[MQTT][RESPONSE] 전체 조회 발행")
+                return
+            # 한 메시지 한도를 넘으면 chunk_id/chunk/total_chunks 로 나눠 보낸다 (mqtt_pkg/chunking).
+            count = chunking.publish_chunked(
+                payload, "data", data, response_topic or settings.MQTT_TOPIC_PUBLISH or "", max_bytes, accept_encoding
+            )
+            print(f"[MQTT][RESPONSE] 전체 조회 발행 ({count}개 메시지)")
 
         except requests.Timeout:
             publisher.publish_error(
@@ -164,10 +242,49 @@ def handle_states_request(
             pass
 
 
+def _publish_state_changes(
+    correlation_id: Optional[str],
+    since: str,
+    query_params: Dict[str, Any],
+    headers: Dict[str, str],
+    timestamp: str,
+    response_topic: Optional[str],
+    accept_encoding: Any = None,
+) -> None:
+    response = requests.get(
+        f"{settings.LOCAL_API_BASE}/local/api/states/changes",
+        headers=headers,
+        params={**query_params, "since": since},
+        timeout=10,
+    )
+    if response.status_code != 200:
+        publisher.publish_error(
+            correlation_id,
+            "LOCAL_API_ERROR",
+            f"Failed to fetch state changes (HTTP {response.status_code})",
+            response_topic=response_topic,
+        )
+        return
+
+    payload = {
+        "type": "query_response_changes",
+        "correlation_id": correlation_id,
+        "request_id": correlation_id,
+        "endpoint": "/states/changes",
+        "status": response.status_code,
+        "ts": timestamp,
+        "data": response.json(),
+    }
+    if settings.MATTERHUB_ID:
+        payload["hub_id"] = settings.MATTERHUB_ID
+    publisher.publish(payload, response_topic=response_topic, accept_encoding=accept_encoding)
+    print("[MQTT][RESPONSE] 변경분 조회 발행")
+
+
 def mqtt_callback(topic: str, payload: bytes, **kwargs: Any) -> None:
     payload_bytes = payload if isinstance(payload, (bytes, bytearray)) else bytes(str(payload), "utf-8")
     try:
-        parsed = json.loads(payload_bytes.decode("utf-8"))
+        parsed = jsonfast.loads(payload_bytes)
     except Exception:
         parsed = None
 
@@ -175,6 +292,7 @@ def mqtt_callback(topic: str, payload: bytes, **kwargs: Any) -> None:
         if isinstance(parsed, dict) and parsed.get("type") in {
             "query_response_all",
             "query_response_single",
+            "query_response_changes",
             "error",
             "entity_changed",
             "bootstrap_all_states",
@@ -189,6 +307,9 @@ def mqtt_callback(topic: str, payload: bytes, **kwargs: Any) -> None:
     if api_topic and topic == api_topic:
         print(f"[MQTT][REQUEST] API 수신: {topic}")
         default_response_topic = f"matterhub/{settings.MATTERHUB_ID}/api/response"
+        if isinstance(parsed, dict) and parsed.get("type") == "device_state_resync":
+            handle_device_state_resync(parsed, response_topic=default_response_topic)
+            return
         handle_states_request(payload_bytes, response_topic=default_response_topic)
         return
 
@@ -235,6 +356,23 @@ def mqtt_callback(topic: str, payload: bytes, **kwargs: Any) -> None:
     print(f"알 수 없는 토픽 수신: {topic}")
 
 
+def handle_device_state_resync(message: Dict[str, Any], response_topic: Optional[str] = None) -> None:
+    """Cloud lost the delta sequence: publish a full keyframe on the next tick."""
+    state.request_device_state_keyframe()
+    correlation_id = _extract_correlation_id(message)
+    payload = {
+        "type": "device_state_resync",
+        "correlation_id": correlation_id,
+        "request_id": correlation_id,
+        "status": 202,
+        "ts": publisher.utc_timestamp(),
+    }
+    if settings.MATTERHUB_ID:
+        payload["hub_id"] = settings.MATTERHUB_ID
+    publisher.publish(payload, response_topic=message.get("response_topic") or response_topic)
+    print("[MQTT][RESPONSE] 디바이스 상태 resync 요청 수락")
+
+
 def _extract_correlation_id(message: Dict[str, Any]) -> Optional[str]:
     correlation_id = message.get("correlation_id")
     if correlation_id is not None and str(correlation_id).strip():
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from libs import jsonfast
+
+from . import publisher
+
+# AWS IoT Core 메시지 최대 크기
+AWS_IOT_MAX_PAYLOAD_BYTES = 128 * 1024
+
+
+def encode_items(items: Sequence[Any]) -> List[bytes]:
+    """Serialize each list item once; the bytes are reused for sizing and output."""
+    return [jsonfast.dumpb(item) for item in items]
+
+
+def join_payload(envelope: Dict[str, Any], key: str, encoded_items: Sequence[bytes]) -> bytes:
+    """JSON bytes of ``{**envelope, key: [items]}`` built from pre-encoded items."""
+    head = jsonfast.dumpb({k: v for k, v in envelope.items() if k != key})
+    separator = b"," if len(head) > 2 else b""
+    return b"".join((head[:-1], separator, jsonfast.dumpb(key), b":[", b",".join(encoded_items), b"]}"))
+
+
+def _pack(sizes: Sequence[int], budget: int) -> List[Tuple[int, int]]:
+    """Greedy [start, end) ranges whose item bytes plus commas fit in ``budget``."""
+    ranges: List[Tuple[int, int]] = []
+    start, used = 0, 0
+    for index, size in enumerate(sizes):
+        extra = size if index == start else size + 1
+        if index > start and used + extra > budget:
+            ranges.append((start, index))
+            start, used = index, size
+        else:
+            used += extra
+    if start < len(sizes):
+        ranges.append((start, len(sizes)))
+    return ranges
+
+
+def iter_chunks(
+    envelope: Dict[str, Any],
+    key: str,
+    items: Sequence[Any],
+    max_bytes: int,
+    encoded_items: Optional[Sequence[bytes]] = None,
+    chunk_id: Optional[str] = None,
+) -> Iterator[Tuple[Dict[str, Any], bytes]]:
+    """Split ``envelope[key] = items`` into messages of at most ``max_bytes``.
+
+    청크 계약 (state/devices, query_response_all 공통):
+    - 모든 청크에 envelope 필드(hub_id, ts, correlation_id 등)가 똑같이 들어간다.
+    - chunk_id: 한 논리 메시지의 청크가 공유하는 id. 재조립 키는 (hub_id, chunk_id).
+    - chunk: 1부터 시작하는 순번, total_chunks: 전체 청크 수.
+    - 한 메시지에 다 들어가면 청크 필드 없이 하나만 나온다.
+    항목 하나가 max_bytes 를 넘으면 그 항목만 담은 청크로 보낸다 (쪼갤 수 없음).
+    """
+    encoded = list(encoded_items) if encoded_items is not None else encode_items(items)
+    whole = join_payload(envelope, key, encoded)
+    if len(whole) <= max_bytes:
+        yield {**envelope, key: list(items)}, whole
+        return
+
+    chunk_id = chunk_id or uuid.uuid4().hex[:12]
+    # 순번 자릿수는 항목 수를 넘지 않으므로 그 값으로 봉투 크기의 상한을 잡는다.
+    widest = {**envelope, "chunk_id": chunk_id, "chunk": len(encoded), "total_chunks": len(encoded)}
+    overhead = len(join_payload(widest, key, []))
+    ranges = _pack([len(item) for item in encoded], max(1, max_bytes - overhead))
+    total = len(ranges)
+    for number, (start, end) in enumerate(ranges, start=1):
+        chunk_envelope = {**envelope, "chunk_id": chunk_id, "chunk": number, "total_chunks": total}
+        body = join_payload(chunk_envelope, key, encoded[start:end])
+        if len(body) > max_bytes:
+            print(f"[MQTT][CHUNK] 항목 하나가 {max_bytes} bytes 를 넘습니다: {len(body)} bytes")
+        yield {**chunk_envelope, key: list(items[start:end])}, body
+
+
+def publish_chunked(
+    envelope: Dict[str, Any],
+    key: str,
+    items: Sequence[Any],
+    topic: str,
+    max_bytes: int,
+    accept_encoding: Any = None,
+) -> int:
+    """Publish ``envelope[key] = items`` to ``topic`` in as few messages as fit; returns the count.
+
+    압축 대상 토픽/요청이면 전체를 압축한 크기가 max_bytes 이하일 때 한 메시지로 보낸다.
+    청크는 압축 전 크기로 맞추므로 압축해도 한도를 넘지 않는다.
+    """
+    max_bytes = min(max_bytes, AWS_IOT_MAX_PAYLOAD_BYTES - len(topic.encode("utf-8")) - 64)
+    encoded = encode_items(items)
+    whole = join_payload(envelope, key, encoded)
+    if len(whole) > max_bytes:
+        wire = publisher.encode_for_topic(whole, topic, envelope, accept_encoding)
+        if len(wire) <= max_bytes:
+            publisher.publish_encoded(wire, envelope, response_topic=topic)
+            return 1
+    chunks = list(iter_chunks(envelope, key, items, max_bytes, encoded))
+    publisher.publish_chunks(chunks, response_topic=topic, accept_encoding=accept_encoding)
+    return len(chunks)
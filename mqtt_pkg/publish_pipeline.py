@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+# 숫자가 작을수록 먼저 보낸다.
+PRIORITY_URGENT = 0  # 알림, API 응답/오류
+PRIORITY_NORMAL = 1
+PRIORITY_BULK = 2  # state/devices 등 대량 상태
+PRIORITY_NAMES = {PRIORITY_URGENT: "urgent", PRIORITY_NORMAL: "normal", PRIORITY_BULK: "bulk"}
+
+# PUBACK 지연 히스토그램 버킷 상한 (ms)
+PUBACK_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# send(topic, payload, qos1) -> future (add_done_callback 지원) 또는 None
+SendFn = Callable[[str, bytes, bool], Any]
+
+
+class _Message:
+    __slots__ = ("topic", "payload", "priority", "label", "group")
+
+    def __init__(self, topic: str, payload: bytes, priority: int, label: str, group: Optional[str] = None) -> None:
+        self.topic = topic
+        self.payload = payload
+        self.priority = priority
+        self.label = label
+        self.group = group
+
+
+class PublishPipeline:
+    """Background MQTT publisher: bounded priority queue + QoS1 in-flight window.
+
+    - 큐가 가득 차면 더 급한 메시지가 들어올 때 가장 늦게 들어온 덜 급한 메시지를 버린다.
+    - 청크 묶음(group, 보통 chunk_id)은 통째로 받거나 통째로 버린다. 전송을 시작한 묶음은 버리지 않는다.
+    - QoS1 publish 를 ``max_in_flight`` 개까지 동시에 보내고 PUBACK 은 완료 콜백으로 받는다.
+    - PUBACK 이 ``timeout_sec`` 안에 오지 않거나 실패하면 QoS0 으로 한 번 더 보낸다 (기존 동작).
+      폴백끼리는 들어온 순서를 지키지만, 이미 PUBACK 을 받은 뒤 메시지보다 늦게 도착할 수 있다
+      (청크는 chunk 번호로 재조립하므로 순서에 기대지 않는다).
+    """
+
+    def __init__(
+        self,
+        send: SendFn,
+        max_queue: int = 1000,
+        max_in_flight: int = 8,
+        timeout_sec: float = 3.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._send = send
+        self.max_queue = max(1, max_queue)
+        self.max_in_flight = max(1, max_in_flight)
+        self.timeout_sec = timeout_sec
+        self._clock = clock
+
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[int, int, _Message]] = []
+        self._seq = itertools.count()
+        self._in_flight: Dict[int, Tuple[_Message, float]] = {}
+        self._fallbacks: List[Tuple[int, _Message]] = []
+        # 큐에 남은 묶음별 메시지 수와, 이미 일부를 보내기 시작한 묶음
+        self._group_queued: Dict[str, int] = {}
+        self._started_groups: Set[str] = set()
+        self._thread: Optional[threading.Thread] = None
+
+        self._counters: Dict[str, int] = {"submitted": 0, "qos1": 0, "qos0_fallback": 0, "timeouts": 0}
+        self._dropped: Dict[str, int] = {"queue_full": 0, "failed": 0}
+        self._buckets = [0] * (len(PUBACK_BUCKETS_MS) + 1)
+        self._latency_sum_ms = 0.0
+
+    def start(self) -> threading.Thread:
+        if self._thread is not None and self._thread.is_alive():
+            return self._thread
+        self._thread = threading.Thread(target=self._run_forever, daemon=True, name="mqtt-publisher")
+        self._thread.start()
+        return self._thread
+
+    def submit(self, topic: str, payload: bytes, priority: int = PRIORITY_NORMAL, label: str = "") -> bool:
+        """Queue one message; returns False when it was dropped because the queue is full."""
+        return self.submit_group(topic, [payload], priority, label)
+
+    def submit_group(
+        self,
+        topic: str,
+        payloads: Sequence[bytes],
+        priority: int = PRIORITY_NORMAL,
+        label: str = "",
+        group: Optional[str] = None,
+    ) -> bool:
+        """Queue the chunks of one message together: all of them, or none when there is no room."""
+        messages = [_Message(topic, payload, priority, label, group) for payload in payloads]
+        with self._cond:
+            if not self._make_room_locked(len(messages), priority):
+                self._dropped["queue_full"] += len(messages)
+                print(f"[MQTT][QUEUE] 큐 가득 참, 버림: topic={topic} type={label} count={len(messages)}")
+                return False
+            for message in messages:
+                heapq.heappush(self._heap, (priority, next(self._seq), message))
+            if group is not None:
+                self._group_queued[group] = self._group_queued.get(group, 0) + len(messages)
+            self._counters["submitted"] += len(messages)
+            self._cond.notify_all()
+        return True
+
+    def _make_room_locked(self, needed: int, priority: int) -> bool:
+        # 덜 급하고 늦게 들어온 것부터 묶음 단위로 버린다. 자리를 다 못 만들면 아무것도 버리지 않는다.
+        free = self.max_queue - len(self._heap)
+        if free >= needed:
+            return True
+        units: Dict[Any, List[int]] = {}
+        for index, (queued_priority, seq, message) in enumerate(self._heap):
+            if queued_priority <= priority or message.group in self._started_groups:
+                continue
+            units.setdefault(message.group if message.group is not None else ("seq", seq), []).append(index)
+        victims: List[int] = []
+        for unit in sorted(units.values(), key=lambda unit: max(self._heap[i][:2] for i in unit), reverse=True):
+            if free >= needed:
+                break
+            victims.extend(unit)
+            free += len(unit)
+        if free < needed:
+            return False
+
+        dropped = set(victims)
+        for index in victims:
+            message = self._heap[index][2]
+            self._group_queued.pop(message.group, None)
+        first = self._heap[victims[0]][2]
+        print(f"[MQTT][QUEUE] 큐 가득 참, 버림: topic={first.topic} type={first.label} count={len(victims)}")
+        self._heap = [entry for index, entry in enumerate(self._heap) if index not in dropped]
+        heapq.heapify(self._heap)
+        self._dropped["queue_full"] += len(victims)
+        return True
+
+    def flush(self, timeout: float) -> bool:
+        """Wait until the queue and the in-flight window are empty."""
+        deadline = self._clock() + timeout
+        with self._cond:
+            while self._heap or self._in_flight or self._fallbacks:
+                remaining = deadline - self._clock()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            depth = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _, _ in self._heap:
+                depth[PRIORITY_NAMES.get(priority, str(priority))] += 1
+            histogram = {f"le_{bound}": count for bound, count in zip(PUBACK_BUCKETS_MS, self._buckets)}
+            histogram["inf"] = self._buckets[-1]
+            acked = sum(self._buckets)
+            return {
+                "queue_depth": len(self._heap),
+                "queue_depth_by_priority": depth,
+                "in_flight": len(self._in_flight),
+                **self._counters,
+                "dropped": dict(self._dropped),
+                "puback_ms": histogram,
+                "puback_avg_ms": round(self._latency_sum_ms / acked, 1) if acked else None,
+            }
+
+    def _run_forever(self) -> None:
+        while True:
+            self.run_once(wait=True)
+
+    def run_once(self, wait: bool = False) -> bool:
+        """Send what the window allows and expire late PUBACKs; returns True if anything was sent."""
+        with self._cond:
+            while wait and not self._ready_locked():
+                self._cond.wait(self._next_wakeup_locked())
+                self._expire_locked()
+            self._expire_locked()
+            # 폴백은 원래 들어온 순서(token)대로 다시 보낸다.
+            fallbacks, self._fallbacks = sorted(self._fallbacks, key=lambda entry: entry[0]), []
+            batch: List[Tuple[int, _Message]] = []
+            while self._heap and len(self._in_flight) < self.max_in_flight:
+                _, token, message = heapq.heappop(self._heap)
+                self._mark_sent_locked(message)
+                self._in_flight[token] = (message, self._clock())
+                batch.append((token, message))
+
+        for _, message in fallbacks:
+            self._send_qos0(message)
+        for token, message in batch:
+            self._send_qos1(token, message)
+        if fallbacks:
+            with self._cond:
+                self._cond.notify_all()
+        return bool(batch or fallbacks)
+
+    def _mark_sent_locked(self, message: _Message) -> None:
+        group = message.group
+        if group is None:
+            return
+        remaining = self._group_queued.get(group, 0) - 1
+        if remaining > 0:
+            self._group_queued[group] = remaining
+            self._started_groups.add(group)
+        else:
+            self._group_queued.pop(group, None)
+            self._started_groups.discard(group)
+
+    def _ready_locked(self) -> bool:
+        return bool(self._fallbacks) or (bool(self._heap) and len(self._in_flight) < self.max_in_flight)
+
+    def _next_wakeup_locked(self) -> Optional[float]:
+        if not self._in_flight:
+            return None
+        oldest = min(sent for _, sent in self._in_flight.values())
+        return max(0.01, oldest + self.timeout_sec - self._clock())
+
+    def _expire_locked(self) -> None:
+        now = self._clock()
+        for token, (message, sent) in list(self._in_flight.items()):
+            if now - sent >= self.timeout_sec:
+                del self._in_flight[token]
+                self._counters["timeouts"] += 1
+                print("[MQTT] publish QoS1 실패, QoS0 폴백 시도: TimeoutError")
+                self._fallbacks.append((token, message))
+
+    def _send_qos1(self, token: int, message: _Message) -> None:
+        try:
+            future = self._send(message.topic, message.payload, True)
+        except Exception as exc:
+            print(f"[MQTT] publish QoS1 실패, QoS0 폴백 시도: {type(exc).__name__}")
+            with self._cond:
+                if self._in_flight.pop(token, None) is not None:
+                    self._fallbacks.append((token, message))
+                self._cond.notify_all()
+            return
+        if future is None or not hasattr(future, "add_done_callback"):
+            self._complete(token, None)
+            return
+        future.add_done_callback(lambda done: self._complete(token, done))
+
+    def _complete(self, token: int, future: Any) -> None:
+        # awscrt 이벤트 루프 스레드에서 불린다: 집계만 하고 재전송은 워커에 넘긴다.
+        error = future.exception() if future is not None else None
+        with self._cond:
+            entry = self._in_flight.pop(token, None)
+            if entry is None:
+                return  # 이미 타임아웃 처리됨
+            message, sent = entry
+            if error is None:
+                self._observe_locked((self._clock() - sent) * 1000)
+                self._counters["qos1"] += 1
+            else:
+                self._fallbacks.append((token, message))
+            self._cond.notify_all()
+        if error is None:
+            print(f"[MQTT] publish_result topic={message.topic} status=success type={message.label} qos1")
+        else:
+            print(f"[MQTT] publish QoS1 실패, QoS0 폴백 시도: {type(error).__name__}")
+
+    def _observe_locked(self, latency_ms: float) -> None:
+        self._latency_sum_ms += latency_ms
+        for index, bound in enumerate(PUBACK_BUCKETS_MS):
+            if latency_ms <= bound:
+                self._buckets[index] += 1
+                return
+        self._buckets[-1] += 1
+
+    def _send_qos0(self, message: _Message) -> None:
+        try:
+            self._send(message.topic, message.payload, False)
+        except Exception as exc:
+            with self._cond:
+                self._dropped["failed"] += 1
+            print(
+                f"[MQTT] publish_result topic={message.topic} "
+                f"status=failed type={message.label} error={type(exc).__name__}"
+            )
+            return
+        with self._cond:
+            self._counters["qos0_fallback"] += 1
+        print(f"[MQTT] publish_result topic={message.topic} status=success type={message.label} qos0_fallback")
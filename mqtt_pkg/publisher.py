@@ -1,12 +1,17 @@
 from __future__ import annotations
 
-import json
+import threading
 from datetime import datetime, timezone
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Sequence, Tuple
 
 from awscrt import mqtt
 
-from . import runtime, settings
+from libs import jsonfast, mqtt_envelope
+
+from . import publish_pipeline, runtime, settings
+
+_pipeline: Optional[publish_pipeline.PublishPipeline] = None
+_pipeline_lock = threading.Lock()
 
 
 def utc_timestamp() -> str:
@@ -14,19 +19,140 @@ def utc_timestamp() -> str:
     return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
 
 
-def publish(payload: Dict[str, Any], response_topic: Optional[str] = None) -> None:
-    connection = runtime.get_connection()
-    if connection is None:
-        print("[MQTT] publish 실패: MQTT 연결이 설정되지 않았습니다.")
+def publish(
+    payload: Dict[str, Any],
+    response_topic: Optional[str] = None,
+    accept_encoding: Any = None,
+    encoded: Optional[bytes] = None,
+) -> None:
+    """Publish ``payload`` as JSON; compressed when the topic opts in or ``accept_encoding`` asks for it.
+
+    encoded: 호출자가 이미 만든 ``payload`` 의 JSON 바이트 (다시 직렬화하지 않는다).
+    """
+    body = encoded if encoded is not None else jsonfast.dumpb(payload)
+    _publish_bytes(body, payload, response_topic, accept_encoding)
+
+
+def encode_for_topic(
+    payload_bytes: bytes,
+    topic: str,
+    meta: Optional[Dict[str, Any]] = None,
+    accept_encoding: Any = None,
+) -> bytes:
+    """Wire bytes for ``topic``: the JSON itself or a compressed envelope (libs.mqtt_envelope).
+
+    - 요청에 accept_encoding 이 있으면 그 중 지원하는 것으로 base64 봉투를 만든다.
+    - 아니면 MQTT_COMPRESS_TOPICS 에 맞는 토픽만 설정된 인코딩/형식으로 압축한다.
+    - MQTT_COMPRESS_MIN_BYTES 보다 작거나 압축해도 줄지 않으면 그대로 보낸다.
+    - 압축이 실패하면(잘못된 레벨, zstd 오류 등) 압축하지 않고 그대로 보낸다.
+    """
+    encoding = mqtt_envelope.negotiate(accept_encoding)
+    fmt = mqtt_envelope.FORMAT_BASE64
+    if encoding is None and any(mqtt_envelope.topic_matches(p, topic) for p in settings.MQTT_COMPRESS_TOPICS):
+        encoding = mqtt_envelope.negotiate([settings.MQTT_COMPRESS_ENCODING, mqtt_envelope.GZIP])
+        fmt = settings.MQTT_COMPRESS_FORMAT
+    if encoding is None or len(payload_bytes) < settings.MQTT_COMPRESS_MIN_BYTES:
+        return payload_bytes
+    try:
+        wire = mqtt_envelope.wrap(payload_bytes, encoding, fmt, meta, settings.MQTT_COMPRESS_LEVEL)
+    except Exception as exc:
+        print(f"[MQTT] 압축 실패, 원본으로 전송: topic={topic} encoding={encoding} error={type(exc).__name__}: {exc}")
+        return payload_bytes
+    return wire if len(wire) < len(payload_bytes) else payload_bytes
+
+
+def publish_encoded(
+    wire_bytes: bytes, meta: Dict[str, Any], response_topic: Optional[str] = None
+) -> None:
+    """Publish bytes already produced by :func:`encode_for_topic` for ``response_topic``."""
+    _publish_bytes(wire_bytes, meta, response_topic, encoded=True)
+
+
+def splice_raw_json(payload: Dict[str, Any], key: str, raw: bytes) -> bytes:
+    """Encode ``payload`` with ``raw`` (already-encoded JSON) inserted as ``payload[key]``.
+
+    HA 응답 본문을 파싱/재인코딩하지 않고 봉투(envelope) 뒤에 그대로 이어 붙인다.
+    """
+    body = raw.strip()
+    # 배열/객체로 보이지 않으면 한 번 파싱해서 유효한 JSON 인지 확인한다.
+    if not body or (body[:1], body[-1:]) not in ((b"[", b"]"), (b"{", b"}")):
+        jsonfast.loads(body)
+    head = jsonfast.dumpb({k: v for k, v in payload.items() if k != key})
+    separator = b"," if len(head) > 2 else b""
+    return b"".join((head[:-1], separator, jsonfast.dumpb(key), b":", body, b"}"))
+
+
+def publish_raw(
+    payload: Dict[str, Any],
+    key: str,
+    raw: bytes,
+    response_topic: Optional[str] = None,
+    accept_encoding: Any = None,
+) -> None:
+    """Like :func:`publish`, with ``payload[key]`` taken verbatim from ``raw`` JSON bytes."""
+    try:
+        payload_bytes = splice_raw_json(payload, key, raw)
+    except ValueError:
+        # 원본이 JSON 이 아니면 기존 방식대로 보낸다 (파싱 실패는 호출자가 처리).
+        publish({**payload, key: jsonfast.loads(raw)}, response_topic=response_topic, accept_encoding=accept_encoding)
+        return
+    _publish_bytes(payload_bytes, payload, response_topic, accept_encoding)
+
+
+def publish_chunks(
+    chunks: Sequence[Tuple[Dict[str, Any], bytes]],
+    response_topic: Optional[str] = None,
+    accept_encoding: Any = None,
+) -> None:
+    """Publish the (payload, JSON bytes) chunks of one message (see mqtt_pkg.chunking).
+
+    비동기 모드에서는 chunk_id 를 묶음 키로 한 번에 큐에 넣어, 큐가 가득 차도 일부만 남지 않게 한다.
+    """
+    if not settings.MQTT_PUBLISH_ASYNC or len(chunks) < 2:
+        for payload, body in chunks:
+            publish(payload, response_topic=response_topic, accept_encoding=accept_encoding, encoded=body)
+        return
+
+    target_topic = _target_topic(response_topic)
+    if target_topic is None:
         return
+    meta = chunks[0][0]
+    wires = [encode_for_topic(body, target_topic, payload, accept_encoding) for payload, body in chunks]
+    get_pipeline().submit_group(
+        target_topic, wires, message_priority(target_topic, meta), meta.get("type", "(미설정)"), group=meta.get("chunk_id")
+    )
 
+
+def _target_topic(response_topic: Optional[str]) -> Optional[str]:
+    if runtime.get_connection() is None:
+        print("[MQTT] publish 실패: MQTT 연결이 설정되지 않았습니다.")
+        return None
     target_topic = response_topic or settings.MQTT_TOPIC_PUBLISH
     if not target_topic:
         print("[MQTT] publish 실패: 대상 토픽을 확인할 수 없습니다.")
+        return None
+    return target_topic
+
+
+def _publish_bytes(
+    payload_bytes: bytes,
+    meta: Dict[str, Any],
+    response_topic: Optional[str],
+    accept_encoding: Any = None,
+    encoded: bool = False,
+) -> None:
+    target_topic = _target_topic(response_topic)
+    if target_topic is None:
         return
+    connection = runtime.get_connection()
 
-    payload_type = payload.get("type", "(미설정)")
-    payload_bytes = json.dumps(payload, ensure_ascii=False)
+    payload_type = meta.get("type", "(미설정)")
+    if not encoded:
+        payload_bytes = encode_for_topic(payload_bytes, target_topic, meta, accept_encoding)
+
+    if settings.MQTT_PUBLISH_ASYNC:
+        get_pipeline().submit(target_topic, payload_bytes, message_priority(target_topic, meta), payload_type)
+        return
 
     # QoS 1 시도 → PUBACK 타임아웃 시 QoS 0 폴백
     for qos_level in (mqtt.QoS.AT_LEAST_ONCE, mqtt.QoS.AT_MOST_ONCE):
@@ -55,6 +181,49 @@ def publish(payload: Dict[str, Any], response_topic: Optional[str] = None) -> No
             )
 
 
+def message_priority(topic: str, meta: Dict[str, Any]) -> int:
+    """Queue priority: alerts and API responses first, bulk device state last."""
+    if topic.endswith("/event/device_alerts") or "correlation_id" in meta or meta.get("type") == "error":
+        return publish_pipeline.PRIORITY_URGENT
+    if topic.endswith("/state/devices") or meta.get("type") == "bootstrap_all_states":
+        return publish_pipeline.PRIORITY_BULK
+    return publish_pipeline.PRIORITY_NORMAL
+
+
+def _send(topic: str, payload_bytes: bytes, qos1: bool) -> Any:
+    connection = runtime.get_connection()
+    if connection is None:
+        raise ConnectionError("MQTT 연결이 설정되지 않았습니다.")
+    qos = mqtt.QoS.AT_LEAST_ONCE if qos1 else mqtt.QoS.AT_MOST_ONCE
+    publish_result = connection.publish(topic=topic, payload=payload_bytes, qos=qos)
+    return publish_result[0] if isinstance(publish_result, tuple) else publish_result
+
+
+def get_pipeline() -> publish_pipeline.PublishPipeline:
+    """The background publisher used when MQTT_PUBLISH_ASYNC=1 (started on first use)."""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = publish_pipeline.PublishPipeline(
+                _send,
+                max_queue=settings.MQTT_PUBLISH_QUEUE_MAX,
+                max_in_flight=settings.MQTT_PUBLISH_MAX_IN_FLIGHT,
+                timeout_sec=settings.MQTT_PUBLISH_TIMEOUT_SEC,
+            )
+            _pipeline.start()
+        return _pipeline
+
+
+def pipeline_stats() -> Optional[Dict[str, Any]]:
+    """Queue depth, PUBACK latency histogram and drop counters (None when not started)."""
+    return _pipeline.stats() if _pipeline is not None else None
+
+
+def flush(timeout: float) -> bool:
+    """Wait for queued publishes to finish (no-op in synchronous mode)."""
+    return _pipeline.flush(timeout) if _pipeline is not None else True
+
+
 def publish_error(
     correlation_id: Optional[str],
     code: str,
@@ -69,6 +69,26 @@ MQTT_PUBLISH_TIMEOUT_SEC = max(1, int(
     _env_with_fallback("MQTT_PUBLISH_TIMEOUT_SEC") or "3"
 ))
 
+# 1: publish 를 백그라운드 큐에 넣고 바로 반환 (PUBACK 은 완료 콜백으로 집계, mqtt_pkg/publish_pipeline)
+MQTT_PUBLISH_ASYNC = (_env_with_fallback("MQTT_PUBLISH_ASYNC") or "0") == "1"
+MQTT_PUBLISH_QUEUE_MAX = max(10, int(
+    _env_with_fallback("MQTT_PUBLISH_QUEUE_MAX") or "1000"
+))
+MQTT_PUBLISH_MAX_IN_FLIGHT = max(1, int(
+    _env_with_fallback("MQTT_PUBLISH_MAX_IN_FLIGHT") or "8"
+))
+
+# === HA 상태 스냅샷 (한 tick 동안 모든 poller가 공유) ===
+MQTT_STATE_SNAPSHOT_TTL_SEC = max(0.0, float(
+    _env_with_fallback("MQTT_STATE_SNAPSHOT_TTL_SEC") or "4"
+))
+
+# poll: 매 tick /api/states 조회, websocket: state_changed 구독 미러 사용
+MQTT_STATE_SOURCE = (_env_with_fallback("MQTT_STATE_SOURCE") or "poll").lower()
+MQTT_STATE_PUSH_COALESCE_SEC = max(0.0, float(
+    _env_with_fallback("MQTT_STATE_PUSH_COALESCE_SEC") or "0.2"
+))
+
 # === 디바이스 상태 발행 ===
 MQTT_DEVICE_STATE_INTERVAL_SEC = max(10, int(
     _env_with_fallback("MQTT_DEVICE_STATE_INTERVAL_SEC") or "60"
@@ -76,6 +96,31 @@ MQTT_DEVICE_STATE_INTERVAL_SEC = max(10, int(
 MQTT_DEVICE_STATE_CHUNK_SIZE_KB = max(10, int(
     _env_with_fallback("MQTT_DEVICE_STATE_CHUNK_SIZE_KB") or "100"
 ))
+# MQTT 응답(query_response_all) 한 메시지 최대 크기, 넘으면 청크 분할
+MQTT_RESPONSE_CHUNK_SIZE_KB = max(10, int(
+    _env_with_fallback("MQTT_RESPONSE_CHUNK_SIZE_KB") or "100"
+))
+# 1: keyframe(전체) 사이에는 바뀐 디바이스만 delta 로 발행 (seq/base_seq 로 연속성 확인)
+MQTT_DEVICE_STATE_DELTA = (_env_with_fallback("MQTT_DEVICE_STATE_DELTA") or "0") == "1"
+MQTT_DEVICE_STATE_KEYFRAME_SEC = max(0, int(
+    _env_with_fallback("MQTT_DEVICE_STATE_KEYFRAME_SEC") or "600"
+))
+
+# === MQTT 페이로드 압축 (libs/mqtt_envelope) ===
+# 압축할 토픽 필터 (쉼표 구분, MQTT 와일드카드 +/# 사용). 비우면 요청의 accept_encoding 일 때만 압축
+MQTT_COMPRESS_TOPICS = [
+    topic.strip()
+    for topic in (_env_with_fallback("MQTT_COMPRESS_TOPICS") or "").split(",")
+    if topic.strip()
+]
+MQTT_COMPRESS_ENCODING = (_env_with_fallback("MQTT_COMPRESS_ENCODING") or "gzip").lower()
+# base64: JSON 봉투(type/hub_id 라우팅 가능), binary: 압축 바이트 그대로
+MQTT_COMPRESS_FORMAT = (_env_with_fallback("MQTT_COMPRESS_FORMAT") or "base64").lower()
+MQTT_COMPRESS_MIN_BYTES = max(0, int(
+    _env_with_fallback("MQTT_COMPRESS_MIN_BYTES") or "2048"
+))
+_compress_level = _env_with_fallback("MQTT_COMPRESS_LEVEL")
+MQTT_COMPRESS_LEVEL = int(_compress_level) if _compress_level else None
 
 # === 디바이스 알림 발행 ===
 MQTT_ALERT_CHECK_INTERVAL_SEC = max(5, int(
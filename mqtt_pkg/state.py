@@ -2,12 +2,17 @@ from __future__ import annotations
 
 import json
 import os
+import threading
 import time
-from typing import Dict, List, Optional, Set, Tuple
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Dict, Iterator, List, Mapping, Optional, Set, Tuple
 
 import requests
 
-from . import publisher, runtime, settings
+from libs import ha_client, resource_store
+
+from . import chunking, publisher, runtime, settings, state_mirror
 
 
 class StateChangeDetector:
@@ -77,7 +82,51 @@ class StateChangeDetector:
 
 state_detector = StateChangeDetector()
 bootstrap_done = False
-last_entity_publish: Dict[str, Tuple[float, str]] = {}
+
+
+class EntityPublishRecord:
+    """Last entity_changed publish for one entity (ts, change version, state fingerprint)."""
+
+    __slots__ = ("ts", "version", "hash")
+
+    def __init__(self, ts: float, fingerprint: int) -> None:
+        self.ts = ts
+        self.version = 1
+        self.hash = fingerprint
+
+    def update(self, ts: float, fingerprint: int) -> None:
+        if fingerprint != self.hash:
+            self.version += 1
+            self.hash = fingerprint
+        self.ts = ts
+
+
+last_entity_publish: Dict[str, EntityPublishRecord] = {}
+
+
+def _structural_hash(value: object) -> int:
+    if isinstance(value, dict):
+        return hash(tuple(sorted((str(k), _structural_hash(v)) for k, v in value.items())))
+    if isinstance(value, (list, tuple)):
+        return hash(tuple(_structural_hash(v) for v in value))
+    try:
+        return hash(value)
+    except TypeError:
+        return hash(repr(value))
+
+
+def state_fingerprint(state_entry: Mapping[str, object]) -> int:
+    """Cheap change key for one HA state (직렬화 없이 비교).
+
+    HA 는 state/attributes 가 바뀌면 last_updated 와 context.id 를 갱신하므로 그것만 본다.
+    last_updated 가 없는 항목(테스트/외부 데이터)은 구조 해시로 비교한다.
+    """
+    last_updated = state_entry.get("last_updated")
+    if last_updated is None:
+        return _structural_hash(state_entry)
+    context = state_entry.get("context")
+    context_id = context.get("id") if isinstance(context, dict) else None
+    return hash((state_entry.get("state"), last_updated, context_id))
 
 
 def _auth_headers() -> Dict[str, str]:
@@ -128,11 +177,7 @@ def publish_bootstrap_all_states() -> None:
 
 def _fetch_ha_states() -> Optional[List[Dict[str, object]]]:
     try:
-        response = requests.get(
-            f"{settings.HA_HOST}/api/states",
-            headers=_auth_headers(),
-            timeout=10,
-        )
+        response = ha_client.get_client().get("/api/states", timeout=10)
         if response.status_code != 200:
             return None
         states = response.json()
@@ -142,44 +187,156 @@ def _fetch_ha_states() -> Optional[List[Dict[str, object]]]:
         return None
 
 
-def publish_device_state() -> None:
-    global last_entity_publish
+@dataclass(frozen=True)
+class StateSnapshot:
+    """Read-only view of one /api/states download shared by every consumer."""
 
-    if not runtime.is_connected():
-        return
+    states: Tuple[Dict[str, object], ...]
+    by_entity_id: Mapping[str, Dict[str, object]]
+    fetched_at: float = field(default_factory=time.time)
+
+    @classmethod
+    def from_states(
+        cls, states: List[Dict[str, object]], fetched_at: Optional[float] = None
+    ) -> "StateSnapshot":
+        items: List[Dict[str, object]] = []
+        index: Dict[str, Dict[str, object]] = {}
+        for item in states:
+            if not isinstance(item, dict):
+                continue
+            entity_id = item.get("entity_id")
+            if not entity_id:
+                continue
+            items.append(item)
+            index[str(entity_id)] = item
+        return cls(
+            states=tuple(items),
+            by_entity_id=MappingProxyType(index),
+            fetched_at=time.time() if fetched_at is None else fetched_at,
+        )
 
+    def get(self, entity_id: str) -> Optional[Dict[str, object]]:
+        return self.by_entity_id.get(entity_id)
+
+    def __iter__(self) -> Iterator[Dict[str, object]]:
+        return iter(self.states)
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+
+def _fetch_snapshot() -> Optional[StateSnapshot]:
     states = _fetch_ha_states()
     if states is None:
+        return None
+    return StateSnapshot.from_states(states)
+
+
+class StateSnapshotProvider:
+    """Fetch /api/states at most once per TTL and hand out the same snapshot."""
+
+    def __init__(self, ttl_sec: Optional[float] = None) -> None:
+        self._ttl_sec = ttl_sec
+        self._snapshot: Optional[StateSnapshot] = None
+        self._fetched_monotonic = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def ttl_sec(self) -> float:
+        if self._ttl_sec is not None:
+            return self._ttl_sec
+        return settings.MQTT_STATE_SNAPSHOT_TTL_SEC
+
+    def get(self) -> Optional[StateSnapshot]:
+        with self._lock:
+            now = time.monotonic()
+            if self._snapshot is not None and (now - self._fetched_monotonic) < self.ttl_sec:
+                return self._snapshot
+            snapshot = _fetch_snapshot()
+            if snapshot is not None:
+                self._snapshot = snapshot
+                self._fetched_monotonic = now
+            return snapshot
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._snapshot = None
+            self._fetched_monotonic = 0.0
+
+
+state_snapshots = StateSnapshotProvider()
+_state_mirror: Optional[state_mirror.HAStateMirror] = None
+
+
+def start_state_mirror() -> Optional[state_mirror.HAStateMirror]:
+    """Enable websocket push mode when MQTT_STATE_SOURCE=websocket."""
+    global _state_mirror
+
+    if settings.MQTT_STATE_SOURCE != "websocket":
+        return None
+    if _state_mirror is None:
+        client = ha_client.get_client()
+        _state_mirror = state_mirror.HAStateMirror(
+            fetch_states=_fetch_ha_states,
+            snapshot_factory=StateSnapshot.from_states,
+            ws_url=client.websocket_url(),
+            token=client.token,
+        )
+    _state_mirror.start()
+    print("[MQTT][MIRROR] websocket push 모드 시작")
+    return _state_mirror
+
+
+def get_state_snapshot() -> Optional[StateSnapshot]:
+    mirror = _state_mirror
+    if mirror is not None and mirror.is_synced:
+        return mirror.snapshot()
+    return state_snapshots.get()
+
+
+def wait_for_state_change(timeout: float) -> bool:
+    """Sleep until the next tick; in push mode wake up as soon as HA reports a change."""
+    changed = state_mirror.wait_or_sleep(_state_mirror, timeout)
+    if changed and settings.MQTT_STATE_PUSH_COALESCE_SEC > 0:
+        # 연속으로 들어오는 센서 이벤트를 한 tick으로 묶는다.
+        time.sleep(settings.MQTT_STATE_PUSH_COALESCE_SEC)
+    return changed
+
+
+def publish_device_state(snapshot: Optional[StateSnapshot] = None) -> None:
+    global last_entity_publish
+
+    if not runtime.is_connected():
         return
 
+    if snapshot is None:
+        snapshot = _fetch_snapshot()
+        if snapshot is None:
+            return
+
     try:
-        state_map: Dict[str, Dict[str, object]] = {}
-        for item in states:
-            if isinstance(item, dict):
-                entity_id = item.get("entity_id")
-                if entity_id:
-                    state_map[str(entity_id)] = item
+        state_map = snapshot.by_entity_id
 
         for entity_id in settings.MQTT_REPORT_ENTITY_IDS:
             state_entry = state_map.get(entity_id)
             if not state_entry:
                 continue
 
-            state_str = json.dumps(state_entry, sort_keys=True, ensure_ascii=False)
-            last_info = last_entity_publish.get(entity_id)
+            record = last_entity_publish.get(entity_id)
             now = time.time()
-            if last_info:
-                last_ts, last_val = last_info
-                if now - last_ts < settings.MQTT_EVENT_THROTTLE_SEC:
-                    continue
+            if record is not None and now - record.ts < settings.MQTT_EVENT_THROTTLE_SEC:
+                continue
+            fingerprint = state_fingerprint(state_entry)
+            if record is not None:
                 if (
                     settings.MQTT_EVENT_DEDUP_WINDOW_SEC > 0
-                    and (now - last_ts) < settings.MQTT_EVENT_DEDUP_WINDOW_SEC
-                    and last_val == state_str
+                    and (now - record.ts) < settings.MQTT_EVENT_DEDUP_WINDOW_SEC
+                    and record.hash == fingerprint
                 ):
                     continue
-
-            last_entity_publish[entity_id] = (now, state_str)
+                record.update(now, fingerprint)
+            else:
+                last_entity_publish[entity_id] = EntityPublishRecord(now, fingerprint)
             payload = {
                 "type": "entity_changed",
                 "correlation_id": None,
@@ -201,11 +358,16 @@ def publish_device_state() -> None:
 
 def _load_managed_entity_ids() -> Optional[Set[str]]:
     path = settings.DEVICES_FILE_PATH
-    if not path or not os.path.exists(path):
+    if not path:
         return None
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.loads(f.read().strip() or "[]")
+        if resource_store.backend() == "sqlite":
+            data = resource_store.get_store(path, "entity_id").all()
+        else:
+            if not os.path.exists(path):
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.loads(f.read().strip() or "[]")
         return {d["entity_id"] for d in data if isinstance(d, dict) and "entity_id" in d}
     except Exception:
         return None
@@ -214,7 +376,66 @@ def _load_managed_entity_ids() -> Optional[Set[str]]:
 _last_device_state_publish: float = 0.0
 
 
-def publish_device_states_bulk() -> None:
+def on_config_event(event: Dict[str, object]) -> None:
+    """wm-app 변경 알림: 관리 디바이스 목록이 바뀌면 다음 tick에 bulk 상태를 바로 발행한다."""
+    global _last_device_state_publish
+
+    if event.get("resource") == "devices":
+        _last_device_state_publish = 0.0
+
+
+class DeviceStateDeltaEncoder:
+    """Keyframe/delta sequencing for matterhub/<id>/state/devices (MQTT_DEVICE_STATE_DELTA=1).
+
+    - keyframe: {"type": "keyframe", "seq": n, "devices": [전체]}
+    - delta: {"type": "delta", "seq": n, "base_seq": n-1, "devices": [바뀐 것], "removed": [entity_id]}
+    클라우드는 base_seq 가 마지막으로 적용한 seq 와 다르면 api 토픽으로
+    {"type": "device_state_resync"} 를 보내 다음 tick 에 keyframe 을 받는다.
+    """
+
+    def __init__(self) -> None:
+        self.seq = 0
+        self._sent: Dict[str, int] = {}
+        self._last_keyframe = 0.0
+        self._resync = True
+
+    def request_keyframe(self) -> None:
+        self._resync = True
+
+    def encode(
+        self, devices: List[Dict[str, object]], fingerprints: Dict[str, int], now: float
+    ) -> Optional[Dict[str, object]]:
+        """Return the next message body, or None when nothing changed since the last one."""
+        keyframe_sec = settings.MQTT_DEVICE_STATE_KEYFRAME_SEC
+        if self._resync or (keyframe_sec > 0 and now - self._last_keyframe >= keyframe_sec):
+            self._resync = False
+            self._last_keyframe = now
+            self._sent = dict(fingerprints)
+            self.seq += 1
+            return {"type": "keyframe", "seq": self.seq, "devices": devices}
+
+        sent = self._sent
+        changed = [d for d in devices if sent.get(str(d["entity_id"])) != fingerprints[str(d["entity_id"])]]
+        removed = [entity_id for entity_id in sent if entity_id not in fingerprints]
+        if not changed and not removed:
+            return None
+        self._sent = dict(fingerprints)
+        self.seq += 1
+        return {"type": "delta", "seq": self.seq, "base_seq": self.seq - 1, "devices": changed, "removed": removed}
+
+
+_device_state_encoder = DeviceStateDeltaEncoder()
+
+
+def request_device_state_keyframe() -> None:
+    """클라우드 resync 요청: 다음 tick 에 전체 keyframe 을 발행한다."""
+    global _last_device_state_publish
+
+    _device_state_encoder.request_keyframe()
+    _last_device_state_publish = 0.0
+
+
+def publish_device_states_bulk(snapshot: Optional[StateSnapshot] = None) -> None:
     global _last_device_state_publish
 
     if not runtime.is_connected() or not settings.MATTERHUB_ID:
@@ -224,18 +445,16 @@ def publish_device_states_bulk() -> None:
     if _last_device_state_publish > 0 and (now - _last_device_state_publish) < settings.MQTT_DEVICE_STATE_INTERVAL_SEC:
         return
 
-    states = _fetch_ha_states()
-    if states is None:
-        return
+    if snapshot is None:
+        snapshot = _fetch_snapshot()
+        if snapshot is None:
+            return
 
     managed_ids = _load_managed_entity_ids()
     devices: List[Dict[str, object]] = []
-    for item in states:
-        if not isinstance(item, dict):
-            continue
+    fingerprints: Dict[str, int] = {}
+    for item in snapshot.states:
         entity_id = item.get("entity_id")
-        if not entity_id:
-            continue
         if managed_ids is not None and entity_id not in managed_ids:
             continue
         devices.append({
@@ -244,11 +463,26 @@ def publish_device_states_bulk() -> None:
             "last_changed": item.get("last_changed"),
             "attributes": item.get("attributes", {}),
         })
+        if settings.MQTT_DEVICE_STATE_DELTA:
+            fingerprints[str(entity_id)] = state_fingerprint(item)
+
+    topic = f"matterhub/{settings.MATTERHUB_ID}/state/devices"
+    if settings.MQTT_DEVICE_STATE_DELTA:
+        message = _device_state_encoder.encode(devices, fingerprints, now)
+        _last_device_state_publish = time.time()
+        if message is None:
+            return
+        devices = message.pop("devices")  # type: ignore[assignment]
+        _publish_devices_with_chunking(topic, devices, message)
+        print(
+            f"[MQTT][DEVICE_STATE] {message['type']} seq={message['seq']} 발행: "
+            f"{len(devices)}개 디바이스, 삭제 {len(message.get('removed', []))}개 → {topic}"
+        )
+        return
 
     if not devices:
         return
 
-    topic = f"matterhub/{settings.MATTERHUB_ID}/state/devices"
     _publish_devices_with_chunking(topic, devices)
     _last_device_state_publish = time.time()
     print(f"[MQTT][DEVICE_STATE] 발행 완료: {len(devices)}개 디바이스 → {topic}")
@@ -272,7 +506,7 @@ class DeviceAlertPublisher:
         self._last_check: float = 0.0
         self._initialized: bool = False
 
-    def check_and_publish(self) -> None:
+    def check_and_publish(self, snapshot: Optional[StateSnapshot] = None) -> None:
         if not runtime.is_connected() or not settings.MATTERHUB_ID:
             return
 
@@ -280,19 +514,16 @@ class DeviceAlertPublisher:
         if self._last_check > 0 and (now - self._last_check) < settings.MQTT_ALERT_CHECK_INTERVAL_SEC:
             return
 
-        states = _fetch_ha_states()
-        if states is None:
-            return
+        if snapshot is None:
+            snapshot = _fetch_snapshot()
+            if snapshot is None:
+                return
 
         managed_ids = _load_managed_entity_ids()
 
         if not self._initialized:
-            for item in states:
-                if not isinstance(item, dict):
-                    continue
+            for item in snapshot.states:
                 entity_id = item.get("entity_id")
-                if not entity_id:
-                    continue
                 if managed_ids is not None and entity_id not in managed_ids:
                     continue
                 current = str(item.get("state", ""))
@@ -333,12 +564,8 @@ class DeviceAlertPublisher:
                   f"기존 알림 {sum(len(v) for v in self._alerted.values())}건 seed")
             return
 
-        for item in states:
-            if not isinstance(item, dict):
-                continue
+        for item in snapshot.states:
             entity_id = item.get("entity_id")
-            if not entity_id:
-                continue
             if managed_ids is not None and entity_id not in managed_ids:
                 continue
 
@@ -434,38 +661,34 @@ class DeviceAlertPublisher:
 _alert_publisher = DeviceAlertPublisher()
 
 
-def check_and_publish_alerts() -> None:
+def check_and_publish_alerts(snapshot: Optional[StateSnapshot] = None) -> None:
     try:
-        _alert_publisher.check_and_publish()
+        _alert_publisher.check_and_publish(snapshot)
     except Exception as exc:
         print(f"[MQTT][ALERT] 실패: {exc}")
 
 
-def _publish_devices_with_chunking(topic: str, devices: List[Dict[str, object]]) -> None:
-    payload = {
-        "hub_id": settings.MATTERHUB_ID,
-        "ts": publisher.utc_timestamp(),
-        "devices": devices,
-    }
-    serialized = json.dumps(payload, ensure_ascii=False).encode("utf-8")
-    max_bytes = settings.MQTT_DEVICE_STATE_CHUNK_SIZE_KB * 1024
-
-    if len(serialized) <= max_bytes:
-        publisher.publish(payload, response_topic=topic)
+def run_state_tick() -> None:
+    """Download /api/states once and feed the same snapshot to every poller."""
+    if not runtime.is_connected():
         return
+    snapshot = get_state_snapshot()
+    if snapshot is None:
+        return
+    publish_device_state(snapshot)
+    publish_device_states_bulk(snapshot)
+    check_and_publish_alerts(snapshot)
 
-    # 청크 분할
-    avg_size = len(serialized) / len(devices)
-    per_chunk = max(1, int((max_bytes - 500) / avg_size))
 
-    chunks = [devices[i:i + per_chunk] for i in range(0, len(devices), per_chunk)]
-    total = len(chunks)
-    for idx, chunk_devices in enumerate(chunks, start=1):
-        chunk_payload = {
-            "hub_id": settings.MATTERHUB_ID,
-            "ts": publisher.utc_timestamp(),
-            "chunk": idx,
-            "total_chunks": total,
-            "devices": chunk_devices,
-        }
-        publisher.publish(chunk_payload, response_topic=topic)
+def _publish_devices_with_chunking(
+    topic: str, devices: List[Dict[str, object]], extra: Optional[Dict[str, object]] = None
+) -> None:
+    # extra: delta 모드의 type/seq/base_seq/removed (청크마다 똑같이 붙는다)
+    envelope = {
+        "hub_id": settings.MATTERHUB_ID,
+        "ts": publisher.utc_timestamp(),
+        **(extra or {}),
+    }
+    chunking.publish_chunked(
+        envelope, "devices", devices, topic, settings.MQTT_DEVICE_STATE_CHUNK_SIZE_KB * 1024
+    )
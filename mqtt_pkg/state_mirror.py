@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from libs.ha_mirror import HAMirror
+
+
+class HAStateMirror(HAMirror):
+    """In-memory copy of HA entity states fed by the state_changed websocket.
+
+    접속할 때마다 /api/states로 전체를 다시 seed 한 뒤 이벤트를 증분 반영한다 (libs.ha_mirror).
+    연결이 끊긴 동안에는 ``is_synced``가 False가 되어 호출부가 REST 폴링으로 돌아간다.
+    """
+
+    def __init__(
+        self,
+        fetch_states: Callable[[], Optional[List[Dict[str, object]]]],
+        snapshot_factory: Callable[[List[Dict[str, object]]], Any],
+        ws_url: str,
+        token: Optional[str],
+    ) -> None:
+        super().__init__(fetch_states, ws_url, token, name="ha-state-mirror", log_prefix="[MQTT][MIRROR]")
+        self._snapshot_factory = snapshot_factory
+        self._snapshot: Any = None
+        self._snapshot_version = -1
+
+    def snapshot(self) -> Any:
+        with self._lock:
+            if self._snapshot_version != self._version:
+                self._snapshot = self._snapshot_factory(list(self._states.values()))
+                self._snapshot_version = self._version
+            return self._snapshot
+
+
+def wait_or_sleep(mirror: Optional[HAStateMirror], timeout: float) -> bool:
+    if mirror is not None and mirror.is_synced:
+        return mirror.wait_for_change(timeout)
+    time.sleep(timeout)
+    return False
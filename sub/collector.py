@@ -3,6 +3,7 @@
 매시간 Home Assistant API를 호출하여 기기 상태를 NDJSON 형식으로 저장
 """
 import os
+import sys
 import json
 import time
 import requests
@@ -13,6 +14,11 @@ import threading
 import logging
 from urllib.parse import urlencode
 
+# sub/ 디렉토리에서 단독 실행될 때 프로젝트 루트를 sys.path에 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libs import ha_client, jsonfast, resource_store
+
 # 로깅 설정
 logging.basicConfig(
     level=logging.INFO,
@@ -94,16 +100,10 @@ def collect_device_states() -> Optional[List[Dict[str, Any]]]:
         logger.error("HA_host 또는 hass_token이 설정되지 않았습니다")
         return None
     
-    headers = {"Authorization": f"Bearer {hass_token}"}
-    
     # 재시도 로직
     for attempt in range(MAX_RETRIES):
         try:
-            response = requests.get(
-                f"{HA_host}/api/states",
-                headers=headers,
-                timeout=30
-            )
+            response = ha_client.get_client().get("/api/states", timeout=30)
             
             if response.status_code == 200:
                 states = response.json()
@@ -131,22 +131,20 @@ def build_entity_list() -> Set[str]:
     entities: Set[str] = set()
     # devices.json 우선
     try:
-        if devices_file_path and os.path.exists(devices_file_path):
-            with open(devices_file_path, 'r', encoding='utf-8') as f:
-                content = f.read().strip()
-                if content:
-                    devices_data = json.loads(content)
-                    print(f"devices.json에서 {len(devices_data)}개 디바이스 읽기")
-                    logger.info(f"devices.json에서 {len(devices_data)}개 디바이스 읽기")
-                    for device in devices_data:
-                        eid = device.get('entity_id')
-                        if isinstance(eid, str) and eid:
-                            entities.add(eid)
-                            print(f"  - 엔티티 추가: {eid}")
-                    logger.info(f"devices.json에서 {len(entities)}개 엔티티 추출")
-                else:
-                    print("경고: devices.json 파일이 비어있습니다")
-                    logger.warning("devices.json 파일이 비어있습니다")
+        if devices_file_path and (resource_store.backend() != "json" or os.path.exists(devices_file_path)):
+            devices_data = resource_store.get_store(devices_file_path, "entity_id").all()
+            if devices_data:
+                print(f"devices.json에서 {len(devices_data)}개 디바이스 읽기")
+                logger.info(f"devices.json에서 {len(devices_data)}개 디바이스 읽기")
+                for device in devices_data:
+                    eid = device.get('entity_id')
+                    if isinstance(eid, str) and eid:
+                        entities.add(eid)
+                        print(f"  - 엔티티 추가: {eid}")
+                logger.info(f"devices.json에서 {len(entities)}개 엔티티 추출")
+            else:
+                print("경고: devices.json 파일이 비어있습니다")
+                logger.warning("devices.json 파일이 비어있습니다")
         else:
             print(f"경고: devices.json 파일을 찾을 수 없습니다: {devices_file_path}")
             logger.warning(f"devices.json 파일을 찾을 수 없습니다: {devices_file_path}")
@@ -173,14 +171,10 @@ def filter_states(states: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     
     managed_devices = set()
     try:
-        if devices_file_path and os.path.exists(devices_file_path):
-            with open(devices_file_path, 'r', encoding='utf-8') as f:
-                content = f.read().strip()
-                if content:
-                    devices_data = json.loads(content)
-                    for device in devices_data:
-                        if 'entity_id' in device:
-                            managed_devices.add(device['entity_id'])
+        if devices_file_path and (resource_store.backend() != "json" or os.path.exists(devices_file_path)):
+            for device in resource_store.get_store(devices_file_path, "entity_id").all():
+                if 'entity_id' in device:
+                    managed_devices.add(device['entity_id'])
     except Exception as e:
         logger.warning(f"devices.json 읽기 실패: {e}")
         # 실패 시 전체 기기 포함
@@ -296,10 +290,9 @@ def fetch_history(start_dt: datetime, end_dt: datetime, entities: Set[str]) -> O
     if not HA_host or not hass_token:
         logger.error("HA_host 또는 hass_token이 설정되지 않았습니다")
         return None
-    headers = {"Authorization": f"Bearer {hass_token}"}
     start_iso = to_utc_iso(start_dt)
     end_iso = to_utc_iso(end_dt)
-    path = f"{HA_host}/api/history/period/{start_iso}"
+    path = f"/api/history/period/{start_iso}"
     params_pairs = build_history_query_params(start_iso, end_iso, entities)
     query = urlencode(params_pairs)
 
@@ -311,7 +304,7 @@ def fetch_history(start_dt: datetime, end_dt: datetime, entities: Set[str]) -> O
 
     for attempt in range(MAX_RETRIES):
         try:
-            resp = requests.get(url, headers=headers, timeout=120)  # 타임아웃 120초로 증가 (10일치 데이터는 클 수 있음)
+            resp = ha_client.get_client().get(url, timeout=120)  # 타임아웃 120초로 증가 (10일치 데이터는 클 수 있음)
             if resp.status_code == 200:
                 data = resp.json()
                 # 응답 크기 확인
@@ -378,7 +371,7 @@ def save_to_file(states: List[Dict[str, Any]], dt: datetime) -> bool:
         with open(temp_path, 'w', encoding='utf-8') as f:
             for state in states:
                 record = format_state_record(state, ts)
-                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                f.write(jsonfast.dumps(record) + '\n')
         
         # 원자적 rename
         os.rename(temp_path, final_path)
@@ -412,7 +405,7 @@ def dedup_and_atomic_append(start_dt: datetime, new_records: List[Dict[str, Any]
             with open(final_path, 'r', encoding='utf-8') as rf:
                 for line in rf:
                     try:
-                        obj = json.loads(line)
+                        obj = jsonfast.loads(line)
                         k = (str(obj.get('device_id')), str(obj.get('ts')))
                         existing_keys.add(k)
                     except Exception:
@@ -433,7 +426,7 @@ def dedup_and_atomic_append(start_dt: datetime, new_records: List[Dict[str, Any]
                 k = (str(rec.get('device_id')), str(rec.get('ts')))
                 if k in existing_keys:
                     continue
-                wf.write(json.dumps(rec, ensure_ascii=False) + '\n')
+                wf.write(jsonfast.dumps(rec) + '\n')
                 existing_keys.add(k)
                 added += 1
         os.replace(temp_path, final_path)
@@ -10,13 +10,19 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from dotenv import load_dotenv
+from libs import config_events, ha_client, jsonfast, state_cache
 from libs.device_binding import enforce_mac_binding
+from libs.resource_store import get_store
+from libs.webhook_delivery import WebhookBatcher, WebhookDispatcher, batch_options
 
 # wm-app가 먼저 리소스/파일을 생성할 시간을 주기 위해 약간 지연
 time.sleep(5)
 load_dotenv(dotenv_path='.env')
 hass_token = os.environ.get('hass_token')
 HA_host = os.environ.get('HA_host')
+# __main__ 에서 생성한다. None 이면 notify_to_url이 직접 전송한다.
+dispatcher = None
+batcher = None
 
 auth_body = {
     "type": "auth",
@@ -37,11 +43,8 @@ subscribe_file_changed_body = {
 
 def get_notifications():
     notifications_path = os.environ.get('notifications_file_path', 'resources/notifications.json')
-    with open(notifications_path, 'r', encoding='utf-8') as file:
-        data = json.load(file)
-
-        return data
-    return [] 
+    # RESOURCE_BACKEND 에 따라 JSON 파일 또는 SQLite에서 읽는다.
+    return get_store(notifications_path).all()
 
 class notifier() : 
     def __init__(self):
@@ -53,6 +56,21 @@ class notifier() :
     def add_noti(self, r):
         self.notifications_list.append(r)
 
+    def apply_change(self, event):
+        # wm-app 가 보낸 변경 이벤트: 바뀐 id 의 알림만 교체한다.
+        ids = event.get('ids') or []
+        if not ids:
+            self.file_reload()
+            return
+        store = get_store(os.environ.get('notifications_file_path', 'resources/notifications.json'))
+        notifications_list = [noti for noti in self.notifications_list if noti.get('id') not in ids]
+        if event.get('op') != 'delete':
+            for noti_id in ids:
+                noti = store.get(noti_id)
+                if noti is not None:
+                    notifications_list.append(noti)
+        self.notifications_list = notifications_list
+
     def run_pending(self, event):
         for noti in self.notifications_list:
             if(event['event']['event_type']=="state_changed"):
@@ -67,47 +85,61 @@ class notifier() :
                     
                     if(_option == "equal"):
                         if(event['event']['data']['new_state']['state'] == noti['trigger']['state']):
-                            notify_to_url(noti['condition'], noti['action']['url'], event)
+                            notify_to_url(noti['condition'], noti['action']['url'], event, noti['action'].get('batch'))
                         return 
                     
                     current_state = float(event['event']['data']['new_state']['state'])
                     target_state = float(noti['trigger']['state'])
                     if(_option == "greaterThan"):
                         if(current_state > target_state):
-                            notify_to_url(noti['condition'], noti['action']['url'], event)
+                            notify_to_url(noti['condition'], noti['action']['url'], event, noti['action'].get('batch'))
                         return 
                     if(_option == "greaterThanOrEquals"):
                         if(current_state >= target_state):
-                            notify_to_url(noti['condition'], noti['action']['url'], event)
+                            notify_to_url(noti['condition'], noti['action']['url'], event, noti['action'].get('batch'))
                         return 
                     if(_option == "lessThan"):
                         if(current_state < target_state):
-                            notify_to_url(noti['condition'], noti['action']['url'], event)
+                            notify_to_url(noti['condition'], noti['action']['url'], event, noti['action'].get('batch'))
                         return 
                     if(_option == "lessThanOrEquals"):
                         if(current_state <= target_state):
-                            notify_to_url(noti['condition'], noti['action']['url'], event)
+                            notify_to_url(noti['condition'], noti['action']['url'], event, noti['action'].get('batch'))
                         return 
         return
 
-def notify_to_url(condition, url, payload):
+def auth_headers():
+    return {"Authorization": f"Bearer {hass_token}"}
+
+
+def notify_to_url(condition, url, payload, batch=None):
     if (checkCondition(condition)):
         print(payload)
-        headers = {"Authorization": f"Bearer {hass_token}"}
-        body = payload
-        try : 
-            response = requests.post(url, data=json.dumps(body), headers=headers)
-            print(response.content)
-        except : 
-            print(f"notify url({url})이 잘못되었거나, 서버가 반응이 없습니다.")
-        
+        headers = auth_headers()
+        options = batch_options(batch)
+        if options is not None and batcher is not None:
+            # action.batch 가 있으면 같은 URL로 가는 이벤트를 모아 JSON 배열로 보낸다.
+            window_sec, max_events, dedup = options
+            batcher.add(url, payload, headers, window_sec, max_events, dedup)
+            return
+        send(url, payload, headers)
+
+
+def send(url, body, headers):
+    if dispatcher is not None:
+        # 전송은 worker pool이 맡고 websocket 루프는 바로 다음 이벤트로 넘어간다.
+        dispatcher.enqueue(url, body)
+        return
+    try : 
+        response = requests.post(url, data=json.dumps(body), headers=headers, timeout=10)
+        print(response.content)
+    except : 
+        print(f"notify url({url})이 잘못되었거나, 서버가 반응이 없습니다.")
+
 
 def checkCondition(condition):
     for c in condition:
-        headers = {"Authorization": f"Bearer {hass_token}"}
-
-        response = requests.get(f"{HA_host}/api/states/{c['entity_id']}", headers=headers)
-        response = json.loads(response.content)
+        response = state_cache.get_cache().get_state(c['entity_id'])
 
         current_state = response['state']
         target_state = c['state']
@@ -165,6 +197,8 @@ async def subscribe(r):
             await websocket.send(json.dumps(subscribe_state_changed_body))
             response = await websocket.recv()
             print(f"Received from server: {response}")
+            # 구독 직후 seed 해야 그 사이 변경분을 놓치지 않는다.
+            await state_cache.get_cache().aseed_from_rest()
 
             await websocket.send(json.dumps(subscribe_file_changed_body))
             response = await websocket.recv()
@@ -173,10 +207,11 @@ async def subscribe(r):
             while(1):
                 response = await websocket.recv()
                 # print(f"Received from server: {response}")
-                event = json.loads(response)
+                event = jsonfast.loads(response)
 
                 try : 
                     if(event['event']['event_type']=="state_changed"):
+                        state_cache.get_cache().apply_event(event)
                         r.run_pending(event)
                     if(event['event']['event_type']=="notifications_file_changed"):
                         print(f"Received from server: {response}")
@@ -189,11 +224,31 @@ async def subscribe(r):
         # 예외가 발생했을 때 실행되는 코드
         print(f"An error occurred: {type(e).__name__}")
         print(f"Error details: {e}")
-        time.sleep(5)
+        state_cache.get_cache().mark_disconnected()
+        # config_events.listen 과 같은 루프를 쓰므로 블로킹 sleep 을 하면 안 된다.
+        await asyncio.sleep(5)
+
+
+async def run(r):
+    # 로컬 설정 변경 알림은 HA 구독이 끝날 때(프로세스 재시작)까지 함께 돈다.
+    listener = asyncio.ensure_future(
+        config_events.listen(r.apply_change, r.file_reload, resources=["notifications"])
+    )
+    try:
+        await subscribe(r)
+    finally:
+        listener.cancel()
+
 if __name__ == "__main__":
     if not enforce_mac_binding():
         raise SystemExit(1)
 
+    ha_client.configure(default_pool_maxsize=2)
+    # 토큰은 재시도 큐 파일에 쓰지 않고 전송할 때 다시 붙인다.
+    dispatcher = WebhookDispatcher(headers=auth_headers)
+    dispatcher.start()
+    batcher = WebhookBatcher(send)
+    batcher.start()
     r = notifier()
 
-    asyncio.run(subscribe(r))
+    asyncio.run(run(r))
@@ -1,20 +1,28 @@
 import asyncio
 import websockets
 import json
-import requests
 import os, sys, time
 
 # PM2 등에서 sub/ 디렉토리에서 실행될 때 프로젝트 루트를 sys.path에 추가
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from dotenv import load_dotenv
+from libs import config_events, ha_client, jsonfast, state_cache
+from libs.action_executor import ActionExecutor, rule_key
 from libs.device_binding import enforce_mac_binding
+from libs.env import env_float
+from libs.resource_store import get_store
+from libs.triggers import TriggerIndex
 
 # wm-app가 먼저 리소스/파일을 생성할 시간을 주기 위해 약간 지연
 time.sleep(5)
 load_dotenv(dotenv_path='.env')
 hass_token = os.environ.get('hass_token')
 HA_host = os.environ.get('HA_host')
+# 서비스 호출 1건의 HTTP 타임아웃 (초)
+RULE_ACTION_TIMEOUT_SEC = env_float('RULE_ACTION_TIMEOUT_SEC', 10.0)
+# __main__ 에서 생성한다. None 이면 executeActions가 동기 실행한다.
+action_executor = None
 
 auth_body = {
     "type": "auth",
@@ -35,77 +43,75 @@ subscribe_file_changed_body = {
 
 def get_rules():
     rules_path = os.environ.get('rules_file_path', 'resources/rules.json')
-    with open(rules_path, 'r', encoding='utf-8') as file:
-        data = json.load(file)
-
-        return data
-    return [] 
+    # RESOURCE_BACKEND 에 따라 JSON 파일 또는 SQLite에서 읽는다.
+    return get_store(rules_path).all()
 
 
 
 class rule_engine() : 
     def __init__(self):
         self.rules_list = get_rules()
+        self.trigger_index = TriggerIndex(self.rules_list)
 
     def file_reload(self):
         self.rules_list = get_rules()
+        self.trigger_index.rebuild(self.rules_list)
 
     def add_rule(self, r):
         self.rules_list.append(r)
-
-    def run_pending(self, event):
-        for rule in self.rules_list:
-            if(not rule['activate']):
+        self.trigger_index.add(r)
+
+    def apply_change(self, event):
+        # wm-app 가 보낸 변경 이벤트: 바뀐 id 의 규칙만 교체한다.
+        ids = event.get('ids') or []
+        if not ids:
+            self.file_reload()
+            return
+        store = get_store(os.environ.get('rules_file_path', 'resources/rules.json'))
+        rules_list = [rule for rule in self.rules_list if rule.get('id') not in ids]
+        for rule_id in ids:
+            self.trigger_index.remove(rule_id)
+            if event.get('op') == 'delete':
                 continue
+            rule = store.get(rule_id)
+            if rule is not None:
+                rules_list.append(rule)
+                self.trigger_index.add(rule)
+        self.rules_list = rules_list
 
-            if(event['event']['data']['new_state']['entity_id'] == rule['trigger']['entity_id']):
-
-                try:
-                    _option = rule['trigger']['option']
-                    
-                except KeyError:
-                    _option = "equal"
-                
-                
-                
-                if(_option == "equal"):
-                    if(event['event']['data']['new_state']['state'] == rule['trigger']['state']):
-                        executeActions(rule)
-                    return 
-                current_state = float(event['event']['data']['new_state']['state'])
-                target_state = float(rule['trigger']['state'])
-                if(_option == "greaterThan"):
-                    if(current_state > target_state):
-                        executeActions(rule)
-                    return
-                if(_option == "greaterThanOrEquals"):
-                    if(current_state >= target_state):
-                        executeActions(rule)
-                    return
-                if(_option == "lessThan"):
-                    if(current_state < target_state):
-                        executeActions(rule)
-                    return
-                if(_option == "lessThanOrEquals"):
-                    if(current_state <= target_state):
-                        executeActions(rule)
-                    return
-        return
+    def run_pending(self, event):
+        # entity_id 인덱스로 해당 엔티티의 규칙만 평가한다.
+        new_state = event['event']['data']['new_state']
+        if not new_state:
+            return
+        for rule in self.trigger_index.match(new_state['entity_id'], new_state['state']):
+            executeActions(rule)
 
 def executeActions(rule):
     if isinstance(rule['action'], dict):
-        service(rule['condition'], rule['action']['domain'], rule['action']['service'], rule['action']['entity_id'])
+        submitAction(rule, rule['action'])
     if isinstance(rule['action'], list):
         for r in rule['action']:
-            service(rule['condition'], r['domain'], r['service'], r['entity_id'])
+            submitAction(rule, r)
+
+
+def submitAction(rule, action):
+    args = (rule['condition'], action['domain'], action['service'], action['entity_id'])
+    if action_executor is None:
+        service(*args)
+        return
+    # 대상 엔티티별로 순서를 보장하고, websocket 수신 루프는 막지 않는다.
+    lane = action['entity_id'] if isinstance(action['entity_id'], str) else json.dumps(action['entity_id'])
+    action_executor.submit(rule_key(rule), lane, service, *args)
 
 
 def service(condition, domain, service, entity):
     if (checkCondition(condition)):
-        headers = {"Authorization": f"Bearer {hass_token}"}
         body = {"entity_id": entity}
 
-        response = requests.post(f"{HA_host}/api/services/{domain}/{service}", data=json.dumps(body), headers=headers)
+        response = ha_client.get_client().post(
+            f"/api/services/{domain}/{service}", data=json.dumps(body), timeout=RULE_ACTION_TIMEOUT_SEC
+        )
         print(response)
         print(response.content)
 
@@ -113,10 +119,7 @@ def checkCondition(condition):
     if(condition ==[]) : 
         return True
     for c in condition:
-        headers = {"Authorization": f"Bearer {hass_token}"}
-
-        response = requests.get(f"{HA_host}/api/states/{c['entity_id']}", headers=headers)
-        response = json.loads(response.content)
+        response = state_cache.get_cache().get_state(c['entity_id'])
 
         current_state = response['state']
         target_state = c['state']
@@ -176,6 +179,8 @@ async def subscribe(r):
                 await websocket.send(json.dumps(subscribe_state_changed_body))
                 response = await websocket.recv()
                 print(f"Received from server: {response}")
+                # 구독 직후 seed 해야 그 사이 변경분을 놓치지 않는다.
+                await state_cache.get_cache().aseed_from_rest()
 
                 await websocket.send(json.dumps(subscribe_file_changed_body))
                 response = await websocket.recv()
@@ -184,9 +189,10 @@ async def subscribe(r):
                 while(1):
                     response = await websocket.recv()
                     print(f"Received from server: {response}")
-                    event = json.loads(response)
+                    event = jsonfast.loads(response)
                     try : 
                         if(event['event']['event_type']=="state_changed"):
+                            state_cache.get_cache().apply_event(event)
                             r.run_pending(event)
                         if(event['event']['event_type']=="rules_file_changed"):
                             r.file_reload()
@@ -198,11 +204,23 @@ async def subscribe(r):
             # 예외가 발생했을 때 실행되는 코드
             print(f"An error occurred: {type(e).__name__}")
             print(f"Error details: {e}")
-            time.sleep(5)
+            state_cache.get_cache().mark_disconnected()
+            await asyncio.sleep(5)
+
+
+async def run(r):
+    # HA 이벤트 구독과 로컬 설정 변경 알림을 한 루프에서 같이 돈다.
+    await asyncio.gather(
+        subscribe(r),
+        config_events.listen(r.apply_change, r.file_reload, resources=["rules"]),
+    )
+
 if __name__ == "__main__":
     if not enforce_mac_binding():
         raise SystemExit(1)
 
+    action_executor = ActionExecutor()
+    ha_client.configure(default_pool_maxsize=action_executor.max_workers)
     r = rule_engine()
 
-    asyncio.run(subscribe(r))
+    asyncio.run(run(r))
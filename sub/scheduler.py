@@ -1,46 +1,136 @@
+import heapq
+import itertools
 import schedule
 import time
-import requests
 import json
 import threading
 from datetime import datetime
 from dotenv import load_dotenv
 import os
 
+from libs import ha_client, state_cache
+from libs.resource_store import get_store
+
 load_dotenv(dotenv_path='.env')
 HA_host = os.environ.get('HA_host')
 hass_token = os.environ.get('hass_token')
 
 class one_time_schedule():
+    """One-time schedules kept in a min-heap of pre-parsed fire times.
+
+    실행 스레드는 다음 항목의 실행 시각까지만 잠들고, 실행한 항목은 힙에서 빠진다.
+    schedule_config 재적용 시에는 sync()로 id 기준 변경분만 반영한다.
+    """
+
+    DATETIME_FORMAT = "%Y-%m-%d %H:%M"
+    # 기존과 같이 해당 "분" 안에서만 실행하고, 그보다 늦게 깨어나면 놓친 것으로 본다.
+    GRACE_SEC = 60
 
     def __init__(self):
         self.one_time_schedule_list = []
+        self._heap = []
+        # id -> (fire_time, schedule) ; 힙에는 남아 있어도 여기 없으면 취소된 항목
+        self._entries = {}
+        # 이미 실행한 (id -> fire_time); 같은 분 안에 재적용돼도 두 번 실행하지 않는다.
+        self._fired = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def _key(self, s):
+        # id 가 없으면 내용 기반 키를 써야 schedule.json 을 다시 읽어도 같은 키가 된다.
+        return schedule_key(s)
 
-    def add_schedule(self, s):
-        self.one_time_schedule_list.append(s)
+    def add_schedule(self, s, now=None):
+        fire_time = datetime.strptime(s['schedule']['datetime'], self.DATETIME_FORMAT)
+        now = now or datetime.now()
+        key = self._key(s)
+        if (now - fire_time).total_seconds() >= self.GRACE_SEC:
+            return False
+        with self._cond:
+            if self._fired.get(key) == fire_time:
+                return False
+            self._entries[key] = (fire_time, s)
+            heapq.heappush(self._heap, (fire_time, next(self._seq), key))
+            self._refresh_list()
+            self._cond.notify_all()
+        return True
 
-    def run_pending(self):
-        for s in self.one_time_schedule_list:
-            target_time = datetime.strptime(s['schedule']['datetime'], "%Y-%m-%d %H:%M")
-            current_time = datetime.now()
-            current_time = current_time.replace(second=0, microsecond=0)
+    def remove_schedule(self, key):
+        with self._cond:
+            if self._entries.pop(key, None) is None:
+                return False
+            self._refresh_list()
+            self._cond.notify_all()
+        return True
 
-            if current_time < target_time:
-                pass
-            elif current_time > target_time:
-                pass
-            else:
-                service(s['condition'], s['action']['domain'], s['action']['service'], s['action']['entity_id'])
-            
+    def sync(self, schedules, now=None):
+        """Apply a reloaded one-time schedule list incrementally (id 기준 diff)."""
+        wanted = {self._key(s): s for s in schedules}
+        with self._cond:
+            current = dict(self._entries)
+            self._fired = {key: t for key, t in self._fired.items() if key in wanted}
+        for key in current:
+            if key not in wanted:
+                self.remove_schedule(key)
+        for key, s in wanted.items():
+            if key in current and current[key][1] == s:
+                continue
+            self.remove_schedule(key)
+            try:
+                self.add_schedule(s, now)
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"one-time 스케줄 등록 실패 (id={s.get('id')}): {type(e).__name__} {e}")
+
+    def _refresh_list(self):
+        self.one_time_schedule_list = [s for _, s in self._entries.values()]
+
+    def _is_live(self, item):
+        entry = self._entries.get(item[2])
+        return entry is not None and entry[0] == item[0]
+
+    def _pop_due(self, now):
+        due = []
+        popped = False
+        with self._cond:
+            while self._heap and self._heap[0][0] <= now:
+                fire_time, _, key = heapq.heappop(self._heap)
+                # 취소됐거나 다시 등록된(시각이 바뀐) 항목의 옛 힙 엔트리는 버린다.
+                if not self._is_live((fire_time, None, key)):
+                    continue
+                entry = self._entries.pop(key)
+                popped = True
+                self._fired[key] = fire_time
+                if (now - fire_time).total_seconds() < self.GRACE_SEC:
+                    due.append(entry[1])
+            if popped:
+                self._refresh_list()
+        return due
 
+    def run_pending(self, now=None):
+        for s in self._pop_due(now or datetime.now()):
+            service(s['condition'], s['action']['domain'], s['action']['service'], s['action']['entity_id'])
+
+    def _seconds_until_next(self, now):
+        while self._heap and not self._is_live(self._heap[0]):
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return None
+        return max(0.0, (self._heap[0][0] - now).total_seconds())
+
+    def seconds_until_next(self, now=None):
+        with self._cond:
+            return self._seconds_until_next(now or datetime.now())
+
+    def wait_next(self, max_wait_sec):
+        """Sleep until the next item is due, or until the heap changes."""
+        with self._cond:
+            wait_sec = self._seconds_until_next(datetime.now())
+            self._cond.wait(max_wait_sec if wait_sec is None else min(wait_sec, max_wait_sec))
 
 
 def checkCondition(condition):
     for c in condition:
-        headers = {"Authorization": f"Bearer {hass_token}"}
-
-        response = requests.get(f"{HA_host}/api/states/{c['entity_id']}", headers=headers)
-        response = json.loads(response.content)
+        response = state_cache.get_cache().get_state(c['entity_id'])
 
         if(c['option']==""):
             if (response['state'] == c['state']):
@@ -67,10 +157,9 @@ def executeActions(schedule):
 def service(condition, domain, service, entity):
     try : 
         if (checkCondition(condition)):
-            headers = {"Authorization": f"Bearer {hass_token}"}
             body = {"entity_id": entity}
 
-            response = requests.post(f"{HA_host}/api/services/{domain}/{service}", data=json.dumps(body), headers=headers)
+            response = ha_client.get_client().post(f"/api/services/{domain}/{service}", data=json.dumps(body))
             print(response)
             print(response.content)
     except Exception as e:
@@ -79,95 +168,104 @@ def service(condition, domain, service, entity):
         print(f"Error details: {e}")
 
 
+# schedule.json 의 period.rate -> schedule.Job 단위 속성
+PERIOD_UNITS = (
+    "seconds", "minutes", "hours", "days", "weeks",
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+)
+
+# id -> (스케줄 정의, 등록된 schedule.Job)
+periodic_jobs = {}
+# schedule 라이브러리는 스레드 안전하지 않아 job 목록 변경/조회를 직렬화한다.
+# job 실행(HA 조건 조회 + 서비스 호출)은 이 lock 밖에서 한다.
+schedule_lock = threading.Lock()
+
+
+def schedule_key(s):
+    return s.get('id') or json.dumps(s, sort_keys=True)
+
+
+def build_periodic_job(s):
+    period = s['schedule']['period']
+    if period['rate'] not in PERIOD_UNITS:
+        raise ValueError(f"unsupported rate: {period['rate']}")
+    job = getattr(schedule.every(int(period['value'])), period['rate'])
+    if period['at'] != "":
+        job = job.at(period['at'])
+    return job.do(executeActions, s)
+
+
+def apply_periodic_schedules(schedules):
+    """Diff periodic schedules by id; only changed jobs are cancelled/re-registered.
+
+    변경되지 않은 job은 그대로 두므로 next_run 이 유지된다.
+    """
+    wanted = {schedule_key(s): s for s in schedules}
+    with schedule_lock:
+        _apply_periodic_schedules(wanted)
+
+
+def _apply_periodic_schedules(wanted):
+    for key in list(periodic_jobs):
+        definition, job = periodic_jobs[key]
+        if wanted.get(key) != definition:
+            schedule.cancel_job(job)
+            del periodic_jobs[key]
+    for key, s in wanted.items():
+        if key in periodic_jobs:
+            continue
+        try:
+            periodic_jobs[key] = (s, build_periodic_job(s))
+        except Exception as e:
+            print(f"periodic 스케줄 등록 실패 (id={s.get('id')}): {type(e).__name__} {e}")
+
+
 def schedule_config(one_time):
-    schedule.clear()
+    periodic_list = []
+    one_time_list = []
 
     schedules_path = os.environ.get('schedules_file_path', 'resources/schedule.json')
-    with open(schedules_path, 'r', encoding='utf-8') as file:
-        data = json.load(file)  # JSON 파일을 파싱하여 Python 객체로 변환
-        for _schedule_data in data:
-            if(not _schedule_data['activate']):
+    # app.py 라우트와 같은 ResourceStore를 쓰므로 파일이 바뀌었을 때만 다시 파싱한다.
+    data = get_store(schedules_path).all()
+    for _schedule_data in data:
+        if(not _schedule_data['activate']):
+            continue
+        if(_schedule_data['schedule']['type'] == "periodic"):
+            periodic_list.append(_schedule_data)
+        if(_schedule_data['schedule']['type'] == "one-time"):
+            one_time_list.append(_schedule_data)
+    apply_periodic_schedules(periodic_list)
+    one_time.sync(one_time_list)
+
+def start_state_cache():
+    # 조건 평가용 상태 캐시를 웹소켓으로 동기화한다 (HA_STATE_CACHE_MAX_AGE_SEC=0 이면 비활성).
+    return state_cache.get_cache().start()
+
+def run_periodic_pending():
+    """schedule.run_pending() equivalent that holds schedule_lock only around registry access."""
+    with schedule_lock:
+        due = sorted(job for job in schedule.get_jobs() if job.should_run)
+    for job in due:
+        with schedule_lock:
+            # 실행을 기다리는 사이 CRUD 로 취소된 job 은 건너뛴다.
+            if job not in schedule.get_jobs():
                 continue
-            if(_schedule_data['schedule']['type'] == "periodic"):
-                if(_schedule_data['schedule']['period']['rate'] == "seconds"):
-                    if(_schedule_data['schedule']['period']['at'] != ""):
-                        schedule.every(int(_schedule_data['schedule']['period']['value'])).seconds.at(_schedule_data['schedule']['period']['at']).do(executeActions,_schedule_data)
-                    else:
-                        schedule.every(int(_schedule_data['schedule']['period']['value'])).seconds.do(executeActions,_schedule_data)
-                if(_schedule_data['schedule']['period']['rate'] == "minutes"):
-                    if(_schedule_data['schedule']['period']['at'] != ""):
-                        schedule.every(int(_schedule_data['schedule']['period']['value'])).minutes.at(_schedule_data['schedule']['period']['at']).do(executeActions,_schedule_data)
-                    else:
-                        schedule.every(int(_schedule_data['schedule']['period']['value'])).minutes.do(executeActions,_schedule_data)
-                if(_schedule_data['schedule']['period']['rate'] == "hours"):
-                    if(_schedule_data['schedule']['period']['at'] != ""):
-                        schedule.every(int(_schedule_data['schedule']['period']['value'])).hours.at(_schedule_data['schedule']['period']['at']).do(executeActions,_schedule_data)
-                    else:
-                        schedule.every(int(_schedule_data['schedule']['period']['value'])).hours.do(executeActions,_schedule_data)
-                if(_schedule_data['schedule']['period']['rate'] == "days"):
-                    if(_schedule_data['schedule']['period']['at'] != ""):
-                        schedule.every(int(_schedule_data['schedule']['period']['value'])).days.at(_schedule_data['schedule']['period']['at']).do(executeActions,_schedule_data)
-                    else:
-                        schedule.every(int(_schedule_data['schedule']['period']['value'])).days.do(executeActions,_schedule_data)
-                if(_schedule_data['schedule']['period']['rate'] == "weeks"):
-                    if(_schedule_data['schedule']['period']['at'] != ""):
-                        schedule.every(int(_schedule_data['schedule']['period']['value'])).weeks.at(_schedule_data['schedule']['period']['at']).do(executeActions,_schedule_data)
-                    else:
-                        schedule.every(int(_schedule_data['schedule']['period']['value'])).weeks.do(executeActions,_schedule_data)
-                if(_schedule_data['schedule']['period']['rate'] == "monday"):
-                    if(_schedule_data['schedule']['period']['at'] != ""):
-                        schedule.every(int(_schedule_data['schedule']['period']['value'])).monday.at(_schedule_data['schedule']['period']['at']).do(executeActions,_schedule_data)
-                    else:
-                        schedule.every(int(_schedule_data['schedule']['period']['value'])).monday.do(executeActions,_schedule_data)
-                if(_schedule_data['schedule']['period']['rate'] == "tuesday"):
-                    if(_schedule_data['schedule']['period']['at'] != ""):
-                        schedule.every(int(_schedule_data['schedule']['period']['value'])).tuesday.at(_schedule_data['schedule']['period']['at']).do(executeActions,_schedule_data)
-                    else:
-                        schedule.every(int(_schedule_data['schedule']['period']['value'])).tuesday.do(executeActions,_schedule_data)
-                if(_schedule_data['schedule']['period']['rate'] == "wednesday"):
-                    if(_schedule_data['schedule']['period']['at'] != ""):
-                        schedule.every(int(_schedule_data['schedule']['period']['value'])).wednesday.at(_schedule_data['schedule']['period']['at']).do(executeActions,_schedule_data)
-                    else:
-                        schedule.every(int(_schedule_data['schedule']['period']['value'])).wednesday.do(executeActions,_schedule_data)
-                if(_schedule_data['schedule']['period']['rate'] == "thursday"):
-                    if(_schedule_data['schedule']['period']['at'] != ""):
-                        schedule.every(int(_schedule_data['schedule']['period']['value'])).thursday.at(_schedule_data['schedule']['period']['at']).do(executeActions,_schedule_data)
-                    else:
-                        schedule.every(int(_schedule_data['schedule']['period']['value'])).thursday.do(executeActions,_schedule_data)
-                if(_schedule_data['schedule']['period']['rate'] == "friday"):
-                    if(_schedule_data['schedule']['period']['at'] != ""):
-                        schedule.every(int(_schedule_data['schedule']['period']['value'])).friday.at(_schedule_data['schedule']['period']['at']).do(executeActions,_schedule_data)
-                    else:
-                        schedule.every(int(_schedule_data['schedule']['period']['value'])).friday.do(executeActions,_schedule_data)
-                if(_schedule_data['schedule']['period']['rate'] == "saturday"):
-                    if(_schedule_data['schedule']['period']['at'] != ""):
-                        schedule.every(int(_schedule_data['schedule']['period']['value'])).saturday.at(_schedule_data['schedule']['period']['at']).do(executeActions,_schedule_data)
-                    else:
-                        schedule.every(int(_schedule_data['schedule']['period']['value'])).saturday.do(executeActions,_schedule_data)
-                if(_schedule_data['schedule']['period']['rate'] == "sunday"):
-                    if(_schedule_data['schedule']['period']['at'] != ""):
-                        schedule.every(int(_schedule_data['schedule']['period']['value'])).sunday.at(_schedule_data['schedule']['period']['at']).do(executeActions,_schedule_data)
-                    else:
-                        schedule.every(int(_schedule_data['schedule']['period']['value'])).sunday.do(executeActions,_schedule_data)
-
-
-            if(_schedule_data['schedule']['type'] == "one-time"):
-                one_time.add_schedule(_schedule_data)
+        ret = job.run()
+        if isinstance(ret, schedule.CancelJob) or ret is schedule.CancelJob:
+            with schedule_lock:
+                schedule.cancel_job(job)
 
 def periodic_scheduler():
     while 1:
-        schedule.run_pending()
+        run_periodic_pending()
         time.sleep(1)
 
 def one_time_scheduler(one_time):
-    prev_datetime = ''
-
+    # 시계 조정(NTP 등)에 대비해 최대 대기 시간을 둔다.
+    max_wait_sec = 60
     while 1:
-        cur_datetime = datetime.now().minute
-        if(prev_datetime!=cur_datetime):
-            one_time.run_pending()
-            prev_datetime = cur_datetime
-        time.sleep(10)
+        one_time.run_pending()
+        one_time.wait_next(max_wait_sec)
 
 
 
@@ -177,6 +275,7 @@ if (__name__ == "__main__"):
     one_time = one_time_schedule()
 
     schedule_config(one_time)
+    start_state_cache()
     p = threading.Thread(target=periodic_scheduler)
     p.start()
     o = threading.Thread(target=one_time_scheduler, args=(one_time,))
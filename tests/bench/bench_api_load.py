@@ -0,0 +1,137 @@
+"""wm-app HTTP 부하 테스트.
+
+동시 클라이언트 N개가 keep-alive 세션으로 URL을 반복 호출하고 req/s, 지연 백분위를 출력한다.
+
+    # 실행 중인 API 서버 측정 (개발 서버 / 운영 서버 각각 띄워서 비교)
+    python tests/bench/bench_api_load.py --url http://127.0.0.1:8100/local/api/states -c 16 -d 20
+
+    # HA 없이 서버 백엔드만 비교 (가짜 /local/api/states, 요청당 HA 지연 흉내)
+    python tests/bench/bench_api_load.py --compare -c 16 -d 10
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from typing import Dict, List
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from libs.wsgi_server import APIServer  # noqa: E402
+
+
+def run_load(url: str, concurrency: int, duration: float) -> Dict[str, float]:
+    latencies: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker() -> None:
+        session = requests.Session()
+        local: List[float] = []
+        failed = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = session.get(url, timeout=30)
+                response.content
+                if response.status_code >= 400:
+                    failed += 1
+            except requests.RequestException:
+                failed += 1
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+
+    def pct(p: float) -> float:
+        if not latencies:
+            return 0.0
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+    }
+
+
+def _fake_app(entities: int, upstream_ms: float):
+    from flask import Flask, Response
+
+    app = Flask("bench")
+    body = json.dumps([
+        {"entity_id": f"sensor.device_{i}", "state": str(i % 100), "attributes": {"friendly_name": f"Device {i}"}}
+        for i in range(entities)
+    ])
+
+    @app.route("/local/api/states")
+    def states():
+        time.sleep(upstream_ms / 1000)  # HA 왕복 지연
+        return Response(body, mimetype="application/json")
+
+    return app
+
+
+def compare(concurrency: int, duration: float, entities: int, upstream_ms: float, threads: int) -> None:
+    app = _fake_app(entities, upstream_ms)
+    rows = []
+    for label, backend in (("werkzeug dev (app.run)", "werkzeug"), ("waitress", "waitress")):
+        server = APIServer(app, {"host": "127.0.0.1", "port": 0, "backend": backend, "threads": threads})
+        if server.backend != backend:
+            print(f"{label}: 설치되어 있지 않아 건너뜀")
+            continue
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        result = run_load(f"http://127.0.0.1:{server.port}/local/api/states", concurrency, duration)
+        # close() 는 run() 루프가 끝난 뒤에 부른다 (waitress 이벤트 루프는 한 스레드에서만 돈다).
+        server.stop()
+        thread.join(timeout=5)
+        server.close(timeout=5)
+        rows.append((label, result))
+
+    print(f"\nentities={entities} upstream={upstream_ms}ms concurrency={concurrency} duration={duration}s")
+    print(f"{'server':<24}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for label, r in rows:
+        print(f"{label:<24}{r['rps']:>10.1f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['errors']:>8}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8100/local/api/states")
+    parser.add_argument("-c", "--concurrency", type=int, default=16)
+    parser.add_argument("-d", "--duration", type=float, default=10.0)
+    parser.add_argument("--compare", action="store_true", help="가짜 앱으로 서버 백엔드 비교")
+    parser.add_argument("--entities", type=int, default=500)
+    parser.add_argument("--upstream-ms", type=float, default=20.0)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(args.concurrency, args.duration, args.entities, args.upstream_ms, args.threads)
+        return
+
+    result = run_load(args.url, args.concurrency, args.duration)
+    print(json.dumps({"url": args.url, "concurrency": args.concurrency, **result}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Hot path JSON 비용: 표준 json (기존 코드) vs libs.jsonfast.
+
+경로별로 기존 호출과 jsonfast 호출을 같은 입력으로 반복해 op 당 시간과 배속을 출력한다.
+Raspberry Pi 등 ARM 장비에서 그대로 실행하면 된다.
+
+    python tests/bench/bench_jsonfast.py --entities 500 -n 200
+    WM_JSON_BACKEND=msgspec python tests/bench/bench_jsonfast.py
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from libs import jsonfast  # noqa: E402
+
+
+def make_state(i: int) -> Dict[str, Any]:
+    return {
+        "entity_id": f"sensor.device_{i}",
+        "state": str(i % 100),
+        "attributes": {
+            "friendly_name": f"Device {i} 온도",
+            "unit_of_measurement": "°C",
+            "device_class": "temperature",
+            "state_class": "measurement",
+        },
+        "last_changed": "2026-10-18T00:00:00.000000+00:00",
+        "last_updated": "2026-10-18T00:00:00.000000+00:00",
+        "context": {"id": f"01H{i:023d}", "parent_id": None, "user_id": None},
+    }
+
+
+def make_paths(entities: int) -> List[Tuple[str, Callable[[], Any], Callable[[], Any]]]:
+    states = [make_state(i) for i in range(entities)]
+    state = states[0]
+    envelope = {
+        "type": "bootstrap_all_states",
+        "correlation_id": None,
+        "ts": "2026-10-18T00:00:00Z",
+        "data": states,
+    }
+    event = {
+        "id": 1,
+        "type": "event",
+        "event": {
+            "event_type": "state_changed",
+            "data": {"entity_id": state["entity_id"], "old_state": state, "new_state": state},
+            "origin": "LOCAL",
+            "time_fired": "2026-10-18T00:00:00.000000+00:00",
+        },
+    }
+    event_text = json.dumps(event)
+    record = {"device_id": state["entity_id"], "ts": "2026-10-18T00:00:00Z", "state": state["state"],
+              "attributes": state["attributes"]}
+    ndjson_line = json.dumps(record, ensure_ascii=False)
+    body = json.dumps(states).encode("utf-8")
+
+    return [
+        # (경로, 기존 코드, jsonfast)
+        ("publisher.publish (all states)",
+         lambda: json.dumps(envelope, ensure_ascii=False),
+         lambda: jsonfast.dumpb(envelope)),
+        ("publish_device_state dedup",
+         lambda: [json.dumps(s, sort_keys=True, ensure_ascii=False) for s in states],
+         lambda: [jsonfast.dumpb(s, sort_keys=True) for s in states]),
+        ("collector NDJSON write",
+         lambda: [json.dumps(record, ensure_ascii=False) + "\n" for _ in range(entities)],
+         lambda: [jsonfast.dumps(record) + "\n" for _ in range(entities)]),
+        ("collector NDJSON read",
+         lambda: [json.loads(ndjson_line) for _ in range(entities)],
+         lambda: [jsonfast.loads(ndjson_line) for _ in range(entities)]),
+        ("websocket event loads",
+         lambda: json.loads(event_text),
+         lambda: jsonfast.loads(event_text)),
+        ("/api/states body loads",
+         lambda: json.loads(body),
+         lambda: jsonfast.loads(body)),
+    ]
+
+
+def timed(fn: Callable[[], Any], repeat: int) -> float:
+    fn()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entities", type=int, default=500)
+    parser.add_argument("-n", "--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"\nbackend={jsonfast.BACKEND} machine={platform.machine()} python={platform.python_version()} "
+          f"entities={args.entities} repeat={args.repeat}")
+    print(f"{'path':<32}{'json us':>12}{'fast us':>12}{'speedup':>10}")
+    for label, baseline, fast in make_paths(args.entities):
+        before = timed(baseline, args.repeat) * 1e6
+        after = timed(fast, args.repeat) * 1e6
+        print(f"{label:<32}{before:>12.1f}{after:>12.1f}{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""MQTT 압축 봉투 크기/CPU 측정 (libs.mqtt_envelope).
+
+state/devices 형식의 가짜 페이로드를 인코딩/레벨/형식별로 압축해서 크기, 압축률,
+허브 압축 시간, 클라우드 unwrap 시간, 100KB 청크 기준 메시지 수를 출력한다.
+Raspberry Pi 에서 그대로 실행해 허브 CPU 비용을 확인한다.
+
+    python tests/bench/bench_mqtt_compression.py --entities 200 1000 3000 -n 20
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from libs import jsonfast, mqtt_envelope  # noqa: E402
+
+CHUNK_BYTES = 100 * 1024
+
+
+def make_payload(entities: int) -> bytes:
+    devices = [
+        {
+            "entity_id": f"sensor.device_{i}",
+            "state": str(20 + i % 10),
+            "last_changed": "2026-10-18T00:00:00.000000+00:00",
+            "attributes": {
+                "friendly_name": f"거실 센서 {i}",
+                "unit_of_measurement": "°C",
+                "device_class": "temperature",
+                "state_class": "measurement",
+                "battery_level": 80 + i % 20,
+            },
+        }
+        for i in range(entities)
+    ]
+    return jsonfast.dumpb({"hub_id": "whatsmatter-bench", "ts": "2026-10-18T00:00:00Z", "devices": devices})
+
+
+def timed(fn: Callable[[], Any], repeat: int) -> Tuple[Any, float]:
+    result = fn()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return result, (time.perf_counter() - started) / repeat * 1000
+
+
+def variants() -> List[Tuple[str, str, Optional[int]]]:
+    rows = [(mqtt_envelope.GZIP, fmt, level) for level in (1, 6, 9) for fmt in ("base64", "binary")]
+    if mqtt_envelope.zstandard is not None:
+        rows += [(mqtt_envelope.ZSTD, fmt, level) for level in (1, 3, 9) for fmt in ("base64", "binary")]
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entities", type=int, nargs="+", default=[200, 1000, 3000])
+    parser.add_argument("-n", "--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"machine={platform.machine()} python={platform.python_version()} "
+          f"zstd={'yes' if mqtt_envelope.zstandard is not None else 'no (pip install zstandard)'}")
+    for entities in args.entities:
+        raw = make_payload(entities)
+        print(f"\nentities={entities} raw={len(raw) / 1024:.1f} KiB "
+              f"messages@100KB={math.ceil(len(raw) / CHUNK_BYTES)}")
+        print(f"{'encoding':<10}{'format':<8}{'level':>6}{'KiB':>9}{'ratio':>8}{'msgs':>6}{'enc ms':>9}{'dec ms':>9}")
+        for encoding, fmt, level in variants():
+            wire, enc_ms = timed(lambda: mqtt_envelope.wrap(raw, encoding, fmt, {"type": "bench"}, level), args.repeat)
+            decoded, dec_ms = timed(lambda: mqtt_envelope.unwrap(wire), args.repeat)
+            assert decoded == json.loads(raw)
+            print(f"{encoding:<10}{fmt:<8}{level:>6}{len(wire) / 1024:>9.1f}{len(raw) / len(wire):>7.1f}x"
+                  f"{math.ceil(len(wire) / CHUNK_BYTES):>6}{enc_ms:>9.2f}{dec_ms:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
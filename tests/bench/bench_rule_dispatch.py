@@ -0,0 +1,153 @@
+"""rule_engine.run_pending 디스패치 마이크로벤치마크.
+
+기록된 state_changed 이벤트 스트림(NDJSON, HA websocket 메시지 그대로)을
+1k/10k 규칙에 대해 재생하고, 기존 선형 스캔과 entity_id 인덱스를 비교한다.
+
+    python tests/bench/bench_rule_dispatch.py
+    python tests/bench/bench_rule_dispatch.py --events recorded_events.ndjson --rules 1000 10000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from libs.triggers import TriggerIndex  # noqa: E402
+
+OPTIONS = ("equal", "greaterThan", "greaterThanOrEquals", "lessThan", "lessThanOrEquals")
+
+
+def build_rules(count: int, entity_count: int, rng: random.Random) -> List[Dict[str, Any]]:
+    rules = []
+    for i in range(count):
+        option = rng.choice(OPTIONS)
+        target = rng.choice(("on", "off")) if option == "equal" else str(rng.randint(0, 100))
+        rules.append({
+            "id": f"rule-{i}",
+            "activate": True,
+            "trigger": {
+                "entity_id": f"sensor.device_{rng.randrange(entity_count)}",
+                "state": target,
+                "option": option,
+            },
+            "condition": [],
+            "action": {"domain": "light", "service": "turn_on", "entity_id": "light.x"},
+        })
+    return rules
+
+
+def synthesize_events(count: int, entity_count: int, rng: random.Random) -> List[Dict[str, Any]]:
+    events = []
+    for _ in range(count):
+        entity_id = f"sensor.device_{rng.randrange(entity_count)}"
+        value = rng.choice(("on", "off", str(rng.randint(0, 100)), "unavailable"))
+        events.append({
+            "type": "event",
+            "event": {
+                "event_type": "state_changed",
+                "data": {"entity_id": entity_id, "new_state": {"entity_id": entity_id, "state": value}},
+            },
+        })
+    return events
+
+
+def load_events(path: str) -> List[Dict[str, Any]]:
+    events = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            message = json.loads(line)
+            if message.get("event", {}).get("event_type") == "state_changed":
+                events.append(message)
+    return events
+
+
+def linear_dispatch(rules: List[Dict[str, Any]], event: Dict[str, Any]) -> int:
+    """기존 run_pending과 같은 방식: 매 이벤트마다 전체 규칙을 스캔하고 float 변환."""
+    new_state = event["event"]["data"]["new_state"]
+    matched = 0
+    for rule in rules:
+        if not rule["activate"] or new_state["entity_id"] != rule["trigger"]["entity_id"]:
+            continue
+        option = rule["trigger"].get("option", "equal")
+        if option == "equal":
+            matched += new_state["state"] == rule["trigger"]["state"]
+            continue
+        try:
+            current = float(new_state["state"])
+        except ValueError:
+            continue
+        target = float(rule["trigger"]["state"])
+        if option == "greaterThan":
+            matched += current > target
+        elif option == "greaterThanOrEquals":
+            matched += current >= target
+        elif option == "lessThan":
+            matched += current < target
+        elif option == "lessThanOrEquals":
+            matched += current <= target
+    return matched
+
+
+def indexed_dispatch(index: TriggerIndex, event: Dict[str, Any]) -> int:
+    new_state = event["event"]["data"]["new_state"]
+    return len(index.match(new_state["entity_id"], new_state["state"]))
+
+
+def run(rule_count: int, events: List[Dict[str, Any]], entity_count: int, seed: int) -> None:
+    rng = random.Random(seed)
+    rules = build_rules(rule_count, entity_count, rng)
+
+    started = time.perf_counter()
+    index = TriggerIndex(rules)
+    build_sec = time.perf_counter() - started
+
+    started = time.perf_counter()
+    linear_matches = sum(linear_dispatch(rules, event) for event in events)
+    linear_sec = time.perf_counter() - started
+
+    started = time.perf_counter()
+    indexed_matches = sum(indexed_dispatch(index, event) for event in events)
+    indexed_sec = time.perf_counter() - started
+
+    per_event_linear = linear_sec / len(events) * 1e6
+    per_event_indexed = indexed_sec / len(events) * 1e6
+    print(
+        f"rules={rule_count:>6} events={len(events)} "
+        f"linear={per_event_linear:9.2f}us/event indexed={per_event_indexed:7.2f}us/event "
+        f"speedup={per_event_linear / max(per_event_indexed, 1e-9):7.1f}x "
+        f"index_build={build_sec * 1000:.1f}ms "
+        f"matches={linear_matches}/{indexed_matches}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", help="recorded HA websocket messages (NDJSON)")
+    parser.add_argument("--event-count", type=int, default=20000)
+    parser.add_argument("--entities", type=int, default=500)
+    parser.add_argument("--rules", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.events:
+        events = load_events(args.events)
+    else:
+        events = synthesize_events(args.event_count, args.entities, random.Random(args.seed))
+    if not events:
+        raise SystemExit("no state_changed events to replay")
+
+    for rule_count in args.rules:
+        run(rule_count, events, args.entities, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""/states 응답: 파싱 후 재인코딩 vs HA 원본 바이트 그대로 전달.
+
+HA /api/states 크기의 가짜 본문(기본 5,000 엔티티)으로 두 경로의 CPU 시간과 최대 메모리를 비교한다.
+
+    - api : Flask /local/api/states 응답 본문 만들기 (jsonify vs 원본 바이트)
+    - mqtt: query_response_all 봉투 만들기 (json.loads + json.dumps vs splice_raw_json)
+
+    python tests/bench/bench_states_passthrough.py --entities 5000 -n 20
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+
+def make_states(entities: int) -> bytes:
+    states = [
+        {
+            "entity_id": f"sensor.device_{i}",
+            "state": str(i % 100),
+            "attributes": {
+                "friendly_name": f"Device {i} 온도",
+                "unit_of_measurement": "°C",
+                "device_class": "temperature",
+            },
+            "last_changed": "2026-10-18T00:00:00.000000+00:00",
+            "last_updated": "2026-10-18T00:00:00.000000+00:00",
+            "context": {"id": f"01H{i:023d}", "parent_id": None, "user_id": None},
+        }
+        for i in range(entities)
+    ]
+    return json.dumps(states, ensure_ascii=False).encode("utf-8")
+
+
+def measure(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+    fn()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = (time.perf_counter() - started) / repeat
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ms": elapsed * 1000, "peak_mb": peak / (1024 * 1024)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entities", type=int, default=5000)
+    parser.add_argument("-n", "--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    from flask import Flask, jsonify
+
+    raw = make_states(args.entities)
+    try:
+        from mqtt_pkg import publisher
+    except ImportError as e:  # awscrt 미설치 환경
+        print(f"mqtt 경로는 건너뜀: {e}")
+        publisher = None
+    app = Flask("bench")
+    envelope = {
+        "type": "query_response_all",
+        "correlation_id": "bench",
+        "request_id": "bench",
+        "endpoint": "/states",
+        "status": 200,
+        "ts": "2026-10-18T00:00:00Z",
+    }
+
+    def api_reencode() -> bytes:
+        with app.app_context():
+            return jsonify(json.loads(raw)).get_data()
+
+    def api_passthrough() -> bytes:
+        with app.app_context():
+            return app.response_class(raw, mimetype="application/json").get_data()
+
+    def mqtt_reencode() -> str:
+        return json.dumps({**envelope, "data": json.loads(raw)}, ensure_ascii=False)
+
+    def mqtt_passthrough() -> bytes:
+        return publisher.splice_raw_json(envelope, "data", raw)
+
+    rows = [
+        ("api  parse+reencode", measure(api_reencode, args.repeat)),
+        ("api  passthrough", measure(api_passthrough, args.repeat)),
+    ]
+    if publisher is not None:
+        rows.append(("mqtt parse+reencode", measure(mqtt_reencode, args.repeat)))
+        rows.append(("mqtt splice", measure(mqtt_passthrough, args.repeat)))
+    print(f"\nentities={args.entities} body={len(raw) / 1024:.0f} KiB repeat={args.repeat}")
+    print(f"{'path':<22}{'ms/op':>10}{'peak MiB':>10}")
+    for label, r in rows:
+        print(f"{label:<22}{r['ms']:>10.2f}{r['peak_mb']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
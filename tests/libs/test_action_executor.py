@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import threading
+import time
+import unittest
+
+from libs.action_executor import ActionExecutor, rule_key
+
+
+class ActionExecutorTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.executor = ActionExecutor(max_workers=4, per_rule_limit=10, stats_interval_sec=0)
+
+    def tearDown(self) -> None:
+        self.executor.shutdown()
+
+    def test_jobs_for_same_entity_run_in_submit_order(self) -> None:
+        seen = []
+
+        def job(i):
+            time.sleep(0.001 * (5 - i))
+            seen.append(i)
+
+        for i in range(5):
+            self.assertTrue(self.executor.submit("rule-1", "light.a", job, i))
+
+        self.assertTrue(self.executor.wait_idle(timeout=5))
+        self.assertEqual([0, 1, 2, 3, 4], seen)
+
+    def test_slow_entity_does_not_block_other_entities(self) -> None:
+        release = threading.Event()
+        fast_done = threading.Event()
+
+        self.executor.submit("rule-1", "light.slow", release.wait, 5)
+        self.executor.submit("rule-2", "light.fast", fast_done.set)
+
+        self.assertTrue(fast_done.wait(timeout=2))
+        self.assertFalse(release.is_set())
+        release.set()
+        self.assertTrue(self.executor.wait_idle(timeout=5))
+
+    def test_per_rule_limit_drops_excess_jobs(self) -> None:
+        executor = ActionExecutor(max_workers=1, per_rule_limit=2, stats_interval_sec=0)
+        release = threading.Event()
+        try:
+            self.assertTrue(executor.submit("rule-1", "light.a", release.wait, 5))
+            self.assertTrue(executor.submit("rule-1", "light.a", lambda: None))
+            self.assertFalse(executor.submit("rule-1", "light.b", lambda: None))
+            self.assertTrue(executor.submit("rule-2", "light.a", lambda: None))
+            release.set()
+            self.assertTrue(executor.wait_idle(timeout=5))
+            stats = executor.stats()
+        finally:
+            executor.shutdown()
+
+        self.assertEqual(1, stats["dropped"])
+        self.assertEqual(3, stats["completed"])
+        self.assertEqual(0, stats["queue_depth"])
+
+    def test_rules_without_id_get_separate_budgets(self) -> None:
+        noisy = {"trigger": [{"entity_id": "sensor.motion", "state": "on"}], "condition": [], "action": []}
+        quiet = {"trigger": [{"entity_id": "binary_sensor.door", "state": "on"}], "condition": [], "action": []}
+        self.assertNotEqual(rule_key(noisy), rule_key(quiet))
+        self.assertEqual(rule_key(quiet), rule_key(dict(quiet)))
+        self.assertEqual("r1", rule_key({"id": "r1", **quiet}))
+
+        executor = ActionExecutor(max_workers=1, per_rule_limit=1, stats_interval_sec=0)
+        release = threading.Event()
+        try:
+            self.assertTrue(executor.submit(rule_key(noisy), "light.a", release.wait, 5))
+            self.assertFalse(executor.submit(rule_key(noisy), "light.a", lambda: None))
+            # 시끄러운 id 없는 규칙이 한도에 걸려도 다른 id 없는 규칙은 실행된다.
+            self.assertTrue(executor.submit(rule_key(quiet), "light.b", lambda: None))
+            release.set()
+            self.assertTrue(executor.wait_idle(timeout=5))
+        finally:
+            executor.shutdown()
+
+    def test_failures_are_counted_and_lane_keeps_running(self) -> None:
+        done = threading.Event()
+
+        def boom():
+            raise RuntimeError("HA down")
+
+        self.executor.submit("rule-1", "light.a", boom)
+        self.executor.submit("rule-1", "light.a", done.set)
+
+        self.assertTrue(done.wait(timeout=2))
+        self.assertTrue(self.executor.wait_idle(timeout=5))
+        stats = self.executor.stats()
+        self.assertEqual(1, stats["failed"])
+        self.assertEqual(1, stats["completed"])
+        self.assertGreaterEqual(stats["latency_max_sec"], 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
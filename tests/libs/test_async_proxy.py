@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import unittest
+from types import SimpleNamespace
+
+from flask import Flask
+
+from libs import async_proxy
+from libs.async_proxy import AsyncSingleFlight
+from libs.ha_client import HAClient
+
+
+class AsyncSingleFlightTest(unittest.TestCase):
+    def test_concurrent_callers_share_one_fetch(self) -> None:
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "body"
+
+        async def scenario():
+            cache = AsyncSingleFlight()
+            results = await asyncio.gather(*(cache.get_or_fetch("states", 0, fetch) for _ in range(20)))
+            return cache, results
+
+        cache, results = asyncio.run(scenario())
+        self.assertEqual(["body"] * 20, results)
+        self.assertEqual(1, len(calls))
+        self.assertEqual(19, cache.stats()["coalesced"])
+        self.assertEqual(0, cache.stats()["entries"])
+
+    def test_cancelled_leader_does_not_fail_followers(self) -> None:
+        async def fetch():
+            await asyncio.sleep(0.05)
+            return 1
+
+        async def scenario():
+            cache = AsyncSingleFlight()
+            leader = asyncio.ensure_future(cache.get_or_fetch("states", 1.0, fetch))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(cache.get_or_fetch("states", 1.0, fetch))
+            await asyncio.sleep(0)
+            leader.cancel()
+            return await follower, await cache.get_or_fetch("states", 1.0, fetch), cache.stats()
+
+        value, cached, stats = asyncio.run(scenario())
+        self.assertEqual((1, 1), (value, cached))
+        self.assertEqual(1, stats["hits"])
+
+    def test_errors_are_not_cached(self) -> None:
+        attempts = []
+
+        async def flaky():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise ConnectionError("down")
+            return "ok"
+
+        async def scenario():
+            cache = AsyncSingleFlight()
+            with self.assertRaises(ConnectionError):
+                await cache.get_or_fetch("services", 10.0, flaky)
+            return await cache.get_or_fetch("services", 10.0, flaky)
+
+        self.assertEqual("ok", asyncio.run(scenario()))
+
+
+class RawQueryStringTest(unittest.TestCase):
+    def test_matches_flask_query_string(self) -> None:
+        path = "/local/api/states?entity_prefix=light.%EA%B1%B0%EC%8B%A4&fields=a%2Cb&x=1+2"
+        with Flask(__name__).test_request_context(path) as ctx:
+            expected = ctx.request.query_string
+        self.assertEqual(expected, async_proxy._raw_query_string(SimpleNamespace(raw_path=path)))
+        self.assertEqual(b"", async_proxy._raw_query_string(SimpleNamespace(raw_path="/local/api/states")))
+
+
+@unittest.skipIf(async_proxy.web is None, "aiohttp not installed")
+class HAProxyTest(unittest.TestCase):
+    STATES = [
+        {"entity_id": "light.a", "state": "on", "last_updated": "t1", "attributes": {"friendly_name": "A"}},
+        {"entity_id": "sensor.t", "state": "20", "last_updated": "t1", "attributes": {}},
+    ]
+
+    async def _start(self, app):
+        web = async_proxy.web
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return runner, f"http://127.0.0.1:{port}"
+
+    def test_routes(self) -> None:
+        web = async_proxy.web
+        upstream_calls = []
+        managed_threads = []
+
+        async def ha_states(request):
+            upstream_calls.append(request.headers.get("Authorization"))
+            return web.Response(body=json.dumps(self.STATES).encode(), content_type="application/json")
+
+        async def ha_state(request):
+            if request.match_info["entity_id"] == "light.missing":
+                return web.Response(status=404, text="Entity not found.")
+            return web.json_response({"entity_id": request.match_info["entity_id"], "state": "on"})
+
+        async def ha_services(request):
+            upstream_calls.append("services")
+            return web.json_response([{"domain": "light", "services": {"turn_on": {}}}])
+
+        async def backend_rules(request):
+            return web.json_response({"method": request.method, "body": await request.json()}, status=201)
+
+        async def scenario():
+            ha_app = web.Application()
+            ha_app.router.add_get("/api/states", ha_states)
+            ha_app.router.add_get("/api/states/{entity_id}", ha_state)
+            ha_app.router.add_get("/api/services", ha_services)
+            backend_app = web.Application()
+            backend_app.router.add_put("/local/api/rules", backend_rules)
+            ha_runner, ha_url = await self._start(ha_app)
+            backend_runner, backend_url = await self._start(backend_app)
+
+            def managed_ids():
+                managed_threads.append(threading.get_ident())
+                return {"sensor.t"}
+
+            proxy = async_proxy.HAProxy(
+                backend_url, managed_ids=managed_ids, states_ttl=10.0, client=HAClient(base_url=ha_url, token="t")
+            )
+            front_runner, front_url = await self._start(async_proxy.create_app(proxy))
+            results = {}
+            try:
+                async with async_proxy.ClientSession() as session:
+                    async with session.get(f"{front_url}/local/api/states") as r:
+                        results["raw"] = (r.status, await r.read(), r.headers["ETag"])
+                    async with session.get(f"{front_url}/local/api/states",
+                                           headers={"If-None-Match": results["raw"][2]}) as r:
+                        results["not_modified"] = r.status
+                    async with session.get(f"{front_url}/local/api/states?domain=light&fields=state") as r:
+                        results["filtered"] = await r.json()
+                    async with session.get(f"{front_url}/local/api/states?managed_only=true&fields=state") as r:
+                        results["managed"] = await r.json()
+                    async with session.get(f"{front_url}/local/api/devices/light.a/status") as r:
+                        results["status"] = await r.json()
+                    async with session.get(f"{front_url}/local/api/states/light.missing") as r:
+                        results["missing"] = (r.status, r.content_type, await r.text())
+                    for _ in range(2):
+                        async with session.get(f"{front_url}/local/api/services") as r:
+                            results["services"] = (r.status, await r.json())
+                    async with session.put(f"{front_url}/local/api/rules", json={"id": "r1"}) as r:
+                        results["forward"] = (r.status, await r.json())
+            finally:
+                for runner in (front_runner, backend_runner, ha_runner):
+                    await runner.cleanup()
+            return results
+
+        results = asyncio.run(scenario())
+        self.assertEqual(200, results["raw"][0])
+        self.assertEqual(json.dumps(self.STATES).encode(), results["raw"][1])
+        self.assertEqual(304, results["not_modified"])
+        self.assertEqual([{"entity_id": "light.a", "state": "on"}], results["filtered"])
+        self.assertEqual([{"entity_id": "sensor.t", "state": "20"}], results["managed"])
+        # 관리 목록 조회는 이벤트 루프(메인 스레드)가 아닌 executor 에서 돈다.
+        self.assertTrue(managed_threads)
+        self.assertNotIn(threading.get_ident(), managed_threads)
+        self.assertEqual({"entity_id": "light.a", "state": "on"}, results["status"])
+        self.assertEqual((404, "text/plain", "Entity not found."), results["missing"])
+        self.assertEqual((200, [{"domain": "light", "services": {"turn_on": {}}}]), results["services"])
+        self.assertEqual((201, {"method": "PUT", "body": {"id": "r1"}}), results["forward"])
+        # services 는 두 번 요청해도 HA 를 한 번만 조회한다.
+        self.assertEqual(["Bearer t", "services"], upstream_calls)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import queue
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from libs import config_events
+from libs.config_events import ConfigEventServer, make_event
+
+
+def _wait_until(predicate, timeout=5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class ConfigEventsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "events.sock")
+        self.server = ConfigEventServer(self.path)
+        self.assertTrue(self.server.start())
+        self.events: "queue.Queue" = queue.Queue()
+        self.resyncs = []
+
+    def tearDown(self) -> None:
+        self.server.close()
+        self.tmp.cleanup()
+
+    def _listen(self, resources=None) -> None:
+        config_events.start_listener(
+            self.events.put, lambda: self.resyncs.append(1), path=self.path, resources=resources
+        )
+        self.assertTrue(_wait_until(lambda: self.server.subscriber_count() == 1))
+
+    def test_published_event_reaches_listener(self) -> None:
+        self._listen()
+
+        delivered = self.server.publish(make_event("rules", "put", ["r1"], seq=7))
+
+        self.assertEqual(1, delivered)
+        self.assertEqual(
+            {"resource": "rules", "op": "put", "ids": ["r1"], "seq": 7}, self.events.get(timeout=2)
+        )
+        self.assertEqual([1], self.resyncs)
+
+    def test_listener_filters_resources(self) -> None:
+        self._listen(resources=["devices"])
+
+        self.server.publish(make_event("rules", "put", ["r1"]))
+        self.server.publish(make_event("devices", "delete", ["light.a"]))
+
+        self.assertEqual("devices", self.events.get(timeout=2)["resource"])
+        self.assertTrue(self.events.empty())
+
+    def test_delivered_counts_only_subscribers_of_the_resource(self) -> None:
+        self._listen(resources=["devices"])
+
+        self.assertEqual(0, self.server.publish(make_event("rules", "put", ["r1"])))
+        self.assertEqual(1, self.server.publish(make_event("devices", "put", ["light.a"])))
+        self.assertEqual("devices", self.events.get(timeout=2)["resource"])
+
+    def test_closed_subscriber_is_dropped(self) -> None:
+        loop = asyncio.new_event_loop()
+        try:
+            _, writer = loop.run_until_complete(asyncio.open_unix_connection(self.path))
+            self.assertTrue(_wait_until(lambda: self.server.subscriber_count() == 1))
+            writer.close()
+            loop.run_until_complete(writer.wait_closed())
+        finally:
+            loop.close()
+
+        # 끊긴 소켓은 첫 send 가 성공할 수 있으므로 몇 번 보낸다.
+        for _ in range(3):
+            self.server.publish(make_event("rules", "put", ["r1"]))
+        self.assertTrue(_wait_until(lambda: self.server.subscriber_count() == 0))
+
+    def test_silent_client_does_not_delay_other_subscribers(self) -> None:
+        silent = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(silent.close)
+        with patch.object(config_events, "HELLO_TIMEOUT_SEC", 5):
+            silent.connect(self.path)
+            started = time.monotonic()
+            self._listen(resources=["rules"])
+        # hello 를 보내지 않는 접속이 hello 대기 시간(5s) 동안 다른 구독자 등록을 막지 않는다.
+        self.assertLess(time.monotonic() - started, 2)
+
+    def test_publish_does_not_wait_for_slow_subscriber(self) -> None:
+        stalled = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(stalled.close)
+        stalled.connect(self.path)
+        stalled.sendall(b'{"subscribe": ["rules"]}\n')
+        self.assertTrue(_wait_until(lambda: self.server.subscriber_count() == 1))
+
+        big = ["x" * 1024] * 64
+        started = time.monotonic()
+        for _ in range(50):
+            self.assertEqual(1, self.server.publish(make_event("rules", "put", big)))
+        # 읽지 않는 구독자에게 보내느라 막히는 것은 전송 스레드이고, 요청 스레드는 바로 돌아온다.
+        self.assertLess(time.monotonic() - started, 0.4)
+
+    def test_publish_without_server_is_noop(self) -> None:
+        self.assertEqual(0, config_events.publish("rules", "put", ["r1"]))
+
+    def test_make_event_skips_missing_ids(self) -> None:
+        self.assertEqual({"resource": "rooms", "op": "append", "ids": []}, make_event("rooms", "append", [None]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+import unittest
+
+from libs.env import env_float, env_int, env_str
+
+
+class EnvTest(unittest.TestCase):
+    def test_values_are_unquoted_and_fall_back_to_defaults(self) -> None:
+        env = {"A": ' "8" ', "B": "'0.5'", "C": "abc", "D": '""'}
+        self.assertEqual(8, env_int("A", 1, env))
+        self.assertEqual(0.5, env_float("B", 1.0, env))
+        self.assertEqual(3, env_int("C", 3, env))
+        self.assertEqual("abc", env_str("C", env=env))
+        self.assertEqual("x", env_str("D", "x", env))
+        self.assertEqual(2.0, env_float("MISSING", 2.0, env))
+
+    def test_empty_mapping_does_not_read_process_environment(self) -> None:
+        self.assertEqual(7, env_int("PATH", 7, {}))
+
+
+if __name__ == "__main__":
+    unittest.main()
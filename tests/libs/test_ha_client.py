@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from libs import ha_client
+
+
+class _StatesHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    seen_auth: list = []
+
+    def do_GET(self) -> None:  # noqa: N802
+        _StatesHandler.seen_auth.append(self.headers.get("Authorization"))
+        body = b'[{"entity_id": "light.a", "state": "on"}]'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        return None
+
+
+class HAClientTest(unittest.TestCase):
+    def setUp(self) -> None:
+        _StatesHandler.seen_auth = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _StatesHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_reuses_keep_alive_connection_and_sends_token(self) -> None:
+        client = ha_client.HAClient(self.base_url, "secret", pool_maxsize=2, retries=0)
+        try:
+            for _ in range(3):
+                response = client.get("/api/states")
+                self.assertEqual(200, response.status_code)
+                self.assertEqual("light.a", response.json()[0]["entity_id"])
+            stats = client.stats()
+        finally:
+            client.close()
+
+        self.assertEqual(["Bearer secret"] * 3, _StatesHandler.seen_auth)
+        self.assertEqual(3, stats["requests"])
+        self.assertEqual(1, stats["connections_opened"])
+        self.assertEqual(2, stats["connections_reused"])
+
+    def test_url_joins_relative_paths_and_keeps_absolute(self) -> None:
+        client = ha_client.HAClient("http://ha:8123/", "t", retries=0)
+        self.assertEqual("http://ha:8123/api/states", client.url("/api/states"))
+        self.assertEqual("http://ha:8123/api/states", client.url("api/states"))
+        self.assertEqual("http://other/x", client.url("http://other/x"))
+        client.close()
+
+    def test_websocket_url_follows_scheme(self) -> None:
+        plain = ha_client.HAClient("http://localhost:8123", "t", retries=0)
+        secure = ha_client.HAClient("https://ha.example", "t", retries=0)
+        self.assertEqual("ws://localhost:8123/api/websocket", plain.websocket_url())
+        self.assertEqual("wss://ha.example/api/websocket", secure.websocket_url())
+        plain.close()
+        secure.close()
+
+    def test_default_timeout_applied_unless_overridden(self) -> None:
+        client = ha_client.HAClient("http://ha:8123", "t", timeout=7, retries=0)
+        with patch.object(client.session, "request") as request_mock:
+            client.get("/api/")
+            client.get("/api/history", timeout=120)
+        self.assertEqual(7, request_mock.call_args_list[0].kwargs["timeout"])
+        self.assertEqual(120, request_mock.call_args_list[1].kwargs["timeout"])
+        client.close()
+
+    def test_pool_size_from_env_overrides_process_default(self) -> None:
+        with patch.dict("os.environ", {"HA_HTTP_POOL_MAXSIZE": "6"}):
+            client = ha_client.HAClient("http://ha:8123", "t", default_pool_maxsize=2)
+        self.assertEqual(6, client.pool_maxsize)
+        client.close()
+
+    def test_configure_replaces_process_client(self) -> None:
+        first = ha_client.configure(base_url="http://a", token="t", retries=0)
+        second = ha_client.configure(base_url="http://b", token="t", retries=0)
+        self.assertIsNot(first, second)
+        self.assertIs(second, ha_client.get_client())
+        self.assertEqual("http://b", ha_client.get_client().base_url)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import unittest
+from unittest.mock import patch
+
+from libs.ha_mirror import SUBSCRIBE_ID, HAMirror
+
+
+class FakeWebsocket:
+    def __init__(self, replies) -> None:
+        self.replies = [json.dumps(reply) for reply in replies]
+        self.sent = []
+
+    async def send(self, message: str) -> None:
+        self.sent.append(json.loads(message))
+
+    async def recv(self) -> str:
+        return self.replies.pop(0)
+
+
+class HAMirrorTest(unittest.TestCase):
+    def setUp(self) -> None:
+        patcher = patch("builtins.print")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_subscribe_waits_for_its_result(self) -> None:
+        mirror = HAMirror(lambda: [])
+        websocket = FakeWebsocket([
+            {"id": 99, "type": "result", "success": False},
+            {"id": SUBSCRIBE_ID, "type": "result", "success": True, "result": None},
+        ])
+
+        asyncio.run(mirror._subscribe(websocket))
+        self.assertEqual("subscribe_events", websocket.sent[0]["type"])
+        self.assertEqual([], websocket.replies)
+
+    def test_failed_subscribe_raises(self) -> None:
+        mirror = HAMirror(lambda: [])
+        websocket = FakeWebsocket([
+            {"id": SUBSCRIBE_ID, "type": "result", "success": False, "error": {"code": "unauthorized"}},
+        ])
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(mirror._subscribe(websocket))
+        self.assertFalse(mirror.is_synced)
+
+    def test_seed_runs_off_the_event_loop(self) -> None:
+        threads = []
+
+        def fetch_states():
+            threads.append(threading.current_thread())
+            return [{"entity_id": "light.a", "state": "on"}]
+
+        mirror = HAMirror(fetch_states)
+
+        async def scenario():
+            return threading.current_thread(), await mirror.aseed_from_rest()
+
+        loop_thread, synced = asyncio.run(scenario())
+        self.assertTrue(synced)
+        self.assertTrue(mirror.is_synced)
+        self.assertIsNot(loop_thread, threads[0])
+        self.assertEqual("on", mirror.get("light.a")["state"])
+
+    def test_failed_seed_marks_mirror_unsynced(self) -> None:
+        mirror = HAMirror(lambda: [])
+        mirror.seed([])
+        mirror._fetch_states = lambda: None
+
+        self.assertFalse(mirror.seed_from_rest())
+        self.assertFalse(mirror.is_synced)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import json
+import unittest
+from unittest.mock import patch
+
+from libs import jsonfast
+
+BACKENDS = ["json"] + [name for name, module in (("orjson", jsonfast.orjson), ("msgspec", jsonfast.msgspec)) if module]
+
+
+class JsonFastTest(unittest.TestCase):
+    def test_backends_produce_identical_compact_utf8(self) -> None:
+        value = {"b": [1, 2.5, None, True], "a": "온도 °C", "c": {"z": 1, "y": 2}}
+        expected = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        expected_sorted = json.dumps(value, ensure_ascii=False, separators=(",", ":"), sort_keys=True).encode("utf-8")
+        for backend in BACKENDS:
+            with self.subTest(backend=backend), patch.object(jsonfast, "BACKEND", backend):
+                self.assertEqual(jsonfast.dumpb(value), expected)
+                self.assertEqual(jsonfast.dumpb(value, sort_keys=True), expected_sorted)
+                self.assertEqual(jsonfast.dumps(value), expected.decode("utf-8"))
+                self.assertEqual(jsonfast.loads(expected), value)
+                self.assertEqual(jsonfast.loads(expected.decode("utf-8")), value)
+
+    def test_decode_errors_are_json_decode_errors(self) -> None:
+        for backend in BACKENDS:
+            with self.subTest(backend=backend), patch.object(jsonfast, "BACKEND", backend):
+                with self.assertRaises(json.JSONDecodeError):
+                    jsonfast.loads(b"{not json")
+
+    def test_values_the_fast_backend_rejects_fall_back_to_stdlib(self) -> None:
+        for backend in BACKENDS:
+            with self.subTest(backend=backend), patch.object(jsonfast, "BACKEND", backend):
+                self.assertEqual(jsonfast.dumpb({"n": 2 ** 70}), b'{"n":1180591620717411303424}')
+                self.assertEqual(jsonfast.loads(jsonfast.dumpb({1: "a"})), {"1": "a"})
+                with self.assertRaises(TypeError):
+                    jsonfast.dumpb({"x": object()})
+
+    def test_backend_can_be_forced_to_stdlib(self) -> None:
+        with patch.dict("os.environ", {"WM_JSON_BACKEND": "json"}):
+            self.assertEqual(jsonfast._pick_backend(), "json")
+        with patch.dict("os.environ", {"WM_JSON_BACKEND": ""}):
+            self.assertEqual(jsonfast._pick_backend(), BACKENDS[1] if len(BACKENDS) > 1 else "json")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import json
+import unittest
+
+from libs import mqtt_envelope
+
+
+def _payload() -> bytes:
+    devices = [{"entity_id": f"sensor.d{i}", "state": "on", "attributes": {"friendly_name": f"센서 {i}"}} for i in range(100)]
+    return json.dumps({"type": "query_response_all", "hub_id": "hub", "data": devices}, ensure_ascii=False).encode("utf-8")
+
+
+class MqttEnvelopeTest(unittest.TestCase):
+    def test_base64_envelope_keeps_routing_fields_and_round_trips(self) -> None:
+        raw = _payload()
+        wire = mqtt_envelope.wrap(raw, mqtt_envelope.GZIP, meta={"type": "query_response_all", "hub_id": "hub", "x": 1})
+        envelope = json.loads(wire)
+        self.assertEqual(envelope["type"], "query_response_all")
+        self.assertEqual(envelope["hub_id"], "hub")
+        self.assertNotIn("x", envelope)
+        self.assertEqual((envelope["content_encoding"], envelope["raw_size"]), ("gzip", len(raw)))
+        self.assertLess(len(wire), len(raw) / 3)
+        self.assertEqual(mqtt_envelope.unwrap(wire), json.loads(raw))
+
+    def test_binary_format_and_plain_json_are_detected(self) -> None:
+        raw = _payload()
+        wire = mqtt_envelope.wrap(raw, mqtt_envelope.GZIP, fmt=mqtt_envelope.FORMAT_BINARY)
+        self.assertTrue(wire.startswith(b"\x1f\x8b"))
+        self.assertEqual(mqtt_envelope.unwrap(wire), json.loads(raw))
+        self.assertEqual(mqtt_envelope.unwrap(raw), json.loads(raw))
+        self.assertEqual(mqtt_envelope.unwrap(raw.decode("utf-8")), json.loads(raw))
+
+    @unittest.skipIf(mqtt_envelope.zstandard is None, "zstandard not installed")
+    def test_zstd_round_trip(self) -> None:
+        raw = _payload()
+        for fmt in (mqtt_envelope.FORMAT_BASE64, mqtt_envelope.FORMAT_BINARY):
+            self.assertEqual(mqtt_envelope.unwrap(mqtt_envelope.wrap(raw, mqtt_envelope.ZSTD, fmt)), json.loads(raw))
+
+    def test_level_is_clamped_per_encoding(self) -> None:
+        raw = _payload()
+        self.assertEqual(9, mqtt_envelope.clamp_level(mqtt_envelope.GZIP, 19))
+        self.assertEqual(1, mqtt_envelope.clamp_level(mqtt_envelope.ZSTD, -5))
+        self.assertEqual(19, mqtt_envelope.clamp_level(mqtt_envelope.ZSTD, 19))
+        # zstd 용 레벨(19)을 gzip 에 그대로 넘겨도 zlib.error 없이 압축된다.
+        wire = mqtt_envelope.wrap(raw, mqtt_envelope.GZIP, level=19)
+        self.assertEqual(mqtt_envelope.unwrap(wire), json.loads(raw))
+
+    def test_negotiate_picks_first_supported(self) -> None:
+        self.assertEqual(mqtt_envelope.negotiate(["br", "gzip"]), "gzip")
+        self.assertEqual(mqtt_envelope.negotiate("br, GZIP"), "gzip")
+        self.assertIsNone(mqtt_envelope.negotiate(["br"]))
+        self.assertIsNone(mqtt_envelope.negotiate(None))
+        expected = "zstd" if mqtt_envelope.zstandard is not None else "gzip"
+        self.assertEqual(mqtt_envelope.negotiate(["zstd", "gzip"]), expected)
+        with self.assertRaises(ValueError):
+            mqtt_envelope.compress(b"{}", "br")
+
+    def test_topic_matches_mqtt_wildcards(self) -> None:
+        match = mqtt_envelope.topic_matches
+        self.assertTrue(match("matterhub/+/state/devices", "matterhub/hub-1/state/devices"))
+        self.assertTrue(match("matterhub/#", "matterhub/hub-1/api/response"))
+        self.assertTrue(match("matterhub/hub-1/api/response", "matterhub/hub-1/api/response"))
+        self.assertFalse(match("matterhub/+/state/devices", "matterhub/hub-1/state"))
+        self.assertFalse(match("matterhub/+", "matterhub/hub-1/state/devices"))
+
+
+if __name__ == "__main__":
+    unittest.main()
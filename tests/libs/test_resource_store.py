@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from libs.resource_store import ResourceStore, get_store
+
+
+class ResourceStoreTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "rules.json")
+        self._write_file([{"id": "a", "v": 1}, {"id": "b", "v": 2}])
+
+    def _write_file(self, data) -> None:
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+    def _read_file(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def test_reads_are_served_from_memory_until_file_changes(self) -> None:
+        store = ResourceStore(self.path)
+        self.assertEqual(["a", "b"], [item["id"] for item in store.all()])
+
+        with patch("libs.resource_store.json.load") as load_mock:
+            store.all()
+            self.assertEqual(2, store.get("b")["v"])
+        load_mock.assert_not_called()
+
+        # 다른 프로세스가 파일을 교체하면 다시 읽는다.
+        replacement = os.path.join(self.tmp.name, "new.json")
+        with open(replacement, "w", encoding="utf-8") as f:
+            json.dump([{"id": "c"}], f)
+        os.replace(replacement, self.path)
+        self.assertEqual([{"id": "c"}], store.all())
+
+    def test_get_does_not_write_file(self) -> None:
+        store = ResourceStore(self.path)
+        before = os.stat(self.path).st_mtime_ns
+        store.all()
+        store.get("a")
+        self.assertEqual(before, os.stat(self.path).st_mtime_ns)
+
+    def test_put_replaces_and_delete_removes(self) -> None:
+        store = ResourceStore(self.path)
+
+        store.put("a", {"id": "a", "v": 10})
+        self.assertEqual([{"id": "b", "v": 2}, {"id": "a", "v": 10}], self._read_file())
+
+        store.put("z", {"id": "z"})
+        self.assertEqual(["b", "a", "z"], [item["id"] for item in self._read_file()])
+
+        store.delete("b")
+        self.assertEqual(["a", "z"], [item["id"] for item in store.all()])
+        self.assertIsNone(store.get("b"))
+
+    def test_returned_items_are_copies(self) -> None:
+        store = ResourceStore(self.path)
+        store.all()[0]["v"] = 100
+        store.get("b")["v"] = 200
+        item = {"id": "c", "v": 3}
+        store.append(item)
+        item["v"] = 300
+
+        self.assertEqual([1, 2, 3], [i["v"] for i in store.all()])
+        self.assertEqual([1, 2, 3], [i["v"] for i in self._read_file()])
+
+    def test_write_is_atomic_and_leaves_no_temp_files(self) -> None:
+        store = ResourceStore(self.path)
+        store.append({"id": "c", "name": "거실"})
+
+        self.assertEqual(["rules.json"], os.listdir(self.tmp.name))
+        with open(self.path, "r", encoding="utf-8") as f:
+            self.assertIn("거실", f.read())
+
+    def test_missing_file_is_empty_list_and_created_on_write(self) -> None:
+        path = os.path.join(self.tmp.name, "devices.json")
+        store = ResourceStore(path, key="entity_id")
+        self.assertEqual([], store.all())
+
+        store.append({"entity_id": "light.a"})
+        self.assertEqual({"entity_id": "light.a"}, store.get("light.a"))
+        self.assertTrue(os.path.exists(path))
+
+    def test_get_store_returns_one_store_per_path(self) -> None:
+        self.assertIs(get_store(self.path), get_store(self.path))
+        self.assertIsNot(get_store(self.path), get_store(self.path, "entity_id"))
+
+
+if __name__ == "__main__":
+    unittest.main()
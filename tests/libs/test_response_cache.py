@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import threading
+import unittest
+
+from libs.response_cache import ResponseCache
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.clock = _Clock()
+        self.cache = ResponseCache(clock=self.clock)
+        self.calls = 0
+
+    def _fetch(self):
+        self.calls += 1
+        return {"n": self.calls}
+
+    def test_hit_within_ttl_and_refetch_after_expiry(self) -> None:
+        self.assertEqual({"n": 1}, self.cache.get_or_fetch("states", 1.0, self._fetch))
+        self.assertEqual({"n": 1}, self.cache.get_or_fetch("states", 1.0, self._fetch))
+        self.clock.now += 1.5
+        self.assertEqual({"n": 2}, self.cache.get_or_fetch("states", 1.0, self._fetch))
+        self.assertEqual({"hits": 1, "misses": 2, "coalesced": 0, "errors": 0},
+                         self.cache.stats()["endpoints"]["states"])
+
+    def test_uncacheable_and_failed_results_are_not_stored(self) -> None:
+        self.cache.get_or_fetch("states", 10.0, self._fetch, cacheable=lambda v: False)
+        self.cache.get_or_fetch("states", 10.0, self._fetch, cacheable=lambda v: False)
+        self.assertEqual(2, self.calls)
+
+        def fail():
+            raise ConnectionError("down")
+
+        with self.assertRaises(ConnectionError):
+            self.cache.get_or_fetch("services", 10.0, fail)
+        self.assertEqual({"n": 3}, self.cache.get_or_fetch("services", 10.0, self._fetch))
+
+    def test_concurrent_requests_share_one_upstream_call(self) -> None:
+        started = threading.Event()
+        release = threading.Event()
+        results = []
+
+        def slow_fetch():
+            self.calls += 1
+            started.set()
+            release.wait(timeout=5)
+            return "body"
+
+        leader = threading.Thread(target=lambda: results.append(self.cache.get_or_fetch("states", 0, slow_fetch)))
+        leader.start()
+        self.assertTrue(started.wait(timeout=5))
+        followers = [
+            threading.Thread(target=lambda: results.append(self.cache.get_or_fetch("states", 0, slow_fetch)))
+            for _ in range(4)
+        ]
+        for thread in followers:
+            thread.start()
+        while self.cache.stats()["endpoints"]["states"]["coalesced"] < 4:
+            threading.Event().wait(0.01)
+        release.set()
+        for thread in [leader] + followers:
+            thread.join(timeout=5)
+
+        self.assertEqual(["body"] * 5, results)
+        self.assertEqual(1, self.calls)
+        # ttl 0: 저장하지 않으므로 다음 요청은 다시 조회한다.
+        self.assertEqual(0, self.cache.stats()["entries"])
+
+    def test_invalidate_by_prefix(self) -> None:
+        self.cache.get_or_fetch("state:light.a", 10.0, self._fetch)
+        self.cache.get_or_fetch("states", 10.0, self._fetch)
+        self.cache.get_or_fetch("services", 10.0, self._fetch)
+
+        self.assertEqual(2, self.cache.invalidate("state"))
+        self.assertEqual(1, self.cache.stats()["entries"])
+
+
+if __name__ == "__main__":
+    unittest.main()
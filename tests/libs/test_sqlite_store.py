@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from libs import resource_store
+from libs.sqlite_store import SQLiteResourceStore
+
+
+class SQLiteResourceStoreTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db_path = os.path.join(self.tmp.name, "hub.db")
+        self.rules_path = os.path.join(self.tmp.name, "rules.json")
+        with open(self.rules_path, "w", encoding="utf-8") as f:
+            json.dump([{"id": "a", "v": 1}, {"id": "b", "v": 2}], f)
+
+    def _store(self, path=None, key="id") -> SQLiteResourceStore:
+        return SQLiteResourceStore(path or self.rules_path, key, db_path=self.db_path)
+
+    def test_migrates_json_once(self) -> None:
+        store = self._store()
+        self.assertEqual([{"id": "a", "v": 1}, {"id": "b", "v": 2}], store.all())
+
+        # JSON 파일이 바뀌어도 이미 가져온 리소스는 다시 덮어쓰지 않는다.
+        with open(self.rules_path, "w", encoding="utf-8") as f:
+            json.dump([], f)
+        self.assertEqual(0, self._store().migrate())
+        self.assertEqual(2, len(self._store().all()))
+        self.assertEqual(0, self._store().migrate(force=True))
+        self.assertEqual([], self._store().all())
+
+    def test_write_semantics_match_json_store(self) -> None:
+        store = self._store()
+
+        store.put("a", {"id": "a", "v": 10})
+        self.assertEqual([{"id": "b", "v": 2}, {"id": "a", "v": 10}], store.all())
+        store.append({"id": "c"})
+        store.delete("b")
+        self.assertEqual(["a", "c"], [item["id"] for item in store.all()])
+        self.assertEqual({"id": "a", "v": 10}, store.get("a"))
+        self.assertIsNone(store.get("b"))
+
+    def test_cached_all_returns_copies(self) -> None:
+        store = self._store()
+        store.all()[0]["v"] = 100
+        self.assertEqual(1, store.all()[0]["v"])
+
+    def test_change_seq_advances_and_lists_changes(self) -> None:
+        store = self._store()
+        start = store.change_seq()
+
+        store.put("a", {"id": "a", "v": 3})
+        store.delete("missing")
+        store.delete("b")
+
+        self.assertGreater(store.change_seq(), start)
+        self.assertEqual([("a", "put"), ("b", "delete")], [(k, op) for _, k, op in store.changes_since(start)])
+
+    def test_other_connection_sees_writes(self) -> None:
+        reader = self._store()
+        self.assertEqual(2, len(reader.all()))
+
+        writer = self._store()
+        writer.append({"id": "c"})
+
+        self.assertEqual(["a", "b", "c"], [item["id"] for item in reader.all()])
+
+    def test_concurrent_writers(self) -> None:
+        store = self._store()
+
+        def write(n):
+            for i in range(20):
+                store.append({"id": f"t{n}-{i}"})
+
+        threads = [threading.Thread(target=write, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(82, len(store.all()))
+
+    def test_get_store_selects_backend_from_env(self) -> None:
+        path = os.path.join(self.tmp.name, "devices.json")
+        env = {"RESOURCE_BACKEND": "sqlite", "RESOURCE_DB_PATH": self.db_path}
+        with patch.dict(os.environ, env), patch.dict(resource_store._stores, clear=True):
+            store = resource_store.get_store(path, "entity_id")
+        self.assertIsInstance(store, SQLiteResourceStore)
+        self.assertEqual("devices", store.resource)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import unittest
+from unittest.mock import MagicMock
+
+from libs.state_cache import EntityStateCache
+
+
+def _state(entity_id, value="on", last_updated="2026-03-21T00:00:00+00:00"):
+    return {"entity_id": entity_id, "state": value, "last_updated": last_updated}
+
+
+def _event(entity_id, new_state):
+    return {
+        "type": "event",
+        "event": {
+            "event_type": "state_changed",
+            "data": {"entity_id": entity_id, "new_state": new_state},
+        },
+    }
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class EntityStateCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.clock = _Clock()
+        self.fetch_state = MagicMock(side_effect=lambda entity_id: _state(entity_id, "rest"))
+        self.fetch_states = MagicMock(return_value=[_state("light.a"), _state("sensor.t", "21.5")])
+        self.cache = EntityStateCache(
+            max_age_sec=60,
+            fetch_state=self.fetch_state,
+            fetch_states=self.fetch_states,
+            clock=self.clock,
+        )
+
+    def test_seeded_cache_serves_conditions_without_rest(self) -> None:
+        self.assertTrue(self.cache.seed_from_rest())
+
+        self.assertEqual("on", self.cache.get_state("light.a")["state"])
+        self.assertEqual("21.5", self.cache.get_state("sensor.t")["state"])
+        self.fetch_state.assert_not_called()
+        self.assertEqual(2, self.cache.stats()["hits"])
+
+    def test_state_changed_event_updates_cache(self) -> None:
+        self.cache.seed_from_rest()
+        self.cache.apply_event(_event("light.a", _state("light.a", "off", "2026-03-21T00:00:05+00:00")))
+
+        self.assertEqual("off", self.cache.get_state("light.a")["state"])
+        self.fetch_state.assert_not_called()
+
+    def test_older_event_does_not_overwrite_seed(self) -> None:
+        self.cache.seed([_state("light.a", "off", "2026-03-21T00:00:10+00:00")])
+
+        self.assertFalse(self.cache.apply_event(_event("light.a", _state("light.a", "on"))))
+        self.assertEqual("off", self.cache.get_state("light.a")["state"])
+
+    def test_quiet_entity_is_served_from_cache_while_connected(self) -> None:
+        self.cache.seed_from_rest()
+        self.cache.apply_event(_event("sensor.t", _state("sensor.t", "22.0", "2026-03-21T00:00:05+00:00")))
+        # light.a 는 max_age 보다 오래 이벤트가 없었다 (닫힌 문, 켜진 조명).
+        self.clock.now += 61
+
+        self.assertEqual("on", self.cache.get_state("light.a")["state"])
+        self.fetch_state.assert_not_called()
+        self.assertTrue(self.cache.needs_resync())
+
+    def test_unknown_entity_falls_back_to_rest_and_is_cached(self) -> None:
+        self.cache.seed_from_rest()
+
+        self.assertEqual("rest", self.cache.get_state("switch.new")["state"])
+        self.assertEqual("rest", self.cache.get_state("switch.new")["state"])
+        self.fetch_state.assert_called_once_with("switch.new")
+
+    def test_disconnected_cache_always_uses_rest(self) -> None:
+        self.cache.seed_from_rest()
+        self.cache.mark_disconnected()
+
+        self.assertEqual("rest", self.cache.get_state("light.a")["state"])
+        self.assertEqual("rest", self.cache.get_state("light.a")["state"])
+        self.assertEqual(2, self.fetch_state.call_count)
+
+    def test_failed_seed_keeps_cache_unsynced(self) -> None:
+        self.fetch_states.return_value = None
+
+        self.assertFalse(self.cache.seed_from_rest())
+        self.assertFalse(self.cache.is_synced)
+        self.assertEqual("rest", self.cache.get_state("light.a")["state"])
+
+    def test_zero_max_age_disables_cache(self) -> None:
+        cache = EntityStateCache(max_age_sec=0, fetch_state=self.fetch_state, fetch_states=self.fetch_states)
+
+        self.assertFalse(cache.seed_from_rest())
+        self.assertIsNone(cache.start())
+        self.assertEqual("rest", cache.get_state("light.a")["state"])
+        self.fetch_states.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import unittest
+
+from libs.state_query import MAX_LIMIT, StateQuery, apply_query, parse_query
+
+
+def _state(entity_id, state="on", **attributes):
+    return {
+        "entity_id": entity_id,
+        "state": state,
+        "attributes": attributes,
+        "last_changed": "2024-01-01T00:00:00+00:00",
+        "last_updated": "2024-01-01T00:00:00+00:00",
+        "context": {"id": "c"},
+    }
+
+
+STATES = [
+    _state("sensor.living_temp", "21", friendly_name="Temp", unit_of_measurement="C"),
+    _state("light.kitchen", friendly_name="Kitchen", brightness=200),
+    _state("light.living", friendly_name="Living"),
+    _state("switch.fan", "off"),
+]
+
+
+class ParseQueryTest(unittest.TestCase):
+    def test_empty_source_is_empty_query(self) -> None:
+        query = parse_query({})
+        self.assertTrue(query.is_empty)
+        self.assertFalse(query.paginated)
+
+    def test_comma_and_list_values(self) -> None:
+        query = parse_query({"domain": "light, switch", "fields": ["state"], "managed_only": "true"})
+        self.assertEqual({"light", "switch"}, query.domains)
+        self.assertEqual({"entity_id", "state"}, query.fields)
+        self.assertTrue(query.managed_only)
+
+    def test_limit_validation(self) -> None:
+        self.assertEqual(MAX_LIMIT, parse_query({"limit": str(MAX_LIMIT * 10)}).limit)
+        with self.assertRaises(ValueError):
+            parse_query({"limit": "0"})
+        with self.assertRaises(ValueError):
+            parse_query({"limit": "ten"})
+
+
+class ApplyQueryTest(unittest.TestCase):
+    def test_no_query_returns_everything_unchanged(self) -> None:
+        result = apply_query(STATES, StateQuery())
+        self.assertEqual(STATES, result["items"])
+        self.assertIsNone(result["next_cursor"])
+
+    def test_domain_prefix_and_managed_filters(self) -> None:
+        by_domain = apply_query(STATES, parse_query({"domain": "light"}))
+        self.assertEqual(["light.kitchen", "light.living"], [s["entity_id"] for s in by_domain["items"]])
+
+        by_prefix = apply_query(STATES, parse_query({"entity_prefix": "sensor.living,light.liv"}))
+        self.assertEqual(2, by_prefix["total"])
+
+        managed = apply_query(STATES, parse_query({"managed_only": True}), managed_ids={"switch.fan"})
+        self.assertEqual(["switch.fan"], [s["entity_id"] for s in managed["items"]])
+        self.assertEqual([], apply_query(STATES, parse_query({"managed_only": True}))["items"])
+
+    def test_projection_and_attribute_whitelist(self) -> None:
+        result = apply_query(STATES, parse_query({"domain": "light", "fields": "state,attributes", "attributes": "friendly_name"}))
+        self.assertEqual(
+            {"entity_id": "light.kitchen", "state": "on", "attributes": {"friendly_name": "Kitchen"}},
+            result["items"][0],
+        )
+
+    def test_cursor_pages_cover_every_entity_once(self) -> None:
+        seen = []
+        cursor = None
+        while True:
+            result = apply_query(STATES, parse_query({"limit": 3 if cursor is None else 1, "cursor": cursor, "fields": "state"}))
+            seen.extend(item["entity_id"] for item in result["items"])
+            cursor = result["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(sorted(s["entity_id"] for s in STATES), seen)
+
+
+if __name__ == "__main__":
+    unittest.main()
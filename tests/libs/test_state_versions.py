@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import unittest
+
+from libs.state_versions import StateVersionTracker, etag_matches
+
+
+def _state(entity_id, state, updated):
+    return {"entity_id": entity_id, "state": state, "last_updated": updated, "attributes": {}}
+
+
+class StateVersionTrackerTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tracker = StateVersionTracker(epoch="e1")
+        self.base = [_state("light.a", "on", "t1"), _state("sensor.t", "20", "t1")]
+
+    def test_version_only_moves_on_change(self) -> None:
+        self.assertEqual(1, self.tracker.observe(self.base))
+        self.assertEqual(1, self.tracker.observe(list(self.base)))
+        self.assertEqual(2, self.tracker.observe([self.base[0], _state("sensor.t", "21", "t2")]))
+
+    def test_changes_since_returns_changed_and_removed(self) -> None:
+        self.tracker.observe(self.base)
+        since = self.tracker.parse_token(self.tracker.token())
+
+        self.tracker.observe([_state("light.a", "off", "t2"), _state("switch.new", "on", "t2")])
+        version, full, changed, removed = self.tracker.changes_since(since)
+
+        self.assertEqual(2, version)
+        self.assertFalse(full)
+        self.assertEqual(["light.a", "switch.new"], sorted(s["entity_id"] for s in changed))
+        self.assertEqual(["sensor.t"], removed)
+        self.assertEqual((2, False, [], []), self.tracker.changes_since(version))
+
+    def test_unknown_or_foreign_token_means_full_resync(self) -> None:
+        self.tracker.observe(self.base)
+        self.assertIsNone(self.tracker.parse_token("other-1"))
+        self.assertIsNone(self.tracker.parse_token("e1-99"))
+        self.assertIsNone(self.tracker.parse_token("garbage"))
+        _, full, changed, _ = self.tracker.changes_since(None)
+        self.assertTrue(full)
+        self.assertEqual(2, len(changed))
+
+    def test_pruned_tombstones_force_full_resync(self) -> None:
+        tracker = StateVersionTracker(epoch="e1", max_tombstones=1)
+        tracker.observe(self.base + [_state("switch.x", "on", "t1")])
+        tracker.observe([self.base[0]])
+        tracker.observe([])
+
+        self.assertTrue(tracker.changes_since(1)[1])
+        self.assertFalse(tracker.changes_since(2)[1])
+
+
+class EtagMatchesTest(unittest.TestCase):
+    def test_weak_comparison_and_lists(self) -> None:
+        self.assertTrue(etag_matches('"a-1"', '"a-1"'))
+        self.assertTrue(etag_matches('W/"a-1", "b-2"', '"a-1"'))
+        self.assertTrue(etag_matches("*", '"a-1"'))
+        self.assertFalse(etag_matches('"a-2"', '"a-1"'))
+        self.assertFalse(etag_matches(None, '"a-1"'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import unittest
+from unittest.mock import patch
+
+from libs.triggers import TriggerIndex, compile_comparison
+
+
+def _rule(rule_id, entity_id, state, option=None, activate=True):
+    trigger = {"entity_id": entity_id, "state": state}
+    if option is not None:
+        trigger["option"] = option
+    return {"id": rule_id, "activate": activate, "trigger": trigger, "condition": [], "action": {}}
+
+
+class CompileComparisonTest(unittest.TestCase):
+    def test_equal_is_default(self) -> None:
+        self.assertTrue(compile_comparison(None, "on")("on"))
+        self.assertTrue(compile_comparison("", "on")("on"))
+        self.assertFalse(compile_comparison("equal", "on")("off"))
+
+    def test_numeric_options_parse_target_once(self) -> None:
+        self.assertTrue(compile_comparison("greaterThan", "20.5")("21"))
+        self.assertTrue(compile_comparison("greaterThanOrEquals", "20")("20.0"))
+        self.assertTrue(compile_comparison("lessThan", 5)("4.9"))
+        self.assertFalse(compile_comparison("lessThanOrEquals", "5")("5.1"))
+
+    def test_non_numeric_state_does_not_match(self) -> None:
+        self.assertFalse(compile_comparison("greaterThan", "1")("unavailable"))
+
+    def test_invalid_option_or_target_raises(self) -> None:
+        with self.assertRaises(ValueError):
+            compile_comparison("between", "1")
+        with self.assertRaises(ValueError):
+            compile_comparison("lessThan", "warm")
+
+
+class TriggerIndexTest(unittest.TestCase):
+    def test_match_only_evaluates_rules_for_entity(self) -> None:
+        index = TriggerIndex([
+            _rule("r1", "light.a", "on"),
+            _rule("r2", "light.a", "off"),
+            _rule("r3", "sensor.t", "25", option="greaterThan"),
+            _rule("r4", "light.a", "on", activate=False),
+        ])
+
+        self.assertEqual(["r1"], [r["id"] for r in index.match("light.a", "on")])
+        self.assertEqual(["r2"], [r["id"] for r in index.match("light.a", "off")])
+        self.assertEqual(["r3"], [r["id"] for r in index.match("sensor.t", "26")])
+        self.assertEqual([], index.match("sensor.unknown", "on"))
+        self.assertEqual(3, len(index))
+
+    def test_rebuild_replaces_entries(self) -> None:
+        index = TriggerIndex([_rule("r1", "light.a", "on")])
+        index.rebuild([_rule("r2", "light.b", "on")])
+        self.assertNotIn("light.a", index)
+        self.assertEqual(["r2"], [r["id"] for r in index.match("light.b", "on")])
+
+    def test_remove_drops_entry_without_touching_old_table(self) -> None:
+        index = TriggerIndex([_rule("r1", "light.a", "on"), _rule("r2", "light.a", "on")])
+        before = index.match("light.a", "on")
+
+        self.assertEqual(1, index.remove("r1"))
+        self.assertEqual(0, index.remove("missing"))
+
+        self.assertEqual(["r2"], [r["id"] for r in index.match("light.a", "on")])
+        self.assertEqual(["r1", "r2"], [r["id"] for r in before])
+        index.remove("r2")
+        self.assertNotIn("light.a", index)
+
+    def test_broken_rule_is_skipped(self) -> None:
+        with patch("builtins.print"):
+            index = TriggerIndex([
+                _rule("bad", "sensor.t", "warm", option="greaterThan"),
+                {"id": "no-trigger"},
+                _rule("ok", "sensor.t", "10", option="lessThan"),
+            ])
+        self.assertEqual(["ok"], [r["id"] for r in index.match("sensor.t", "3")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from libs.webhook_delivery import WebhookBatcher, WebhookDispatcher, backoff_delay, batch_options
+
+
+class _HookHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    statuses: list = []
+    received: list = []
+    authorization: list = []
+
+    def do_POST(self) -> None:  # noqa: N802
+        length = int(self.headers.get("Content-Length") or 0)
+        _HookHandler.authorization.append(self.headers.get("Authorization"))
+        _HookHandler.received.append(json.loads(self.rfile.read(length)))
+        status = _HookHandler.statuses.pop(0) if _HookHandler.statuses else 200
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args) -> None:
+        return None
+
+
+def _wait_until(predicate, timeout=5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class WebhookDispatcherTest(unittest.TestCase):
+    def setUp(self) -> None:
+        _HookHandler.statuses = []
+        _HookHandler.received = []
+        _HookHandler.authorization = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _HookHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/hook"
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dispatchers = []
+
+    def tearDown(self) -> None:
+        for dispatcher in self.dispatchers:
+            dispatcher.stop(timeout=2)
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def _make(self, **kwargs) -> WebhookDispatcher:
+        options = dict(
+            queue_dir=self.tmp.name, workers=2, timeout=2, max_attempts=3,
+            backoff_base_sec=0.01, backoff_max_sec=0.02, stats_interval_sec=0,
+        )
+        options.update(kwargs)
+        dispatcher = WebhookDispatcher(**options)
+        self.dispatchers.append(dispatcher)
+        return dispatcher
+
+    def test_delivers_and_removes_queue_file(self) -> None:
+        dispatcher = self._make()
+        dispatcher.start()
+
+        self.assertTrue(dispatcher.enqueue(self.url, {"entity_id": "light.a"}))
+
+        self.assertTrue(_wait_until(lambda: dispatcher.stats()["delivered"] == 1))
+        self.assertEqual([{"entity_id": "light.a"}], _HookHandler.received)
+        self.assertTrue(_wait_until(lambda: os.listdir(self.tmp.name) == []))
+
+    def test_retries_server_errors_with_backoff(self) -> None:
+        _HookHandler.statuses = [503, 500]
+        dispatcher = self._make()
+        dispatcher.start()
+
+        dispatcher.enqueue(self.url, {"n": 1})
+
+        self.assertTrue(_wait_until(lambda: dispatcher.stats()["delivered"] == 1))
+        stats = dispatcher.stats()
+        self.assertEqual(2, stats["retried"])
+        self.assertEqual(3, len(_HookHandler.received))
+
+    def test_client_error_is_not_retried(self) -> None:
+        _HookHandler.statuses = [404]
+        dispatcher = self._make()
+        dispatcher.start()
+
+        dispatcher.enqueue(self.url, {"n": 1})
+
+        self.assertTrue(_wait_until(lambda: dispatcher.stats()["failed"] == 1))
+        self.assertEqual(0, dispatcher.stats()["retried"])
+        self.assertEqual([], os.listdir(self.tmp.name))
+
+    def test_pending_jobs_survive_restart(self) -> None:
+        stopped = self._make()
+        stopped.enqueue(self.url, {"n": 1})
+        stopped.enqueue(self.url, {"n": 2})
+        self.assertEqual(2, len(os.listdir(self.tmp.name)))
+
+        restarted = self._make()
+        restarted.start()
+
+        self.assertTrue(_wait_until(lambda: restarted.stats()["delivered"] == 2))
+        self.assertEqual([1, 2], sorted(item["n"] for item in _HookHandler.received))
+
+    def test_auth_headers_are_not_written_to_disk(self) -> None:
+        stopped = self._make()
+        stopped.enqueue(self.url, {"n": 1}, {"Authorization": "Bearer secret"})
+        (name,) = os.listdir(self.tmp.name)
+        with open(os.path.join(self.tmp.name, name), encoding="utf-8") as f:
+            saved = f.read()
+        self.assertNotIn("secret", saved)
+        self.assertNotIn("headers", json.loads(saved))
+
+        restarted = self._make(headers=lambda: {"Authorization": "Bearer from-env"})
+        restarted.start()
+
+        self.assertTrue(_wait_until(lambda: restarted.stats()["delivered"] == 1))
+        self.assertEqual(["Bearer from-env"], _HookHandler.authorization)
+
+    def test_concurrent_enqueue_never_exceeds_max_queue(self) -> None:
+        dispatcher = self._make(max_queue=5)
+        results = []
+        threads = [
+            threading.Thread(target=lambda i=i: results.append(dispatcher.enqueue(self.url, {"n": i})))
+            for i in range(40)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(5, results.count(True))
+        self.assertEqual(5, dispatcher.stats()["queue_depth"])
+        self.assertEqual(35, dispatcher.stats()["rejected"])
+
+    def test_disk_write_does_not_hold_the_queue_lock(self) -> None:
+        dispatcher = self._make()
+        original = dispatcher._persist
+        blocked = []
+
+        def persist(job):
+            # 쓰는 동안 다른 스레드가 lock 을 잡을 수 있어야 한다.
+            probe = threading.Thread(target=dispatcher.stats)
+            probe.start()
+            probe.join(timeout=1)
+            blocked.append(probe.is_alive())
+            original(job)
+
+        dispatcher._persist = persist
+        self.assertTrue(dispatcher.enqueue(self.url, {"n": 1}))
+        self.assertEqual([False], blocked)
+
+    def test_restart_loads_at_most_max_queue_oldest_jobs(self) -> None:
+        stopped = self._make()
+        for n in range(5):
+            stopped.enqueue(self.url, {"n": n})
+            time.sleep(0.002)
+
+        restarted = self._make(max_queue=2)
+        self.assertEqual(2, restarted.load_pending())
+        self.assertEqual(2, restarted.stats()["queue_depth"])
+        self.assertEqual(3, restarted.stats()["rejected"])
+        queued = sorted(json.loads(job["body"])["n"] for _, _, job in restarted._heap)
+        self.assertEqual([0, 1], queued)
+        self.assertEqual(2, len(os.listdir(self.tmp.name)))
+
+    def test_full_queue_rejects_new_jobs(self) -> None:
+        dispatcher = self._make(max_queue=1)
+
+        self.assertTrue(dispatcher.enqueue(self.url, {"n": 1}))
+        self.assertFalse(dispatcher.enqueue(self.url, {"n": 2}))
+        self.assertEqual(1, dispatcher.stats()["rejected"])
+
+    def test_backoff_delay_is_capped_and_jittered(self) -> None:
+        self.assertEqual(0.5, backoff_delay(1, 1.0, 300.0, rand=lambda: 0.0))
+        self.assertEqual(4.0, backoff_delay(3, 1.0, 300.0, rand=lambda: 1.0))
+        self.assertEqual(300.0, backoff_delay(20, 1.0, 300.0, rand=lambda: 1.0))
+
+
+def _changed(entity_id, old, new):
+    return {
+        "type": "event",
+        "event": {
+            "event_type": "state_changed",
+            "data": {
+                "entity_id": entity_id,
+                "old_state": {"entity_id": entity_id, "state": old},
+                "new_state": {"entity_id": entity_id, "state": new},
+            },
+        },
+    }
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class WebhookBatcherTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.sent = []
+        self.clock = _Clock()
+        self.batcher = WebhookBatcher(lambda url, body, headers: self.sent.append((url, body)), clock=self.clock)
+
+    def test_events_for_same_url_are_sent_as_one_array_after_window(self) -> None:
+        for i in range(5):
+            self.batcher.add("http://a/hook", _changed("sensor.x", "off", "on"), {}, 2.0, 50)
+        self.batcher.add("http://b/hook", _changed("sensor.y", "off", "on"), {}, 2.0, 50)
+
+        self.assertEqual(0, self.batcher.flush_due())
+        self.clock.now += 2.0
+        self.assertEqual(2, self.batcher.flush_due())
+
+        by_url = dict(self.sent)
+        self.assertEqual(5, len(by_url["http://a/hook"]))
+        self.assertEqual(1, len(by_url["http://b/hook"]))
+
+    def test_max_events_flushes_immediately(self) -> None:
+        for i in range(3):
+            self.batcher.add("http://a/hook", _changed("sensor.x", str(i), str(i + 1)), {}, 60.0, 3)
+
+        self.assertEqual(1, len(self.sent))
+        self.assertEqual(3, len(self.sent[0][1]))
+        self.assertEqual(0, self.batcher.stats()["buffered_urls"])
+
+    def test_dedup_drops_identical_transitions(self) -> None:
+        for _ in range(10):
+            self.batcher.add("http://a/hook", _changed("sensor.x", "off", "on"), {}, 1.0, 50, dedup=True)
+            self.batcher.add("http://a/hook", _changed("sensor.x", "on", "off"), {}, 1.0, 50, dedup=True)
+        self.batcher.flush_all()
+
+        self.assertEqual(1, len(self.sent))
+        self.assertEqual(2, len(self.sent[0][1]))
+        self.assertEqual(18, self.batcher.stats()["deduped"])
+
+    def test_batch_options_are_kept_per_notification_on_a_shared_url(self) -> None:
+        for _ in range(3):
+            self.batcher.add("http://a/hook", _changed("sensor.x", "off", "on"), {}, 60.0, 3, dedup=True)
+            self.batcher.add("http://a/hook", _changed("sensor.y", "off", "on"), {}, 1.0, 50)
+
+        # dedup 알림의 중복은 걸러지고, 다른 알림의 이벤트는 자기 창(1초)에 맞춰 나간다.
+        self.assertEqual([], self.sent)
+        self.clock.now += 1.0
+        self.assertEqual(1, self.batcher.flush_due())
+        self.assertEqual([("http://a/hook", [_changed("sensor.y", "off", "on")] * 3)], self.sent)
+        self.assertEqual(2, self.batcher.stats()["deduped"])
+        self.assertEqual(1, self.batcher.stats()["buffered_urls"])
+
+    def test_background_thread_flushes_window(self) -> None:
+        sent = threading.Event()
+        batcher = WebhookBatcher(lambda url, body, headers: sent.set())
+        batcher.start()
+        try:
+            batcher.add("http://a/hook", _changed("sensor.x", "off", "on"), {}, 0.05, 50)
+            self.assertTrue(sent.wait(timeout=2))
+        finally:
+            batcher.stop(timeout=2)
+
+    def test_batch_options_parsing(self) -> None:
+        self.assertIsNone(batch_options(None))
+        self.assertIsNone(batch_options(False))
+        self.assertEqual((2.0, 50, False), batch_options(True))
+        self.assertEqual((0.5, 10, True), batch_options({"window_sec": 0.5, "max_events": 10, "dedup": True}))
+        self.assertIsNone(batch_options({"window_sec": "soon"}))
+
+
+if __name__ == "__main__":
+    unittest.main()
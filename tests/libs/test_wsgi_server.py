@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import unittest
+from pathlib import Path
+
+import requests
+
+from libs.wsgi_server import APIServer, InflightTracker, server_options
+
+try:
+    import waitress  # noqa: F401
+except ImportError:  # pragma: no cover - 선택 의존성
+    waitress = None
+
+ROOT = Path(__file__).resolve().parents[2]
+
+# serve() 를 별도 프로세스에서 띄운다: SIGTERM 은 프로세스 단위로 전달된다.
+WAITRESS_SCRIPT = """
+import time
+from libs.wsgi_server import serve
+
+BODY = b"x" * (64 * 1024 * 1024)  # 소켓 버퍼를 넘는 나머지는 이벤트 루프가 내보낸다
+
+def app(environ, start_response):
+    if environ["PATH_INFO"] == "/slow":
+        print("entered", flush=True)
+        time.sleep(2.5)  # asyncore 루프 타임아웃(1s) 보다 길게
+    start_response("200 OK", [("Content-Type", "application/octet-stream")])
+    return [BODY if environ["PATH_INFO"] == "/slow" else b"ok"]
+
+serve(app, {"host": "127.0.0.1", "port": 0, "backend": "waitress", "shutdown_timeout": 10})
+print("exited", flush=True)
+"""
+
+
+def _slow_app(release: threading.Event, entered: threading.Event):
+    def app(environ, start_response):
+        if environ["PATH_INFO"] == "/slow":
+            entered.set()
+            release.wait(timeout=5)
+        start_response("200 OK", [("Content-Type", "text/plain")])
+        return [b"ok"]
+
+    return app
+
+
+class ServerOptionsTest(unittest.TestCase):
+    def test_defaults_and_env_overrides(self) -> None:
+        defaults = server_options({})
+        self.assertEqual(("0.0.0.0", 8100, 8, "waitress"), (
+            defaults["host"], defaults["port"], defaults["threads"], defaults["backend"]
+        ))
+
+        options = server_options({
+            "WM_API_PORT": '"9000"',
+            "WM_API_THREADS": "0",
+            "WM_API_SERVER": "Werkzeug",
+            "WM_API_SHUTDOWN_TIMEOUT_SEC": "2.5",
+        })
+        self.assertEqual(9000, options["port"])
+        self.assertEqual(1, options["threads"])
+        self.assertEqual("werkzeug", options["backend"])
+        self.assertEqual(2.5, options["shutdown_timeout"])
+
+
+class APIServerTest(unittest.TestCase):
+    def test_close_waits_for_in_flight_request(self) -> None:
+        release, entered = threading.Event(), threading.Event()
+        server = APIServer(_slow_app(release, entered), {"host": "127.0.0.1", "port": 0, "backend": "werkzeug"})
+        threading.Thread(target=server.run, daemon=True).start()
+        base = f"http://127.0.0.1:{server.port}"
+        self.assertEqual("ok", requests.get(f"{base}/fast", timeout=5).text)
+
+        results = []
+        client = threading.Thread(target=lambda: results.append(requests.get(f"{base}/slow", timeout=5)))
+        client.start()
+        self.assertTrue(entered.wait(timeout=5))
+
+        server.stop()
+        threading.Timer(0.2, release.set).start()
+        self.assertTrue(server.close(timeout=5))
+        client.join(timeout=5)
+
+        self.assertEqual(200, results[0].status_code)
+        self.assertEqual(0, server.tracker.active)
+        with self.assertRaises(requests.ConnectionError):
+            requests.get(f"{base}/fast", timeout=1)
+
+    @unittest.skipIf(waitress is None, "waitress 미설치")
+    def test_waitress_sigterm_finishes_in_flight_response(self) -> None:
+        self._assert_signal_drains(signal.SIGTERM)
+
+    @unittest.skipIf(waitress is None, "waitress 미설치")
+    def test_waitress_sigint_finishes_in_flight_response(self) -> None:
+        self._assert_signal_drains(signal.SIGINT)
+
+    def _assert_signal_drains(self, signum: int) -> None:
+        process = subprocess.Popen(
+            [sys.executable, "-u", "-c", WAITRESS_SCRIPT],
+            cwd=ROOT,
+            env={**os.environ, "PYTHONPATH": str(ROOT)},
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+        )
+        self.addCleanup(process.kill)
+        line = process.stdout.readline()
+        self.assertIn("[API] waitress 서버 시작", line)
+        base = "http://" + line.split()[-2]
+
+        results = []
+        client = threading.Thread(target=lambda: results.append(requests.get(f"{base}/slow", timeout=10)))
+        client.start()
+        self.assertEqual("entered", process.stdout.readline().strip())
+        process.send_signal(signum)
+        client.join(timeout=10)
+
+        self.assertEqual(200, results[0].status_code)
+        self.assertEqual(64 * 1024 * 1024, len(results[0].content))
+        output = process.communicate(timeout=10)[0]
+        self.assertEqual(0, process.returncode)
+        self.assertIn("exited", output)
+        self.assertNotIn("시간 초과", output)
+
+    def test_close_reports_timeout(self) -> None:
+        tracker = InflightTracker(lambda environ, start_response: [b""])
+        body = tracker({}, lambda *a: None)
+        started = time.monotonic()
+        self.assertFalse(tracker.wait_idle(0.05))
+        self.assertLess(time.monotonic() - started, 1)
+        body.close()
+        self.assertTrue(tracker.wait_idle(0.05))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import importlib
+import json
+import sys
+import types
+import unittest
+from unittest.mock import patch
+
+
+def load_chunking_module():
+    awscrt_module = types.ModuleType("awscrt")
+    awscrt_module.io = types.SimpleNamespace()
+    awscrt_module.mqtt = types.SimpleNamespace(
+        QoS=types.SimpleNamespace(AT_MOST_ONCE=0),
+        Connection=object,
+    )
+    awsiot_module = types.ModuleType("awsiot")
+    awsiot_module.mqtt_connection_builder = types.SimpleNamespace()
+    dotenv_module = types.ModuleType("dotenv")
+    dotenv_module.load_dotenv = lambda *args, **kwargs: None
+
+    with patch.dict(
+        sys.modules,
+        {
+            "awscrt": awscrt_module,
+            "awsiot": awsiot_module,
+            "dotenv": dotenv_module,
+        },
+    ):
+        for name in ("mqtt_pkg.chunking", "mqtt_pkg.publisher", "mqtt_pkg.runtime", "mqtt_pkg.settings"):
+            sys.modules.pop(name, None)
+        return importlib.import_module("mqtt_pkg.chunking")
+
+
+def _devices(count, big_every=0):
+    devices = []
+    for i in range(count):
+        attributes = {"friendly_name": f"디바이스 {i}"}
+        if big_every and i % big_every == 0:
+            attributes["effect_list"] = [f"effect_{n}" for n in range(300)]
+        devices.append({"entity_id": f"light.d{i}", "state": "on", "attributes": attributes})
+    return devices
+
+
+class ChunkingTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.chunking = load_chunking_module()
+        self.envelope = {"hub_id": "hub", "ts": "2026-10-18T00:00:00Z", "type": "query_response_all"}
+
+    def test_small_payload_is_one_message_without_chunk_fields(self) -> None:
+        devices = _devices(3)
+        [(payload, body)] = list(self.chunking.iter_chunks(self.envelope, "data", devices, 10 * 1024))
+        self.assertEqual(payload, {**self.envelope, "data": devices})
+        self.assertEqual(json.loads(body), payload)
+
+    def test_chunks_never_exceed_budget_with_uneven_items(self) -> None:
+        devices = _devices(120, big_every=7)
+        chunks = list(self.chunking.iter_chunks(self.envelope, "data", devices, 8 * 1024))
+
+        self.assertGreater(len(chunks), 1)
+        ids = {payload["chunk_id"] for payload, _ in chunks}
+        self.assertEqual(len(ids), 1)
+        reassembled = []
+        for number, (payload, body) in enumerate(chunks, start=1):
+            self.assertLessEqual(len(body), 8 * 1024)
+            self.assertEqual(json.loads(body), payload)
+            self.assertEqual((payload["chunk"], payload["total_chunks"]), (number, len(chunks)))
+            self.assertEqual(payload["hub_id"], "hub")
+            reassembled.extend(payload["data"])
+        self.assertEqual(reassembled, devices)
+
+    def test_item_larger_than_budget_goes_alone(self) -> None:
+        devices = _devices(3, big_every=2)
+        with patch("builtins.print"):
+            chunks = list(self.chunking.iter_chunks(self.envelope, "data", devices, 1024))
+        self.assertEqual([len(payload["data"]) for payload, _ in chunks], [1, 1, 1])
+
+    def test_publish_chunked_uses_compression_before_splitting(self) -> None:
+        publisher = self.chunking.publisher
+        devices = _devices(300)
+        topic = "matterhub/hub/state/devices"
+        with patch.object(publisher, "publish") as publish_mock, \
+                patch.object(publisher, "publish_encoded") as encoded_mock:
+            with patch.object(publisher.settings, "MQTT_COMPRESS_TOPICS", []):
+                count = self.chunking.publish_chunked(self.envelope, "devices", devices, topic, 10 * 1024)
+            self.assertEqual(count, publish_mock.call_count)
+            self.assertGreater(count, 1)
+            for call in publish_mock.call_args_list:
+                self.assertEqual(json.loads(call.kwargs["encoded"]), call.args[0])
+            encoded_mock.assert_not_called()
+
+            publish_mock.reset_mock()
+            with patch.object(publisher.settings, "MQTT_COMPRESS_TOPICS", ["matterhub/+/state/devices"]):
+                count = self.chunking.publish_chunked(self.envelope, "devices", devices, topic, 10 * 1024)
+        self.assertEqual(count, 1)
+        publish_mock.assert_not_called()
+        wire = encoded_mock.call_args.args[0]
+        self.assertLessEqual(len(wire), 10 * 1024)
+        self.assertEqual(publisher.mqtt_envelope.unwrap(wire)["devices"], devices)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import unittest
+from concurrent.futures import Future
+from unittest.mock import patch
+
+from mqtt_pkg.publish_pipeline import (
+    PRIORITY_BULK,
+    PRIORITY_NORMAL,
+    PRIORITY_URGENT,
+    PublishPipeline,
+)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeSender:
+    """Records publishes and hands back a Future per QoS1 publish."""
+
+    def __init__(self) -> None:
+        self.sent = []
+        self.futures = []
+        self.fail_qos0 = False
+
+    def __call__(self, topic: str, payload: bytes, qos1: bool):
+        self.sent.append((topic, payload, qos1))
+        if not qos1:
+            if self.fail_qos0:
+                raise ConnectionError("offline")
+            return None
+        future: Future = Future()
+        self.futures.append(future)
+        return future
+
+
+def _make_pipeline(**kwargs):
+    sender = FakeSender()
+    clock = FakeClock()
+    pipeline = PublishPipeline(sender, clock=clock, **kwargs)
+    return pipeline, sender, clock
+
+
+class PublishPipelineTest(unittest.TestCase):
+    def setUp(self) -> None:
+        patcher = patch("builtins.print")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_urgent_messages_go_before_bulk_and_fifo_within_priority(self) -> None:
+        pipeline, sender, _ = _make_pipeline(max_in_flight=1)
+        pipeline.submit("state/devices", b"bulk", PRIORITY_BULK)
+        pipeline.submit("api/response", b"r1", PRIORITY_URGENT)
+        pipeline.submit("other", b"normal", PRIORITY_NORMAL)
+        pipeline.submit("api/response", b"r2", PRIORITY_URGENT)
+
+        order = []
+        while pipeline.run_once():
+            order.append(sender.sent[-1][1])
+            sender.futures[-1].set_result(None)
+
+        self.assertEqual(order, [b"r1", b"r2", b"normal", b"bulk"])
+        self.assertEqual(pipeline.stats()["qos1"], 4)
+
+    def test_in_flight_window_limits_outstanding_publishes(self) -> None:
+        pipeline, sender, clock = _make_pipeline(max_in_flight=2)
+        for index in range(3):
+            pipeline.submit("t", str(index).encode())
+
+        pipeline.run_once()
+        self.assertEqual(len(sender.sent), 2)
+        self.assertEqual(pipeline.stats()["in_flight"], 2)
+        self.assertFalse(pipeline.run_once())
+
+        clock.now += 0.04
+        sender.futures[0].set_result(None)
+        pipeline.run_once()
+        self.assertEqual([payload for _, payload, _ in sender.sent], [b"0", b"1", b"2"])
+
+        stats = pipeline.stats()
+        self.assertEqual((stats["queue_depth"], stats["in_flight"], stats["qos1"]), (0, 2, 1))
+        self.assertEqual(stats["puback_ms"]["le_50"], 1)
+        self.assertEqual(stats["puback_avg_ms"], 40.0)
+
+    def test_missing_or_failed_puback_falls_back_to_qos0(self) -> None:
+        pipeline, sender, clock = _make_pipeline(timeout_sec=3)
+        pipeline.submit("slow", b"a")
+        pipeline.submit("broken", b"b")
+        pipeline.run_once()
+
+        sender.futures[1].set_exception(RuntimeError("rejected"))
+        clock.now += 3
+        pipeline.run_once()
+        # 타임아웃 뒤 늦게 온 PUBACK 은 무시한다.
+        sender.futures[0].set_result(None)
+
+        qos0 = sorted(topic for topic, _, qos1 in sender.sent if not qos1)
+        self.assertEqual(qos0, ["broken", "slow"])
+        stats = pipeline.stats()
+        self.assertEqual((stats["qos1"], stats["qos0_fallback"], stats["timeouts"]), (0, 2, 1))
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertTrue(pipeline.flush(timeout=0.1))
+
+    def test_failed_fallback_counts_as_dropped(self) -> None:
+        pipeline, sender, _ = _make_pipeline()
+        sender.fail_qos0 = True
+        pipeline.submit("t", b"a")
+        pipeline.run_once()
+        sender.futures[0].set_exception(RuntimeError("rejected"))
+        pipeline.run_once()
+
+        self.assertEqual(pipeline.stats()["dropped"], {"queue_full": 0, "failed": 1})
+
+    def test_full_queue_evicts_newest_bulk_for_more_urgent_messages(self) -> None:
+        pipeline, sender, _ = _make_pipeline(max_queue=2)
+        self.assertTrue(pipeline.submit("state/devices", b"bulk-1", PRIORITY_BULK))
+        self.assertTrue(pipeline.submit("state/devices", b"bulk-2", PRIORITY_BULK))
+        self.assertTrue(pipeline.submit("event/device_alerts", b"alert", PRIORITY_URGENT))
+        self.assertFalse(pipeline.submit("state/devices", b"bulk-3", PRIORITY_BULK))
+
+        stats = pipeline.stats()
+        self.assertEqual(stats["queue_depth_by_priority"], {"urgent": 1, "normal": 0, "bulk": 1})
+        self.assertEqual(stats["dropped"]["queue_full"], 2)
+
+        pipeline.run_once()
+        self.assertEqual([payload for _, payload, _ in sender.sent], [b"alert", b"bulk-1"])
+
+
+    def test_fallbacks_are_resent_in_submit_order(self) -> None:
+        pipeline, sender, _ = _make_pipeline(max_in_flight=3)
+        for payload in (b"a", b"b", b"c"):
+            pipeline.submit("t", payload)
+        pipeline.run_once()
+        sender.futures[2].set_exception(RuntimeError("rejected"))
+        sender.futures[0].set_exception(RuntimeError("rejected"))
+        pipeline.run_once()
+
+        self.assertEqual([payload for _, payload, qos1 in sender.sent if not qos1], [b"a", b"c"])
+
+    def test_full_queue_evicts_whole_chunk_groups(self) -> None:
+        pipeline, sender, _ = _make_pipeline(max_queue=4)
+        self.assertTrue(pipeline.submit_group("state/devices", [b"c1", b"c2", b"c3"], PRIORITY_BULK, group="g1"))
+        self.assertTrue(pipeline.submit("api/response", b"x", PRIORITY_URGENT))
+        # 자리가 하나 모자라도 g1 은 한 청크가 아니라 묶음 전체가 빠진다.
+        self.assertTrue(pipeline.submit("api/response", b"y", PRIORITY_URGENT))
+
+        stats = pipeline.stats()
+        self.assertEqual(stats["queue_depth_by_priority"], {"urgent": 2, "normal": 0, "bulk": 0})
+        self.assertEqual(stats["dropped"]["queue_full"], 3)
+
+    def test_group_without_room_is_rejected_whole(self) -> None:
+        pipeline, _, _ = _make_pipeline(max_queue=3)
+        pipeline.submit("api/response", b"a", PRIORITY_URGENT)
+        pipeline.submit("api/response", b"b", PRIORITY_URGENT)
+
+        self.assertFalse(pipeline.submit_group("state/devices", [b"c1", b"c2"], PRIORITY_BULK, group="g1"))
+        stats = pipeline.stats()
+        self.assertEqual((stats["queue_depth"], stats["dropped"]["queue_full"]), (2, 2))
+
+    def test_group_already_sending_is_not_evicted(self) -> None:
+        pipeline, sender, _ = _make_pipeline(max_queue=3, max_in_flight=1)
+        pipeline.submit_group("state/devices", [b"c1", b"c2", b"c3"], PRIORITY_BULK, group="g1")
+        pipeline.run_once()
+        self.assertTrue(pipeline.submit("api/response", b"u", PRIORITY_URGENT))
+        self.assertFalse(pipeline.submit("api/response", b"v", PRIORITY_URGENT))
+
+        while True:
+            sender.futures[-1].set_result(None)
+            if not pipeline.run_once():
+                break
+        self.assertEqual([payload for _, payload, _ in sender.sent], [b"c1", b"u", b"c2", b"c3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
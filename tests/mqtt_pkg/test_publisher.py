@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import importlib
+import json
 import sys
 import types
 import unittest
@@ -66,6 +67,110 @@ class PublisherTest(unittest.TestCase):
             "[MQTT] publish_result topic=update/reported/dev/example status=failed type=bootstrap_all_states error=RuntimeError"
         )
 
+    def test_splice_raw_json_inserts_body_verbatim(self) -> None:
+        publisher = load_publisher_module()
+        raw = b'[{"entity_id": "light.a", "state": "on"}]\n'
+
+        spliced = publisher.splice_raw_json({"type": "query_response_all", "status": 200}, "data", raw)
+
+        self.assertIn(b'"data":[{"entity_id": "light.a", "state": "on"}]}', spliced)
+        self.assertEqual(
+            json.loads(spliced),
+            {"type": "query_response_all", "status": 200, "data": [{"entity_id": "light.a", "state": "on"}]},
+        )
+        self.assertEqual(json.loads(publisher.splice_raw_json({}, "data", b"{}")), {"data": {}})
+        with self.assertRaises(ValueError):
+            publisher.splice_raw_json({"type": "x"}, "data", b"not json")
+
+    def test_publish_raw_sends_spliced_bytes(self) -> None:
+        publisher = load_publisher_module()
+        connection = Mock()
+        connection.publish.return_value = (Mock(), 1)
+
+        qos = types.SimpleNamespace(AT_LEAST_ONCE=1, AT_MOST_ONCE=0)
+        with patch.object(publisher, "mqtt", types.SimpleNamespace(QoS=qos)):
+            with patch.object(publisher.runtime, "get_connection", return_value=connection):
+                with patch("builtins.print"):
+                    publisher.publish_raw({"type": "query_response_all"}, "data", b"[1, 2]", response_topic="t")
+
+        sent = connection.publish.call_args.kwargs["payload"]
+        self.assertEqual(json.loads(sent), {"type": "query_response_all", "data": [1, 2]})
+
+    def test_encode_for_topic_compresses_opted_in_topics_and_negotiated_requests(self) -> None:
+        publisher = load_publisher_module()
+        big = json.dumps({"type": "query_response_all", "data": ["x" * 50] * 200}).encode("utf-8")
+        meta = {"type": "query_response_all", "correlation_id": "c1"}
+
+        with patch.object(publisher.settings, "MQTT_COMPRESS_TOPICS", ["matterhub/+/state/devices"]), \
+                patch.object(publisher.settings, "MQTT_COMPRESS_MIN_BYTES", 1024):
+            self.assertEqual(publisher.encode_for_topic(big, "matterhub/h/api/response", meta), big)
+            self.assertEqual(publisher.encode_for_topic(b'{"type":"x"}', "matterhub/h/state/devices"), b'{"type":"x"}')
+
+            wire = publisher.encode_for_topic(big, "matterhub/h/state/devices", meta)
+            self.assertEqual(json.loads(wire)["content_encoding"], "gzip")
+            self.assertEqual(publisher.mqtt_envelope.unwrap(wire), json.loads(big))
+
+            wire = publisher.encode_for_topic(big, "matterhub/h/api/response", meta, accept_encoding=["gzip"])
+            envelope = json.loads(wire)
+            self.assertEqual((envelope["type"], envelope["correlation_id"]), ("query_response_all", "c1"))
+            self.assertLess(len(wire), len(big))
+
+    def test_encode_for_topic_sends_uncompressed_when_compression_fails(self) -> None:
+        publisher = load_publisher_module()
+        big = json.dumps({"type": "query_response_all", "data": ["x" * 50] * 200}).encode("utf-8")
+
+        with patch.object(publisher.settings, "MQTT_COMPRESS_TOPICS", ["matterhub/+/state/devices"]), \
+                patch.object(publisher.settings, "MQTT_COMPRESS_MIN_BYTES", 1024), \
+                patch.object(publisher.settings, "MQTT_COMPRESS_LEVEL", 19), \
+                patch("builtins.print"):
+            wire = publisher.encode_for_topic(big, "matterhub/h/state/devices")
+            self.assertEqual(json.loads(wire)["content_encoding"], "gzip")
+
+            with patch.object(publisher.mqtt_envelope, "compress", side_effect=ValueError("bad level")):
+                self.assertEqual(publisher.encode_for_topic(big, "matterhub/h/state/devices"), big)
+
+    def test_async_mode_queues_with_priority_instead_of_waiting(self) -> None:
+        publisher = load_publisher_module()
+        pipeline = Mock()
+        connection = Mock()
+
+        with patch.object(publisher.settings, "MQTT_PUBLISH_ASYNC", True), \
+                patch.object(publisher, "get_pipeline", return_value=pipeline), \
+                patch.object(publisher.runtime, "get_connection", return_value=connection):
+            publisher.publish({"type": "query_response_all", "correlation_id": "c1"}, response_topic="matterhub/h/api/response")
+            publisher.publish({"hub_id": "h", "devices": []}, response_topic="matterhub/h/state/devices")
+
+        connection.publish.assert_not_called()
+        priorities = [call.args[2] for call in pipeline.submit.call_args_list]
+        self.assertEqual(
+            priorities,
+            [publisher.publish_pipeline.PRIORITY_URGENT, publisher.publish_pipeline.PRIORITY_BULK],
+        )
+        self.assertEqual(pipeline.submit.call_args_list[0].args[0], "matterhub/h/api/response")
+
+
+    def test_async_mode_queues_chunks_as_one_group(self) -> None:
+        publisher = load_publisher_module()
+        pipeline = Mock()
+        chunks = [
+            ({"type": "query_response_all", "chunk_id": "abc", "chunk": n, "total_chunks": 2}, b'{"chunk":%d}' % n)
+            for n in (1, 2)
+        ]
+
+        with patch.object(publisher.settings, "MQTT_PUBLISH_ASYNC", True), \
+                patch.object(publisher, "get_pipeline", return_value=pipeline), \
+                patch.object(publisher.runtime, "get_connection", return_value=Mock()):
+            publisher.publish_chunks(chunks, response_topic="matterhub/h/state/devices")
+
+        pipeline.submit.assert_not_called()
+        pipeline.submit_group.assert_called_once_with(
+            "matterhub/h/state/devices",
+            [b'{"chunk":1}', b'{"chunk":2}'],
+            publisher.publish_pipeline.PRIORITY_BULK,
+            "query_response_all",
+            group="abc",
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -30,10 +30,14 @@ def load_state_module():
     fake = _setup_fake_modules()
     with patch.dict(sys.modules, fake):
         for mod_name in [
-            "mqtt_pkg.state", "mqtt_pkg.publisher",
+            "mqtt_pkg.state", "mqtt_pkg.chunking", "mqtt_pkg.publisher",
             "mqtt_pkg.runtime", "mqtt_pkg.settings",
         ]:
             sys.modules.pop(mod_name, None)
+            # 패키지 속성에 남은 이전 서브모듈도 지워야 서로 같은 모듈을 다시 import 한다.
+            package = sys.modules.get("mqtt_pkg")
+            if package is not None:
+                package.__dict__.pop(mod_name.rsplit(".", 1)[1], None)
         return importlib.import_module("mqtt_pkg.state")
 
 
@@ -162,6 +166,71 @@ class TestPublishDeviceStatesBulk(unittest.TestCase):
                 self.assertIn("total_chunks", payload)
                 self.assertIn("devices", payload)
 
+    def test_compressed_topic_fits_in_one_message(self):
+        ha_states = _make_ha_states([f"sensor.device_{i}" for i in range(200)])
+        with self._patch_connected(), self._patch_matterhub_id("hub"), \
+                self._patch_ha_states(ha_states), self._patch_devices_file(None), \
+                patch.object(self.state.settings, "MQTT_DEVICE_STATE_CHUNK_SIZE_KB", 10), \
+                patch.object(self.state.settings, "MQTT_COMPRESS_TOPICS", ["matterhub/+/state/devices"]), \
+                patch.object(self.state.publisher, "publish_encoded") as mock_encoded, \
+                self._patch_publish() as mock_pub, patch("builtins.print"):
+            self.state.publish_device_states_bulk()
+        mock_pub.assert_not_called()
+        mock_encoded.assert_called_once()
+        wire = mock_encoded.call_args[0][0]
+        self.assertLessEqual(len(wire), 10 * 1024)
+        self.assertEqual(len(self.state.publisher.mqtt_envelope.unwrap(wire)["devices"]), 200)
+
+
+class TestDeviceStateDelta(unittest.TestCase):
+    def setUp(self):
+        self.state = load_state_module()
+        self.state._last_device_state_publish = 0.0
+
+    def _publish(self, states):
+        self.state._last_device_state_publish = 0.0
+        with patch.object(self.state.runtime, "is_connected", return_value=True), \
+                patch.object(self.state.settings, "MATTERHUB_ID", "hub"), \
+                patch.object(self.state.settings, "DEVICES_FILE_PATH", None), \
+                patch.object(self.state.settings, "MQTT_DEVICE_STATE_DELTA", True), \
+                patch.object(self.state.settings, "MQTT_DEVICE_STATE_KEYFRAME_SEC", 600), \
+                patch.object(self.state.publisher, "publish") as mock_pub, \
+                patch("builtins.print"):
+            self.state.publish_device_states_bulk(self.state.StateSnapshot.from_states(states))
+        return [call[0][0] for call in mock_pub.call_args_list]
+
+    def test_keyframe_then_deltas_then_resync(self):
+        states = _make_ha_states(["light.a", "light.b", "sensor.c"])
+        [keyframe] = self._publish(states)
+        self.assertEqual((keyframe["type"], keyframe["seq"]), ("keyframe", 1))
+        self.assertEqual(len(keyframe["devices"]), 3)
+
+        self.assertEqual(self._publish(states), [])
+
+        states[1] = dict(states[1], state="off")
+        [delta] = self._publish(states)
+        self.assertEqual((delta["type"], delta["seq"], delta["base_seq"]), ("delta", 2, 1))
+        self.assertEqual([(d["entity_id"], d["state"]) for d in delta["devices"]], [("light.b", "off")])
+        self.assertEqual(delta["removed"], [])
+
+        [delta] = self._publish(states[:2])
+        self.assertEqual((delta["seq"], delta["base_seq"], delta["devices"]), (3, 2, []))
+        self.assertEqual(delta["removed"], ["sensor.c"])
+
+        self.state.request_device_state_keyframe()
+        [keyframe] = self._publish(states[:2])
+        self.assertEqual((keyframe["type"], keyframe["seq"], len(keyframe["devices"])), ("keyframe", 4, 2))
+
+    def test_large_delta_chunks_share_sequence(self):
+        states = _make_ha_states([f"sensor.device_{i}" for i in range(200)])
+        self._publish(states)
+        changed = [dict(item, state="off") for item in states]
+        with patch.object(self.state.settings, "MQTT_DEVICE_STATE_CHUNK_SIZE_KB", 10):
+            chunks = self._publish(changed)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual({(c["type"], c["seq"], c["base_seq"]) for c in chunks}, {("delta", 2, 1)})
+        self.assertEqual(sum(len(c["devices"]) for c in chunks), 200)
+
 
 def _make_ha_state(entity_id, state_val="on", attributes=None):
     return {
@@ -382,5 +451,113 @@ class TestDeviceAlertPublisher(unittest.TestCase):
             self.assertEqual(payload["attributes"]["device_class"], "light")
 
 
+class TestPublishDeviceStateDedup(unittest.TestCase):
+    def setUp(self):
+        self.state = load_state_module()
+        self.state.last_entity_publish.clear()
+
+    def _publish(self, states, now):
+        snapshot = self.state.StateSnapshot.from_states(states)
+        with patch.object(self.state.runtime, "is_connected", return_value=True), \
+                patch.object(self.state.settings, "MQTT_REPORT_ENTITY_IDS", ["light.a"]), \
+                patch.object(self.state.settings, "MQTT_EVENT_THROTTLE_SEC", 1.0), \
+                patch.object(self.state.settings, "MQTT_EVENT_DEDUP_WINDOW_SEC", 10.0), \
+                patch.object(self.state.time, "time", return_value=now):
+            self.state.publish_device_state(snapshot)
+        return self.state.last_entity_publish["light.a"]
+
+    def test_unchanged_state_is_deduplicated_without_serializing(self):
+        states = [{"entity_id": "light.a", "state": "on", "last_updated": "t1", "context": {"id": "c1"}}]
+        with patch("libs.jsonfast.dumpb") as dumpb_mock:
+            first = self._publish(states, 100.0)
+            self.assertEqual((first.ts, first.version), (100.0, 1))
+            again = self._publish([dict(states[0])], 105.0)
+        dumpb_mock.assert_not_called()
+        self.assertIs(again, first)
+        self.assertEqual((again.ts, again.version), (100.0, 1))
+
+        changed = self._publish(
+            [{"entity_id": "light.a", "state": "off", "last_updated": "t2", "context": {"id": "c2"}}], 106.0
+        )
+        self.assertEqual((changed.ts, changed.version), (106.0, 2))
+
+    def test_fingerprint_uses_last_updated_or_structure(self):
+        fingerprint = self.state.state_fingerprint
+        base = {"entity_id": "light.a", "state": "on", "last_updated": "t1", "attributes": {"x": 1}}
+        self.assertEqual(fingerprint(base), fingerprint({**base, "attributes": {"x": 2}}))
+        self.assertNotEqual(fingerprint(base), fingerprint({**base, "last_updated": "t2"}))
+
+        plain = {"entity_id": "light.a", "state": "on", "attributes": {"rgb": [1, 2], "x": 1}}
+        self.assertEqual(fingerprint(plain), fingerprint({"attributes": {"x": 1, "rgb": [1, 2]},
+                                                          "state": "on", "entity_id": "light.a"}))
+        self.assertNotEqual(fingerprint(plain), fingerprint({**plain, "attributes": {"rgb": [1, 3], "x": 1}}))
+
+
+class TestStateSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.state = load_state_module()
+
+    def test_from_states_builds_read_only_index(self):
+        snapshot = self.state.StateSnapshot.from_states(
+            _make_ha_states(["light.a", "sensor.b"]) + [{"state": "on"}, "junk"]
+        )
+        self.assertEqual(len(snapshot), 2)
+        self.assertEqual(snapshot.get("sensor.b")["entity_id"], "sensor.b")
+        self.assertIsNone(snapshot.get("light.missing"))
+        with self.assertRaises(TypeError):
+            snapshot.by_entity_id["light.c"] = {}
+
+    def test_provider_fetches_once_within_ttl(self):
+        provider = self.state.StateSnapshotProvider(ttl_sec=60)
+        with patch.object(
+            self.state, "_fetch_ha_states", return_value=_make_ha_states(["light.a"])
+        ) as fetch_mock:
+            first = provider.get()
+            second = provider.get()
+            self.assertIs(first, second)
+            self.assertEqual(fetch_mock.call_count, 1)
+            provider.invalidate()
+            provider.get()
+            self.assertEqual(fetch_mock.call_count, 2)
+
+    def test_provider_does_not_cache_failed_fetch(self):
+        provider = self.state.StateSnapshotProvider(ttl_sec=60)
+        with patch.object(self.state, "_fetch_ha_states", side_effect=[None, _make_ha_states(["light.a"])]):
+            self.assertIsNone(provider.get())
+            self.assertEqual(len(provider.get()), 1)
+
+    def test_synced_mirror_replaces_rest_polling(self):
+        mirror = self.state.state_mirror.HAStateMirror(
+            fetch_states=lambda: [],
+            snapshot_factory=self.state.StateSnapshot.from_states,
+            ws_url="ws://ha/api/websocket",
+            token="t",
+        )
+        mirror.seed(_make_ha_states(["light.a"]))
+        mirror._synced = True
+        with patch.object(self.state, "_state_mirror", mirror), \
+                patch.object(self.state, "_fetch_ha_states") as fetch_mock:
+            snapshot = self.state.get_state_snapshot()
+        fetch_mock.assert_not_called()
+        self.assertEqual(snapshot.get("light.a")["state"], "on")
+
+    def test_run_state_tick_shares_one_fetch_across_pollers(self):
+        self.state._last_device_state_publish = 0.0
+        self.state.state_snapshots.invalidate()
+        ha_states = _make_ha_states(["light.a", "sensor.b"])
+        with patch.object(self.state.runtime, "is_connected", return_value=True), \
+                patch.object(self.state.settings, "MATTERHUB_ID", "hub"), \
+                patch.object(self.state.settings, "DEVICES_FILE_PATH", None), \
+                patch.object(self.state.settings, "MQTT_REPORT_ENTITY_IDS", ["light.a"]), \
+                patch.object(self.state, "_fetch_ha_states", return_value=ha_states) as fetch_mock, \
+                patch.object(self.state.publisher, "publish") as mock_pub, \
+                patch("builtins.print"):
+            self.state.run_state_tick()
+        fetch_mock.assert_called_once()
+        self.assertEqual(mock_pub.call_args[1]["response_topic"], "matterhub/hub/state/devices")
+        self.assertIn("light.a", self.state.last_entity_publish)
+        self.assertTrue(self.state._alert_publisher._initialized)
+
+
 if __name__ == "__main__":
     unittest.main()
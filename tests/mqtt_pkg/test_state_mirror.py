@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import unittest
+from unittest.mock import patch
+
+from mqtt_pkg.state_mirror import HAStateMirror, wait_or_sleep
+
+
+def _state(entity_id, value="on", last_updated="2026-03-21T00:00:00+00:00"):
+    return {
+        "entity_id": entity_id,
+        "state": value,
+        "last_updated": last_updated,
+        "attributes": {},
+    }
+
+
+def _event(entity_id, new_state):
+    return {
+        "type": "event",
+        "event": {
+            "event_type": "state_changed",
+            "data": {"entity_id": entity_id, "new_state": new_state},
+        },
+    }
+
+
+def _make_mirror():
+    return HAStateMirror(
+        fetch_states=lambda: [],
+        snapshot_factory=lambda states: tuple(sorted(s["entity_id"] for s in states)),
+        ws_url="ws://localhost:8123/api/websocket",
+        token="t",
+    )
+
+
+class HAStateMirrorTest(unittest.TestCase):
+    def test_seed_then_apply_incremental_events(self) -> None:
+        mirror = _make_mirror()
+        mirror.seed([_state("light.a"), _state("light.b")])
+
+        changed = mirror.apply_event(
+            _event("light.a", _state("light.a", "off", "2026-03-21T00:00:05+00:00"))
+        )
+
+        self.assertTrue(changed)
+        self.assertEqual(("light.a", "light.b"), mirror.snapshot())
+        self.assertEqual("off", mirror._states["light.a"]["state"])
+
+    def test_stale_event_after_seed_is_ignored(self) -> None:
+        mirror = _make_mirror()
+        mirror.seed([_state("light.a", "off", "2026-03-21T00:00:10+00:00")])
+        version = mirror.version
+
+        changed = mirror.apply_event(
+            _event("light.a", _state("light.a", "on", "2026-03-21T00:00:05+00:00"))
+        )
+
+        self.assertFalse(changed)
+        self.assertEqual(version, mirror.version)
+        self.assertEqual("off", mirror._states["light.a"]["state"])
+
+    def test_removed_entity_is_dropped(self) -> None:
+        mirror = _make_mirror()
+        mirror.seed([_state("light.a"), _state("light.b")])
+
+        self.assertTrue(mirror.apply_event(_event("light.b", None)))
+        self.assertFalse(mirror.apply_event(_event("light.b", None)))
+        self.assertEqual(("light.a",), mirror.snapshot())
+
+    def test_snapshot_is_reused_until_next_change(self) -> None:
+        mirror = _make_mirror()
+        mirror.seed([_state("light.a")])
+        first = mirror.snapshot()
+        self.assertIs(first, mirror.snapshot())
+
+        mirror.apply_event(_event("light.c", _state("light.c")))
+        self.assertEqual(("light.a", "light.c"), mirror.snapshot())
+
+    def test_wait_for_change_wakes_on_event(self) -> None:
+        mirror = _make_mirror()
+        mirror._synced = True
+        mirror.apply_event(_event("light.a", _state("light.a")))
+
+        self.assertTrue(wait_or_sleep(mirror, timeout=1))
+        self.assertFalse(mirror.wait_for_change(timeout=0))
+
+    def test_wait_falls_back_to_sleep_when_not_synced(self) -> None:
+        mirror = _make_mirror()
+        with patch("mqtt_pkg.state_mirror.time.sleep") as sleep_mock:
+            self.assertFalse(wait_or_sleep(mirror, timeout=5))
+        sleep_mock.assert_called_once_with(5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -29,10 +29,14 @@ def load_state_module():
     fake = _setup_fake_modules()
     with patch.dict(sys.modules, fake):
         for mod_name in [
-            "mqtt_pkg.state", "mqtt_pkg.publisher",
+            "mqtt_pkg.state", "mqtt_pkg.chunking", "mqtt_pkg.publisher",
             "mqtt_pkg.runtime", "mqtt_pkg.settings",
         ]:
             sys.modules.pop(mod_name, None)
+            # 패키지 속성에 남은 이전 서브모듈도 지워야 서로 같은 모듈을 다시 import 한다.
+            package = sys.modules.get("mqtt_pkg")
+            if package is not None:
+                package.__dict__.pop(mod_name.rsplit(".", 1)[1], None)
         return importlib.import_module("mqtt_pkg.state")
 
 
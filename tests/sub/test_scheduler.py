@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import schedule
+
+from sub import scheduler
+
+
+def _one_time(schedule_id, when, entity_id="light.a"):
+    return {
+        "id": schedule_id,
+        "activate": True,
+        "condition": [],
+        "schedule": {"type": "one-time", "datetime": when.strftime("%Y-%m-%d %H:%M")},
+        "action": {"domain": "light", "service": "turn_on", "entity_id": entity_id},
+    }
+
+
+class OneTimeScheduleTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.now = datetime(2026, 3, 21, 9, 0)
+        self.one_time = scheduler.one_time_schedule()
+        patcher = patch.object(scheduler, "service")
+        self.service = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_fires_due_entries_once_and_removes_them(self) -> None:
+        self.one_time.add_schedule(_one_time("a", self.now + timedelta(minutes=1)), now=self.now)
+        self.one_time.add_schedule(_one_time("b", self.now + timedelta(minutes=5)), now=self.now)
+
+        self.one_time.run_pending(now=self.now)
+        self.service.assert_not_called()
+
+        self.one_time.run_pending(now=self.now + timedelta(minutes=1, seconds=2))
+        self.one_time.run_pending(now=self.now + timedelta(minutes=1, seconds=30))
+
+        self.assertEqual(1, self.service.call_count)
+        self.assertEqual(["b"], [s["id"] for s in self.one_time.one_time_schedule_list])
+
+    def test_sleep_time_is_until_next_entry(self) -> None:
+        self.assertIsNone(self.one_time.seconds_until_next(now=self.now))
+        self.one_time.add_schedule(_one_time("b", self.now + timedelta(minutes=5)), now=self.now)
+        self.one_time.add_schedule(_one_time("a", self.now + timedelta(minutes=2)), now=self.now)
+
+        self.assertEqual(120.0, self.one_time.seconds_until_next(now=self.now))
+
+    def test_past_entries_are_not_scheduled(self) -> None:
+        self.assertFalse(self.one_time.add_schedule(_one_time("old", self.now - timedelta(hours=1)), now=self.now))
+        self.assertIsNone(self.one_time.seconds_until_next(now=self.now))
+
+    def test_sync_applies_changes_by_id(self) -> None:
+        a = _one_time("a", self.now + timedelta(minutes=1))
+        b = _one_time("b", self.now + timedelta(minutes=2))
+        self.one_time.sync([a, b], now=self.now)
+
+        moved = _one_time("a", self.now + timedelta(minutes=10))
+        c = _one_time("c", self.now + timedelta(minutes=3))
+        self.one_time.sync([moved, c], now=self.now)
+
+        self.assertEqual({"a", "c"}, {s["id"] for s in self.one_time.one_time_schedule_list})
+        self.assertEqual(180.0, self.one_time.seconds_until_next(now=self.now))
+
+        # 옛 시각의 힙 엔트리는 실행되지 않는다.
+        self.one_time.run_pending(now=self.now + timedelta(minutes=1))
+        self.service.assert_not_called()
+
+    def test_resync_does_not_refire_entry_in_same_minute(self) -> None:
+        a = _one_time("a", self.now)
+        self.one_time.sync([a], now=self.now)
+        self.one_time.run_pending(now=self.now + timedelta(seconds=5))
+
+        self.one_time.sync([a], now=self.now + timedelta(seconds=10))
+        self.one_time.run_pending(now=self.now + timedelta(seconds=15))
+
+        self.assertEqual(1, self.service.call_count)
+
+    def test_schedule_without_id_is_not_refired_after_reload(self) -> None:
+        a = _one_time(None, self.now)
+        del a["id"]
+        self.one_time.sync([a], now=self.now)
+        self.one_time.run_pending(now=self.now + timedelta(seconds=5))
+
+        # 다시 읽은 schedule.json 은 내용이 같은 새 dict 이다.
+        self.one_time.sync([json.loads(json.dumps(a))], now=self.now + timedelta(seconds=10))
+        self.one_time.run_pending(now=self.now + timedelta(seconds=15))
+
+        self.assertEqual(1, self.service.call_count)
+
+
+
+def _periodic(schedule_id, value="10", rate="minutes", at="", activate=True):
+    return {
+        "id": schedule_id,
+        "activate": activate,
+        "condition": [],
+        "schedule": {"type": "periodic", "period": {"rate": rate, "value": value, "at": at}},
+        "action": {"domain": "light", "service": "turn_on", "entity_id": "light.a"},
+    }
+
+
+class ScheduleConfigTest(unittest.TestCase):
+    def setUp(self) -> None:
+        schedule.clear()
+        scheduler.periodic_jobs.clear()
+        self.addCleanup(schedule.clear)
+        self.addCleanup(scheduler.periodic_jobs.clear)
+        tmp = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False)
+        tmp.close()
+        self.path = tmp.name
+        self.addCleanup(os.remove, self.path)
+        env = patch.dict(os.environ, {"schedules_file_path": self.path})
+        env.start()
+        self.addCleanup(env.stop)
+        self.one_time = scheduler.one_time_schedule()
+
+    def _configure(self, data) -> None:
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        scheduler.schedule_config(self.one_time)
+
+    def _jobs(self):
+        return {key: job for key, (_, job) in scheduler.periodic_jobs.items()}
+
+    def test_registers_jobs_from_rate_table(self) -> None:
+        self._configure([
+            _periodic("a", "10", "minutes"),
+            _periodic("b", "1", "monday", "08:30"),
+            _periodic("off", activate=False),
+        ])
+
+        jobs = self._jobs()
+        self.assertEqual({"a", "b"}, set(jobs))
+        self.assertEqual("minutes", jobs["a"].unit)
+        self.assertEqual("monday", jobs["b"].start_day)
+        self.assertEqual(2, len(schedule.get_jobs()))
+
+    def test_reconfigure_only_touches_changed_jobs(self) -> None:
+        self._configure([_periodic("a"), _periodic("b"), _periodic("c")])
+        before = self._jobs()
+
+        self._configure([_periodic("a"), _periodic("b", "5"), _periodic("d", "1", "hours")])
+        after = self._jobs()
+
+        self.assertIs(before["a"], after["a"])
+        self.assertIsNot(before["b"], after["b"])
+        self.assertEqual(5, after["b"].interval)
+        self.assertNotIn("c", after)
+        self.assertEqual(3, len(schedule.get_jobs()))
+
+    def test_invalid_entry_is_skipped(self) -> None:
+        self._configure([_periodic("bad", rate="fortnights"), _periodic("a")])
+
+        self.assertEqual({"a"}, set(self._jobs()))
+
+    def test_one_time_entries_do_not_accumulate_on_reload(self) -> None:
+        future = datetime.now() + timedelta(days=1)
+        data = [_one_time("once", future), _periodic("a")]
+        self._configure(data)
+        self._configure(data)
+
+        self.assertEqual(["once"], [s["id"] for s in self.one_time.one_time_schedule_list])
+
+    def test_running_job_does_not_block_reconfiguration(self) -> None:
+        started, release = threading.Event(), threading.Event()
+
+        def slow_job():
+            started.set()
+            release.wait(5)
+
+        job = schedule.every(1).minutes.do(slow_job)
+        job.next_run = datetime.now() - timedelta(seconds=1)
+        runner = threading.Thread(target=scheduler.run_periodic_pending)
+        runner.start()
+        try:
+            self.assertTrue(started.wait(2))
+            # 실행 중에도 CRUD 의 재설정은 lock 을 바로 얻는다.
+            applied = threading.Thread(target=scheduler.apply_periodic_schedules, args=([_periodic("a")],))
+            applied.start()
+            applied.join(1)
+            self.assertFalse(applied.is_alive())
+            self.assertEqual({"a"}, set(self._jobs()))
+        finally:
+            release.set()
+            runner.join(5)
+        self.assertGreater(job.next_run, datetime.now())
+
+    def test_job_cancelled_before_it_runs_is_skipped(self) -> None:
+        calls = []
+        job = schedule.every(1).minutes.do(lambda: calls.append(1))
+        job.next_run = datetime.now() - timedelta(seconds=1)
+        other = schedule.every(1).minutes.do(lambda: schedule.cancel_job(job))
+        other.next_run = datetime.now() - timedelta(seconds=2)
+
+        scheduler.run_periodic_pending()
+
+        self.assertEqual([], calls)
+
+
+if __name__ == "__main__":
+    unittest.main()
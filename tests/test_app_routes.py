@@ -29,6 +29,7 @@ def _load_app_module():
         "HA_host": "http://localhost:8123",
         "hass_token": "test_token",
         "ALLOWED_MACS": "",
+        "CONFIG_EVENTS_SOCKET": "/tmp/test_config_events.sock",
     }
 
     patches = []
@@ -54,6 +55,7 @@ def _load_app_module():
     mock_scheduler.schedule_config = MagicMock()
     mock_scheduler.periodic_scheduler = MagicMock()
     mock_scheduler.one_time_scheduler = MagicMock()
+    mock_scheduler.start_state_cache = MagicMock()
 
     mock_rule = types.ModuleType("sub.ruleEngine")
 
@@ -100,6 +102,10 @@ class AppRouteTest(unittest.TestCase):
         # 등록된 라우트 목록
         cls.registered_rules = [rule.rule for rule in cls.app.url_map.iter_rules()]
 
+    def setUp(self):
+        # HA 프록시 캐시는 테스트 사이에 공유되지 않게 비운다.
+        self.app_module.proxy_cache.invalidate()
+
     def test_dead_log_routes_removed(self):
         """Phase 1: 삭제된 로그/히스토리 라우트가 존재하지 않아야 한다"""
         dead_routes = [
@@ -150,30 +156,158 @@ class AppRouteTest(unittest.TestCase):
         data = resp.get_json()
         self.assertIn("matterhub_id", data)
 
-    @patch("requests.get")
-    def test_states_endpoint_proxies_ha(self, mock_get):
+    def test_states_endpoint_proxies_ha(self):
         """GET /local/api/states — HA 프록시 정상 응답"""
         mock_resp = MagicMock()
         mock_resp.json.return_value = [{"entity_id": "light.test", "state": "on"}]
-        mock_get.return_value = mock_resp
 
-        resp = self.client.get("/local/api/states")
+        with patch.object(self.app_module.ha, "get", return_value=mock_resp) as mock_get:
+            resp = self.client.get("/local/api/states")
+        mock_get.assert_called_once_with("/api/states")
         self.assertEqual(resp.status_code, 200)
         data = resp.get_json()
         self.assertIsInstance(data, list)
 
-    @patch("requests.get")
-    def test_services_endpoint_proxies_ha(self, mock_get):
+    def test_states_endpoint_filters_pages_and_projects(self):
+        """GET /local/api/states?domain=...&fields=...&limit=... — 필터/페이지/projection"""
+        mock_resp = MagicMock()
+        mock_resp.json.return_value = [
+            {"entity_id": "light.b", "state": "on", "attributes": {"friendly_name": "B", "rgb": [1, 2, 3]}},
+            {"entity_id": "sensor.t", "state": "21", "attributes": {}},
+            {"entity_id": "light.a", "state": "off", "attributes": {"friendly_name": "A"}},
+        ]
+
+        with patch.object(self.app_module.ha, "get", return_value=mock_resp):
+            resp = self.client.get(
+                "/local/api/states?domain=light&fields=state,attributes&attributes=friendly_name&limit=1"
+            )
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(resp.get_json(), {
+                "items": [{"entity_id": "light.a", "state": "off", "attributes": {"friendly_name": "A"}}],
+                "total": 2,
+                "next_cursor": "light.a",
+            })
+
+            resp = self.client.get("/local/api/states?domain=light&fields=state&cursor=light.a")
+            self.assertEqual(resp.get_json()["items"], [{"entity_id": "light.b", "state": "on"}])
+
+            resp = self.client.get("/local/api/states?limit=zero")
+            self.assertEqual(resp.status_code, 400)
+
+    def test_states_passes_raw_ha_body_through(self):
+        """GET /local/api/states — 필터가 없으면 HA 본문 바이트를 그대로 돌려준다"""
+        raw = b'[{"entity_id": "light.a", "state": "on"}]'
+        mock_resp = MagicMock(status_code=200, content=raw)
+        mock_resp.json.return_value = [{"entity_id": "light.a", "state": "on"}]
+
+        with patch.object(self.app_module.ha, "get", return_value=mock_resp):
+            resp = self.client.get("/local/api/states")
+            filtered = self.client.get("/local/api/states?fields=state")
+
+        self.assertEqual(resp.data, raw)
+        self.assertEqual(resp.mimetype, "application/json")
+        self.assertIn("ETag", resp.headers)
+        self.assertEqual(filtered.get_json(), [{"entity_id": "light.a", "state": "on"}])
+
+    def test_states_etag_and_changes_since(self):
+        """GET /local/api/states — ETag/304, /local/api/states/changes?since= 변경분"""
+        mock_resp = MagicMock(status_code=200)
+        mock_resp.json.return_value = [
+            {"entity_id": "light.a", "state": "on", "last_updated": "t1"},
+            {"entity_id": "sensor.t", "state": "20", "last_updated": "t1"},
+        ]
+
+        with patch.object(self.app_module.ha, "get", return_value=mock_resp):
+            first = self.client.get("/local/api/states")
+            etag = first.headers["ETag"]
+            again = self.client.get("/local/api/states", headers={"If-None-Match": etag})
+            self.assertEqual(again.status_code, 304)
+            self.assertEqual(again.data, b"")
+
+            version = self.client.get("/local/api/states/changes").get_json()["version"]
+            mock_resp.json.return_value = [
+                {"entity_id": "light.a", "state": "off", "last_updated": "t2"},
+                {"entity_id": "sensor.t", "state": "20", "last_updated": "t1"},
+            ]
+            self.app_module.proxy_cache.invalidate()
+            changes = self.client.get(f"/local/api/states/changes?since={version}").get_json()
+            after = self.client.get("/local/api/states", headers={"If-None-Match": etag})
+
+        self.assertFalse(changes["full"])
+        self.assertEqual(["light.a"], [s["entity_id"] for s in changes["changed"]])
+        self.assertEqual(after.status_code, 200)
+        self.assertNotEqual(after.headers["ETag"], etag)
+
+    def test_managed_only_etag_changes_with_devices_file(self):
+        """GET /local/api/states?managed_only=1 — devices.json 이 바뀌면 304 대신 200"""
+        import tempfile, json
+        mock_resp = MagicMock(status_code=200)
+        mock_resp.json.return_value = [
+            {"entity_id": "light.a", "state": "on", "last_updated": "t1"},
+            {"entity_id": "light.b", "state": "off", "last_updated": "t1"},
+        ]
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
+            json.dump([{"entity_id": "light.a"}], f)
+            tmp_path = f.name
+
+        original = self.app_module.devices_file_path
+        self.app_module.devices_file_path = tmp_path
+        try:
+            with patch.object(self.app_module.ha, "get", return_value=mock_resp):
+                first = self.client.get("/local/api/states?managed_only=1&fields=state")
+                etag = first.headers["ETag"]
+                self.assertEqual(
+                    self.client.get("/local/api/states?managed_only=1&fields=state",
+                                    headers={"If-None-Match": etag}).status_code,
+                    304,
+                )
+
+                with open(tmp_path, "w") as f:
+                    json.dump([{"entity_id": "light.a"}, {"entity_id": "light.b"}], f)
+                stat = os.stat(tmp_path)
+                os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+                after = self.client.get("/local/api/states?managed_only=1&fields=state",
+                                        headers={"If-None-Match": etag})
+        finally:
+            self.app_module.devices_file_path = original
+            os.unlink(tmp_path)
+
+        self.assertEqual([s["entity_id"] for s in first.get_json()], ["light.a"])
+        self.assertEqual(after.status_code, 200)
+        self.assertEqual([s["entity_id"] for s in after.get_json()], ["light.a", "light.b"])
+
+    def test_services_endpoint_proxies_ha(self):
         """GET /local/api/services — HA 프록시 정상 응답"""
         mock_resp = MagicMock()
         mock_resp.json.return_value = [{"domain": "light", "services": {}}]
-        mock_get.return_value = mock_resp
 
-        resp = self.client.get("/local/api/services")
+        with patch.object(self.app_module.ha, "get", return_value=mock_resp):
+            resp = self.client.get("/local/api/services")
         self.assertEqual(resp.status_code, 200)
         data = resp.get_json()
         self.assertIsInstance(data, list)
 
+    def test_services_are_cached_and_indexed_by_domain(self):
+        """GET /local/api/devices/<id>/services — /api/services 한 번 조회 후 도메인 인덱스 사용"""
+        mock_resp = MagicMock(status_code=200)
+        mock_resp.json.return_value = [
+            {"domain": "light", "services": {"turn_on": {}}},
+            {"domain": "switch", "services": {"toggle": {}}},
+        ]
+
+        with patch.object(self.app_module.ha, "get", return_value=mock_resp) as mock_get:
+            light = self.client.get("/local/api/devices/light.a/services").get_json()
+            unknown = self.client.get("/local/api/devices/fan.a/services").get_json()
+            listed = self.client.get("/local/api/services").get_json()
+        mock_get.assert_called_once_with("/api/services")
+        self.assertEqual(light, {"turn_on": {}})
+        self.assertEqual(unknown, {})
+        self.assertEqual(len(listed), 2)
+
+        stats = self.client.get("/local/api/proxy/cache").get_json()
+        self.assertEqual(stats["endpoints"]["services"]["misses"], 1)
+        self.assertEqual(stats["endpoints"]["services"]["hits"], 2)
+
     def test_devices_get_returns_json(self):
         """GET /local/api/devices — JSON 파일 기반 CRUD"""
         import tempfile, json
@@ -193,6 +327,31 @@ class AppRouteTest(unittest.TestCase):
             self.app_module.devices_file_path = original
             os.unlink(tmp_path)
 
+    def test_rules_get_served_without_rewrite_and_put_persists(self):
+        """GET /local/api/rules — 파일을 다시 쓰지 않고, PUT은 원자적으로 저장"""
+        import tempfile, json
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
+            json.dump([{"id": "r1", "alias": "old"}], f)
+            tmp_path = f.name
+
+        original = self.app_module.rules_file_path
+        self.app_module.rules_file_path = tmp_path
+        try:
+            before = os.stat(tmp_path).st_mtime_ns
+            resp = self.client.get("/local/api/rules")
+            self.assertEqual(resp.get_json(), [{"id": "r1", "alias": "old"}])
+            self.assertEqual(before, os.stat(tmp_path).st_mtime_ns)
+
+            with patch.object(self.app_module, "file_changed_request") as changed:
+                resp = self.client.put("/local/api/rules", json={"id": "r1", "alias": "new"})
+            changed.assert_called_once_with("rules_file_changed")
+            self.assertEqual(resp.get_json(), [{"id": "r1", "alias": "new"}])
+            with open(tmp_path, 'r', encoding='utf-8') as f:
+                self.assertEqual(json.load(f), [{"id": "r1", "alias": "new"}])
+        finally:
+            self.app_module.rules_file_path = original
+            os.unlink(tmp_path)
+
     def test_webhook_returns_410(self):
         """POST /webhook — 비활성화 상태 410 반환"""
         resp = self.client.post("/webhook")
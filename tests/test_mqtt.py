@@ -28,6 +28,10 @@ def load_mqtt_module(
     callbacks_module = types.ModuleType("mqtt_pkg.callbacks")
     callbacks_module.mqtt_callback = Mock(name="mqtt_callback")
 
+    publisher_module = types.ModuleType("mqtt_pkg.publisher")
+    publisher_module.pipeline_stats = Mock(name="pipeline_stats", return_value=None)
+    publisher_module.flush = Mock(name="flush", return_value=True)
+
     runtime_module = types.ModuleType("mqtt_pkg.runtime")
     runtime_module.subscribe = Mock(name="subscribe")
     runtime_module.set_connection = Mock(name="set_connection")
@@ -74,6 +78,7 @@ def load_mqtt_module(
     injected_modules = {
         "mqtt_pkg": mqtt_pkg_module,
         "mqtt_pkg.callbacks": callbacks_module,
+        "mqtt_pkg.publisher": publisher_module,
         "mqtt_pkg.runtime": runtime_module,
         "mqtt_pkg.settings": settings_module,
         "mqtt_pkg.state": state_module,